@@ -2,10 +2,10 @@ import os
 import uuid
 import json
 from typing import Literal, Optional, List, Dict
-from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from sse_starlette.sse import EventSourceResponse
 import asyncio
@@ -20,32 +20,36 @@ from domain.models import (
     ChatAnalysisRequest,
     InterviewChatRequest,
     InterviewFeedbackRequest,
-    RepoRequest
+    RepoRequest,
+    RepoInitRequest,
+    RepoFileRequest,
+    RepoFileDeleteRequest,
+    RepoBatchWriteRequest,
+    RepoRestoreRequest
 )
 from application.llm_service import (
     generate_simulation_content, 
     generate_chat_response, 
     generate_code_review,
     generate_interview_chat,
+    stream_chat_response,
+    stream_interview_chat,
     generate_interview_feedback,
     generate_chat_analysis
 )
 from application.repo_service import repo_service
-from application.daytona_service import daytona_service
 from application.enhanced_review_service import comprehensive_code_review_stream
+from application.report_builder import REPORT_FORMATS, render_sarif
+from application.review_store import get_review_history, load_review
 from infrastructure.database import db
+from infrastructure.process_pool import process_pool
+from infrastructure.llm_clients import llm_clients, load_env
 
 # Store streaming jobs for repo review
 review_jobs = {}
 
-# Load environment
-from pathlib import Path as _Path
-_api_dir = _Path(__file__).resolve().parent
-_backend_dir = _api_dir.parent
-_root = _backend_dir.parent
-load_dotenv(dotenv_path=_backend_dir / ".env")
-load_dotenv(dotenv_path=_root / ".env.local")
-load_dotenv(dotenv_path=_root / ".env")
+# Load environment (once per process; shared with the LLM client registry)
+load_env()
 
 app = FastAPI()
 
@@ -67,10 +71,13 @@ app.add_middleware(
 @app.on_event("startup")
 async def startup():
     await db.connect()
+    repo_service.start_reaper()
 
 @app.on_event("shutdown")
 async def shutdown():
     await db.disconnect()
+    process_pool.shutdown()
+    repo_service.stop_reaper()
 
 @app.post("/generate-simulation", response_model=GenerateSimulationResponse)
 async def generate_simulation(request: GenerateSimulationRequest):
@@ -169,6 +176,18 @@ async def root():
 async def health_check():
     return {"status": "ok"}
 
+@app.get("/api/metrics/process-pool")
+async def process_pool_metrics():
+    return process_pool.stats()
+
+@app.get("/api/metrics/llm-clients")
+async def llm_client_metrics():
+    return llm_clients.stats()
+
+@app.get("/api/metrics/repo-sessions")
+async def repo_session_metrics():
+    return repo_service.metrics()
+
 @app.post("/api/chat")
 async def project_chat(req: ProjectChatRequest):
     try:
@@ -176,6 +195,20 @@ async def project_chat(req: ProjectChatRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/chat/stream")
+async def project_chat_stream(req: ProjectChatRequest):
+    """SSE: token events as the persona's reply is generated, then done (reply as in /api/chat, plus timings) or error."""
+    return EventSourceResponse(_llm_events(stream_chat_response, req))
+
+def _llm_events(stream, req):
+    async def event_generator():
+        try:
+            async for event in stream(req):
+                yield dict(event=event["event"], data=json.dumps(event["data"]))
+        except Exception as e:
+            yield dict(event="error", data=json.dumps({"message": str(e)}))
+    return event_generator()
+
 @app.post("/api/review")
 async def code_review(req: CodeReviewRequest):
     try:
@@ -191,30 +224,193 @@ async def analyze_chat(req: ChatAnalysisRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/repo/extract")
-async def extract_repo(request: RepoRequest):
+async def extract_repo(request: RepoRequest, mode: Literal["manifest", "full", "ndjson"] = "manifest"):
+    """
+    Clones a repository into a session. By default only the file manifest is returned
+    and contents are loaded per file via /api/repo/file; mode=full returns contents inline,
+    mode=ndjson streams one JSON record per file while the checkout is walked.
+    """
+    if mode == "ndjson":
+        session = await run_in_threadpool(
+            repo_service.clone_session, request.github_url, request.branch, request.access_token, request.user_id
+        )
+        records = (json.dumps(record) + "\n" for record in repo_service.stream_files(session.id))
+        return StreamingResponse(records, media_type="application/x-ndjson")
+
+    extract = repo_service.clone_manifest if mode == "manifest" else repo_service.clone_and_read
     result = await run_in_threadpool(
-        repo_service.clone_and_read, 
+        extract, 
         request.github_url, 
         request.branch, 
-        request.access_token
+        request.access_token,
+        request.user_id
     )
     if not result:
         raise HTTPException(status_code=400, detail="Failed to extract repository")
     return result
 
+@app.post("/api/repo/clone")
+async def start_repo_clone(request: RepoRequest):
+    """Starts a clone with live progress; open stream_url to run it and receive its events."""
+    clone_id = repo_service.start_clone(request.github_url, request.branch, request.access_token, request.user_id)
+    return {"clone_id": clone_id, "stream_url": f"/api/repo/clone/stream/{clone_id}"}
+
+@app.get("/api/repo/clone/stream/{clone_id}")
+async def stream_repo_clone(clone_id: str):
+    """SSE: progress events while git clones, then done (the manifest response), error or cancelled."""
+    if clone_id not in repo_service.clone_jobs:
+        raise HTTPException(status_code=404, detail="Clone job not found")
+
+    async def event_generator():
+        # Disconnecting cancels the clone (the generator is closed)
+        async for event in repo_service.clone_events(clone_id):
+            yield dict(event=event["event"], data=json.dumps(event["data"]))
+
+    return EventSourceResponse(event_generator())
+
+@app.delete("/api/repo/clone/{clone_id}")
+async def cancel_repo_clone(clone_id: str):
+    if not repo_service.cancel_clone(clone_id):
+        raise HTTPException(status_code=404, detail="Clone job not found")
+    return {"status": "cancelling", "clone_id": clone_id}
+
+@app.get("/api/repo/file")
+async def read_repo_file(session_id: str, path: str, offset: int = 0, length: Optional[int] = None):
+    """Contents of one file from a session checkout, optionally a byte range of it."""
+    return await run_in_threadpool(repo_service.read_file, session_id, path, offset, length)
+
+@app.get("/api/repo/raw")
+async def repo_raw_file(request: Request, session_id: str, path: str, download: bool = False):
+    """
+    Serves a session file byte-for-byte (any size, binary included) with Range support and
+    ETag revalidation. The file is streamed from disk, or handed to the server to send when
+    it supports it, instead of being read into memory.
+    """
+    info = await run_in_threadpool(repo_service.raw_file, session_id, path)
+    headers = {
+        "etag": info["etag"],
+        "cache-control": "private, no-cache",
+        # Repo files are untrusted: never let the browser run them in the API origin
+        "x-content-type-options": "nosniff",
+        "content-security-policy": "sandbox",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or info["etag"] in [t.strip() for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(
+        info["path"],
+        media_type=info["media_type"],
+        headers=headers,
+        filename=os.path.basename(path),
+        content_disposition_type="attachment" if download else "inline",
+    )
+
+@app.get("/api/repo/export")
+async def export_repo(session_id: str, format: Literal["zip", "tar.gz"] = "zip"):
+    """Downloads a session's files as an archive, streamed while it is being built."""
+    chunks = await run_in_threadpool(repo_service.export_archive, session_id, format)
+    media_type = "application/zip" if format == "zip" else "application/gzip"
+    filename = f"workspace-{session_id[:8]}.{format}"
+    return StreamingResponse(chunks, media_type=media_type, headers={"content-disposition": f'attachment; filename="{filename}"'})
+
+@app.get("/api/repo/session/{session_id}")
+async def repo_session_info(session_id: str):
+    """Which node holds a session's checkout, its owner and last access; used to route requests."""
+    return await run_in_threadpool(repo_service.session_info, session_id)
+
+@app.post("/api/repo/init")
+async def init_repo_session(request: RepoInitRequest):
+    """Creates a session from in-browser files (project workspaces); it starts at version 0."""
+    session_id = await run_in_threadpool(repo_service.create_session, request.files, request.user_id)
+    return {"session_id": session_id, "version": 0}
+
+@app.post("/api/repo/file/update")
+async def update_repo_file(request: RepoFileRequest):
+    version = await run_in_threadpool(
+        repo_service.update_file, request.session_id, request.rel_path, request.content, request.expected_hash
+    )
+    return {"status": "ok", "version": version}
+
+@app.post("/api/repo/file/create")
+async def create_repo_file(request: RepoFileRequest):
+    version = await run_in_threadpool(repo_service.create_file, request.session_id, request.rel_path, request.content)
+    return {"status": "ok", "version": version}
+
+@app.delete("/api/repo/file/delete")
+async def delete_repo_file(request: RepoFileDeleteRequest):
+    version = await run_in_threadpool(repo_service.delete_file, request.session_id, request.rel_path, request.expected_hash)
+    return {"status": "ok", "version": version}
+
+@app.post("/api/repo/file/batch")
+async def batch_write_repo_files(request: RepoBatchWriteRequest):
+    """Applies many edits as one save; with expected hashes, either all apply or none (409)."""
+    edits = [
+        {"path": edit.rel_path, "content": None if edit.delete else edit.content, "expected_hash": edit.expected_hash}
+        for edit in request.edits
+    ]
+    result = await run_in_threadpool(repo_service.write_files, request.session_id, edits)
+    return {"status": "ok", **result}
+
+@app.get("/api/repo/changes")
+async def repo_changes(session_id: str, since: int = 0):
+    """Files added, modified or deleted in a session after version `since` (incremental snapshot)."""
+    return await run_in_threadpool(repo_service.changes_since, session_id, since)
+
+@app.get("/api/repo/history")
+async def repo_history(session_id: str, limit: int = 100):
+    """Save points of a session (one commit per save), newest first."""
+    return await run_in_threadpool(repo_service.history, session_id, limit)
+
+@app.get("/api/repo/diff")
+async def repo_diff(session_id: str, from_rev: Optional[str] = None, to_rev: Optional[str] = None, path: Optional[str] = None):
+    """Diff between two save points; defaults to the original checkout vs the latest save."""
+    return await run_in_threadpool(repo_service.diff, session_id, from_rev, to_rev, path)
+
+@app.post("/api/repo/restore")
+async def repo_restore(request: RepoRestoreRequest):
+    return await run_in_threadpool(repo_service.restore, request.session_id, request.commit)
+
+@app.get("/api/repo/search")
+async def repo_search(session_id: str, q: str, case_sensitive: bool = False, path: str = "", limit: int = 100):
+    """Full-text search over a session's files (trigram index)."""
+    return await run_in_threadpool(repo_service.search, session_id, q, case_sensitive, path, limit)
+
+@app.get("/api/repo/symbols")
+async def repo_symbols(session_id: str, q: str = "", limit: int = 100):
+    """Symbol definitions whose name starts with `q` (go to symbol)."""
+    return await run_in_threadpool(repo_service.symbols, session_id, q, limit)
+
+@app.get("/api/repo/references")
+async def repo_references(session_id: str, name: str, limit: int = 100):
+    """Definitions and whole-word references of an identifier."""
+    return await run_in_threadpool(repo_service.references, session_id, name, limit)
+
 class RepoReviewRequest(BaseModel):
     repo_url: str
+    user_id: Optional[str] = None
 
 @app.post("/api/repo/review")
 async def start_repo_review(req: RepoReviewRequest):
     job_id = f"job-{uuid.uuid4().hex[:8]}"
     review_jobs[job_id] = {
         "url": req.repo_url,
+        "user_id": req.user_id,
         "status": "starting",
         "result": None
     }
     return {"job_id": job_id, "stream_url": f"/api/repo/review/stream/{job_id}"}
 
+@app.get("/api/repo/review/history")
+async def repo_review_history(user_id: str, page: int = 1, page_size: int = 20):
+    """A student's past reviews (newest first) and score trend, served from stored results."""
+    try:
+        return await get_review_history(user_id, page, page_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"[BACKEND ERROR] Review history error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to load review history")
+
 @app.get("/api/repo/review/stream/{job_id}")
 async def stream_repo_review(request: Request, job_id: str):
     if job_id not in review_jobs:
@@ -234,6 +430,32 @@ async def stream_repo_review(request: Request, job_id: str):
 
     return EventSourceResponse(event_generator())
 
+@app.get("/api/repo/review/{job_id}/report")
+async def get_repo_review_report(job_id: str, format: str = "markdown"):
+    """Renders a finished review's structured result on demand (markdown, json or sarif)."""
+    if format not in REPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format. Use one of: {', '.join(REPORT_FORMATS)}")
+
+    job = review_jobs.get(job_id)
+    if job is None:
+        # Not in memory (e.g. after a restart) - fall back to stored reviews
+        try:
+            job = await load_review(job_id)
+        except Exception as e:
+            print(f"[BACKEND ERROR] Failed to load review {job_id}: {e}")
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+
+    result = job.get("result")
+    if not result:
+        raise HTTPException(status_code=409, detail="Review not finished yet")
+
+    if format == "markdown":
+        return PlainTextResponse(job["report"], media_type="text/markdown")
+    if format == "json":
+        return JSONResponse(result)
+    return JSONResponse(await process_pool.run(render_sarif, result), media_type="application/sarif+json")
+
 @app.post("/api/interview/chat")
 async def interview_chat(req: InterviewChatRequest):
     try:
@@ -241,6 +463,11 @@ async def interview_chat(req: InterviewChatRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/interview/chat/stream")
+async def interview_chat_stream(req: InterviewChatRequest):
+    """SSE: token events as the interviewer's reply is generated, then done or error (see /api/chat/stream)."""
+    return EventSourceResponse(_llm_events(stream_interview_chat, req))
+
 @app.post("/api/interview/feedback")
 async def interview_feedback(req: InterviewFeedbackRequest):
     try:
@@ -1,59 +1,90 @@
-import os
 import logging
-from typing import Optional, Dict, Any
+import threading
+from typing import Dict, Any
+
+from infrastructure.sandbox_backends import SANDBOX_BACKEND, create_backend
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+COMMAND_TIMEOUT = 60
+
+
 class DaytonaService:
-    def __init__(self):
-        self.api_key = os.environ.get("DAYTONA_API_KEY")
-        self.server_url = os.environ.get("DAYTONA_SERVER_URL")
-        self.client = None
-        self._setup_client()
+    """
+    Workspaces (sandboxes with a cloned repo) on the configured sandbox backend.
+    SANDBOX_BACKEND=daytona (the default) uses the remote service; local runs them on this
+    host and is only used when configured explicitly.
+    """
+
+    def __init__(self, backend: str = SANDBOX_BACKEND):
+        self.backend_name = backend
+        self.backend = None
+        self.workspaces: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._setup_backend()
 
-    def _setup_client(self):
+    def _setup_backend(self):
         try:
-            import daytona_sdk
-            # Placeholder for actual client initialization
-            # self.client = daytona_sdk.Daytona(api_key=self.api_key, server_url=self.server_url)
-            logger.info("Daytona SDK imported successfully (mock client setup).")
+            self.backend = create_backend(self.backend_name)
+            logger.info(f"Sandbox backend ready: {self.backend.name}")
         except ImportError:
-            logger.warning("Daytona SDK not installed. Execution features will be disabled.")
+            logger.error("Daytona SDK not installed; workspaces are disabled (set SANDBOX_BACKEND=local for trusted code).")
+        except Exception as e:
+            logger.error(f"Failed to set up sandbox backend '{self.backend_name}': {e}")
+
+    def _get(self, workspace_id: str):
+        sandbox = self.workspaces.get(workspace_id)
+        if sandbox is None:
+            raise KeyError(f"Unknown workspace: {workspace_id}")
+        return sandbox
 
     def create_workspace(self, repo_url: str, branch: str = "main") -> Dict[str, Any]:
         """
-        Creates a Daytona workspace for the given repository.
+        Creates a sandbox for the given repository and clones it into `repo/`.
         """
-        if not self.client:
-            logger.info(f"Mocking workspace creation for {repo_url}")
-            return {"id": "mock-workspace-id", "url": repo_url, "status": "running"}
+        if not self.backend:
+            raise RuntimeError("No sandbox backend available")
 
+        sandbox = self.backend.create()
         try:
-            # Placeholder for SDK call
-            # workspace = self.client.create_workspace(repository=repo_url, branch=branch)
-            # return workspace
-            pass
+            sandbox.git.clone(repo_url, "repo", branch=branch)
         except Exception as e:
             logger.error(f"Failed to create workspace: {e}")
+            self.backend.destroy(sandbox)
             raise e
 
-    def execute_command(self, workspace_id: str, command: str) -> str:
+        with self._lock:
+            self.workspaces[sandbox.id] = sandbox
+        return {"id": sandbox.id, "url": repo_url, "status": "running", "backend": self.backend.name}
+
+    def execute_command(self, workspace_id: str, command: str, timeout: int = COMMAND_TIMEOUT) -> str:
         """
-        Executes a command in the specified workspace.
+        Executes a command in the specified workspace (working dir contains `repo/`).
         """
-        if not self.client:
-            logger.info(f"Mocking execution of '{command}' in {workspace_id}")
-            return f"Mock output for: {command}"
-
         try:
-            # Placeholder for SDK call
-            # response = self.client.exec(workspace_id, command)
-            # return response.output
-            pass
+            result = self._get(workspace_id).process.exec(command, timeout=timeout)
+            return result.result
         except Exception as e:
             logger.error(f"Command execution failed: {e}")
             return f"Error: {str(e)}"
 
+    def run_code(self, workspace_id: str, code: str, timeout: int = COMMAND_TIMEOUT) -> Dict[str, Any]:
+        result = self._get(workspace_id).process.code_run(code, timeout=timeout)
+        return {"exit_code": result.exit_code, "output": result.result}
+
+    def read_file(self, workspace_id: str, path: str) -> bytes:
+        return self._get(workspace_id).fs.download_file(path)
+
+    def write_file(self, workspace_id: str, path: str, content: bytes):
+        self._get(workspace_id).fs.upload_file(content, path)
+
+    def delete_workspace(self, workspace_id: str):
+        with self._lock:
+            sandbox = self.workspaces.pop(workspace_id, None)
+        if sandbox is not None:
+            self.backend.destroy(sandbox)
+
+
 daytona_service = DaytonaService()
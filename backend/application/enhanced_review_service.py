@@ -9,10 +9,15 @@ import tempfile
 import shutil
 import subprocess
 import json
-from datetime import datetime
-from typing import Dict, Set, List, Tuple
+from typing import Dict, Set, List, Tuple, Optional
 from pathlib import Path
 
+from application.env_builder import env_builder
+from application.test_runner import run_test_suites
+from application.report_builder import REPORT_FORMATS, ReportBuilder, finalize_report
+from application.review_store import save_review
+from infrastructure.process_pool import process_pool
+
 # Code file extensions with execution support
 CODE_EXTENSIONS: Dict[str, str] = {
     '.py': 'python',
@@ -67,8 +72,52 @@ def get_execution_command(file_path: str, language: str) -> Tuple[str, bool]:
     }
     return runners.get(language, (None, False))
 
-async def execute_file(file_path: str, language: str, timeout: int = 30) -> Dict:
-    """Execute a file and return results"""
+def scan_code_files(repo_dir: str) -> Tuple[int, Dict[str, str]]:
+    """
+    Walks the checkout for code files. I/O-bound, so callers run it in a thread;
+    read_code_files loads their contents.
+    Returns (files_scanned, {relative_path: language}).
+    """
+    file_count = 0
+    code_paths: Dict[str, str] = {}
+    
+    for root, dirs, files in os.walk(repo_dir):
+        dirs[:] = [d for d in dirs if d not in SKIP_DIRECTORIES]
+        
+        for file in files:
+            file_count += 1
+            ext = os.path.splitext(file)[1].lower()
+            
+            if ext in CODE_EXTENSIONS or file.lower() in {'makefile', 'dockerfile', 'rakefile'}:
+                relative_path = os.path.relpath(os.path.join(root, file), repo_dir).replace('\\', '/')
+                code_paths[relative_path] = CODE_EXTENSIONS.get(ext, 'text')
+    
+    return file_count, code_paths
+
+def read_code_files(repo_dir: str, code_paths: Dict[str, str]) -> Dict[str, Dict]:
+    """Reads the scanned code files with their basic metrics. Blocking, so callers run it in a thread."""
+    code_files: Dict[str, Dict] = {}
+    
+    for relative_path, language in code_paths.items():
+        file_path = os.path.join(repo_dir, relative_path)
+        try:
+            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                content = f.read()
+                if len(content) < 500000:
+                    code_files[relative_path] = {
+                        "content": content,
+                        "language": language,
+                        "size": len(content),
+                        "lines": content.count('\n') + 1,
+                        "path": file_path
+                    }
+        except:
+            pass
+    
+    return code_files
+
+async def execute_file(file_path: str, language: str, timeout: int = 30, env: Optional[Dict[str, str]] = None) -> Dict:
+    """Execute a file and return results. `env` carries the repo's dependency environment, if any."""
     cmd, needs_compile = get_execution_command(file_path, language)
     
     if not cmd:
@@ -80,13 +129,15 @@ async def execute_file(file_path: str, language: str, timeout: int = 30) -> Dict
         }
     
     try:
-        result = subprocess.run(
+        result = await asyncio.to_thread(
+            subprocess.run,
             cmd,
             shell=True,
             capture_output=True,
             text=True,
             timeout=timeout,
-            cwd=os.path.dirname(file_path)
+            cwd=os.path.dirname(file_path),
+            env=env
         )
         
         return {
@@ -119,7 +170,8 @@ async def lint_file(file_path: str, language: str) -> Dict:
     try:
         if language == 'python':
             # Try flake8 first (lighter)
-            result = subprocess.run(
+            result = await asyncio.to_thread(
+                subprocess.run,
                 f'flake8 "{file_path}"',
                 shell=True,
                 capture_output=True,
@@ -130,7 +182,8 @@ async def lint_file(file_path: str, language: str) -> Dict:
             issues_count = len(linter_output.split('\n')) if linter_output else 0
             
         elif language in ['javascript', 'typescript']:
-            result = subprocess.run(
+            result = await asyncio.to_thread(
+                subprocess.run,
                 f'npx eslint "{file_path}" --format compact',
                 shell=True,
                 capture_output=True,
@@ -248,7 +301,8 @@ async def comprehensive_code_review_stream(job_id: str, repo_url: str, review_jo
         }
         
         temp_dir = tempfile.mkdtemp()
-        clone_result = subprocess.run(
+        clone_result = await asyncio.to_thread(
+            subprocess.run,
             ["git", "clone", "--depth=1", repo_url, temp_dir],
             capture_output=True,
             text=True,
@@ -268,41 +322,69 @@ async def comprehensive_code_review_stream(job_id: str, repo_url: str, review_jo
             "data": '{"message": "Repository cloned successfully"}'
         }
         
+        head = await asyncio.to_thread(
+            subprocess.run, ["git", "rev-parse", "HEAD"], cwd=temp_dir, capture_output=True, text=True
+        )
+        commit_sha = head.stdout.strip() if head.returncode == 0 else None
+        builder = ReportBuilder(repo_url, commit_sha)
+        
+        # Step 1b: Dependency environment (cached per lockfile hash)
+        yield {
+            "event": "step",
+            "data": '{"message": "Preparing dependency environment..."}'
+        }
+        
+        environment = await asyncio.to_thread(env_builder.prepare, temp_dir)
+        for ecosystem in ("python", "node"):
+            env_status = environment[ecosystem]
+            if not env_status:
+                continue
+            if env_status["ready"]:
+                state = "reused cached" if env_status["cached"] else "built"
+                msg = f"  → {ecosystem}: {state} environment {env_status['key'][:8]}"
+            else:
+                attempt = "failed earlier (cached)" if env_status["cached"] else "failed"
+                msg = f"  → {ecosystem}: install {attempt}, running without dependencies"
+            yield {
+                "event": "step",
+                "data": json.dumps({"message": msg})
+            }
+        
+        # Step 1c: Test suites (run once, sharded across cores)
+        yield {
+            "event": "step",
+            "data": '{"message": "Detecting test suites..."}'
+        }
+        
+        test_results = await run_test_suites(temp_dir, environment["env"])
+        covered_files = set()
+        test_failures: Dict[str, List[Dict]] = {}
+        for suite in test_results:
+            covered_files.update(suite["covered_files"])
+            for path, failures in suite["failures_by_file"].items():
+                test_failures.setdefault(path, []).extend(failures)
+            summary = suite["summary"]
+            yield {
+                "event": "execute",
+                "data": json.dumps({"message": f"  → {suite['framework']}: {summary['passed']}/{summary['total']} passed "
+                                               f"across {suite['shards']} shard(s) in {suite['duration']:.1f}s"})
+            }
+        builder.set_tests(test_results)
+        if test_results:
+            yield {
+                "event": "tests",
+                "data": json.dumps({"suites": test_results})
+            }
+        
         # Step 2: Extract code files
         yield {
             "event": "step",
             "data": '{"message": "Scanning for code files..."}'
         }
         
-        file_count = 0
-        code_file_count = 0
-        
-        for root, dirs, files in os.walk(temp_dir):
-            dirs[:] = [d for d in dirs if d not in SKIP_DIRECTORIES]
-            
-            for file in files:
-                file_count += 1
-                ext = os.path.splitext(file)[1].lower()
-                
-                if ext in CODE_EXTENSIONS or file.lower() in {'makefile', 'dockerfile', 'rakefile'}:
-                    file_path = os.path.join(root, file)
-                    relative_path = os.path.relpath(file_path, temp_dir).replace('\\', '/')
-                    
-                    try:
-                        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                            content = f.read()
-                            if len(content) < 500000:
-                                language = CODE_EXTENSIONS.get(ext, 'text')
-                                code_files[relative_path] = {
-                                    "content": content,
-                                    "language": language,
-                                    "size": len(content),
-                                    "lines": content.count('\n') + 1,
-                                    "path": file_path
-                                }
-                                code_file_count += 1
-                    except:
-                        pass
+        file_count, code_paths = await asyncio.to_thread(scan_code_files, temp_dir)
+        code_files = await asyncio.to_thread(read_code_files, temp_dir, code_paths)
+        code_file_count = len(code_files)
         
         yield {
             "event": "step",
@@ -321,16 +403,29 @@ async def comprehensive_code_review_stream(job_id: str, repo_url: str, review_jo
                 "data": f'{{"message": "Analyzing {relative_path} ({analyzed_count}/{min(code_file_count, 20)})..."}}'
             }
             
-            # Execute file
-            yield {
-                "event": "execute",
-                "data": f'{{"message": "  Executing {relative_path} ({file_data["language"]})..."}}'
-            }
-            
-            exec_result = await execute_file(file_data["path"], file_data["language"])
+            # Execute file (skipped when the test suite already exercises it)
+            file_test_failures = test_failures.get(relative_path, [])
+            if relative_path in covered_files:
+                exec_result = {
+                    "success": not file_test_failures,
+                    "output": f"Covered by test suite ({len(file_test_failures)} failing test(s))",
+                    "error": "\n".join(f"{f['test']}" + (f" (line {f['line']})" if f["line"] else "")
+                                       for f in file_test_failures) or None,
+                    "exit_code": 1 if file_test_failures else 0,
+                    "covered_by_tests": True
+                }
+            else:
+                yield {
+                    "event": "execute",
+                    "data": f'{{"message": "  Executing {relative_path} ({file_data["language"]})..."}}'
+                }
+                
+                exec_result = await execute_file(file_data["path"], file_data["language"], env=environment["env"])
             
             # Report execution result
             exec_status = "Success" if exec_result["success"] else f"Failed (exit {exec_result['exit_code']})"
+            if exec_result.get("covered_by_tests"):
+                exec_status = f"Tests {'passing' if exec_result['success'] else 'failing'}"
             yield {
                 "event": "execute",
                 "data": f'{{"message": "    → {exec_status}"}}'
@@ -376,16 +471,27 @@ async def comprehensive_code_review_stream(job_id: str, repo_url: str, review_jo
                 "data": f'{{"message": "    → [{verdict_prefix}] Score: {file_score}/10"}}'
             }
             
-            # Store review
-            file_reviews.append({
+            # Store review and stream its report section right away
+            review = {
                 "path": relative_path,
                 "language": file_data["language"],
                 "lines": file_data["lines"],
                 "execution": exec_result,
+                "tests": file_test_failures,
                 "linting": lint_result,
                 "ai_analysis": ai_analysis,
                 "score": file_score
-            })
+            }
+            file_reviews.append(review)
+            
+            yield {
+                "event": "report_section",
+                "data": json.dumps({
+                    "index": analyzed_count - 1,
+                    "path": relative_path,
+                    "section": builder.add_file(review)
+                })
+            }
             
             await asyncio.sleep(0.1)
         
@@ -404,104 +510,34 @@ async def comprehensive_code_review_stream(job_id: str, repo_url: str, review_jo
         }
         
         total_lines = sum(f["lines"] for f in code_files.values())
-        pass_count = sum(1 for r in file_reviews if r["ai_analysis"]["verdict"] == "PASS")
-        warn_count = sum(1 for r in file_reviews if r["ai_analysis"]["verdict"] == "WARN")
-        fail_count = sum(1 for r in file_reviews if r["ai_analysis"]["verdict"] == "FAIL")
-        
-        health_status = "✅ EXCELLENT" if overall_score >= 8 else "⚠️ NEEDS WORK" if overall_score >= 6 else "❌ CRITICAL ISSUES"
-        
-        report = f"""# 🔍 Comprehensive Code Review Report
-
-## 📊 Repository Overview
-
-**Repository**: {repo_url}  
-**Analysis Date**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}  
-**Files Scanned**: {file_count}  
-**Code Files Analyzed**: {analyzed_count}  
-**Total Lines of Code**: {total_lines:,}  
-
-## 🎯 Overall Score: {overall_score:.1f}/10
-
-**Health Status**: {health_status}
-
-**Verdict Distribution**:
-- ✅ PASS: {pass_count} files
-- ⚠️ WARN: {warn_count} files
-- ❌ FAIL: {fail_count} files
-
----
-
-## 📁 Detailed File Reviews
-
-"""
-        
-        for review in file_reviews:
-            verdict_emoji = "✅" if review["ai_analysis"]["verdict"] == "PASS" else "⚠️" if review["ai_analysis"]["verdict"] == "WARN" else "❌"
-            
-            exec_status = '✅ SUCCESS' if review["execution"]["success"] else f'❌ FAILED (exit {review["execution"]["exit_code"]})'
-            exec_error_section = f'```\n{review["execution"]["error"][:200]}\n```' if review["execution"].get("error") else ''
-            
-            lint_status = '✅ Clean' if review["linting"].get("clean") else f'⚠️ {review["linting"]["issues_count"]} issues found'
-            
-            report += f"""### {verdict_emoji} `{review["path"]}`  [{review["ai_analysis"]["verdict"]}]
-
-**Language**: {review["language"]}  
-**Lines**: {review["lines"]}  
-**Quality Score**: {review["score"]}/10  
-
-**Execution**: {exec_status}  
-{exec_error_section}
-
-**Linter**: {lint_status}  
-
-**Issues Found**:
-"""
-            for issue in review["ai_analysis"]["issues"]:
-                report += f"- {issue}\n"
-            
-            report += f"""
-**Security**: {review["ai_analysis"]["security"]}  
-**Best Practices**: {review["ai_analysis"]["best_practices"]}  
-
-**Verdict**: {review["ai_analysis"]["reason"]}
-
----
-
-"""
-        
-        report += f"""
-## 🎯 Overall Recommendations
-
-1. **Quality Improvements**: Focus on {fail_count + warn_count} files flagged with warnings or failures
-2. **Testing**: Add comprehensive unit tests for critical functionality
-3. **Security**: Review security concerns identified in {sum(1 for r in file_reviews if r["ai_analysis"]["security"] != "None")} files
-4. **Best Practices**: Apply recommended improvements across the codebase
-5. **Documentation**: Add inline comments and documentation
-
-## 📈 Statistics
-
-- **Average Score**: {overall_score:.1f}/10
-- **Execution Success Rate**: {sum(1 for r in file_reviews if r["execution"]["success"]) / analyzed_count * 100:.1f}%
-- **Clean Linting**: {sum(1 for r in file_reviews if r["linting"].get("clean", False)) / analyzed_count * 100:.1f}%
-
----
-
-*AI-powered comprehensive review with execution testing and scoring. Manual verification recommended for production.*
-"""
-        
-        yield {
-            "event": "report",
-            "data": json.dumps({"data": report})
-        }
+        result, report = await process_pool.run(finalize_report, builder.result, builder.sections, file_count, total_lines)
         
         # Cleanup
         shutil.rmtree(temp_dir, ignore_errors=True)
         
-        # Store results
+        # Store results; the report event only points at them
         review_jobs[job_id]["files"] = {k: {k2: v2 for k2, v2 in v.items() if k2 != 'path'} for k, v in code_files.items()}
         review_jobs[job_id]["reviews"] = file_reviews
         review_jobs[job_id]["score"] = overall_score
+        review_jobs[job_id]["tests"] = test_results
         review_jobs[job_id]["report"] = report
+        review_jobs[job_id]["result"] = result
+        
+        yield {
+            "event": "report",
+            "data": json.dumps({
+                "job_id": job_id,
+                "url": f"/api/repo/review/{job_id}/report",
+                "formats": list(REPORT_FORMATS),
+                "score": overall_score
+            })
+        }
+        
+        # Persist for history (a DB outage must not fail the review itself)
+        try:
+            await save_review(job_id, result, report, review_jobs[job_id].get("user_id"))
+        except Exception as e:
+            print(f"[BACKEND ERROR] Failed to store review {job_id}: {e}")
         
         yield {
             "event": "done",
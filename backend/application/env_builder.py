@@ -0,0 +1,378 @@
+"""
+Dependency Environment Builder for Reviewed Repositories
+Detects Python and Node manifests in a cloned repo and provides isolated,
+cached venvs / node_modules keyed by the hash of the dependency files.
+Python wheels are built on the sandbox backend, since building them runs the
+repo's setup.py / build backends; this host only installs the finished wheels.
+Node packages are installed with the repo's package manager in frozen-lockfile
+mode and with install scripts disabled. A failed build is remembered per
+manifest hash and only retried after REVIEW_ENV_RETRY_MINUTES.
+"""
+
+import os
+import sys
+import json
+import time
+import shlex
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+import subprocess
+from typing import Dict, List, Optional
+
+from infrastructure.sandbox_backends import SANDBOX_BACKEND, create_backend
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+ENV_CACHE_DIR = os.environ.get(
+    "REVIEW_ENV_CACHE_DIR", os.path.join(tempfile.gettempdir(), "interna-review-envs")
+)
+WHEEL_CACHE_DIR = os.environ.get("REVIEW_WHEEL_CACHE_DIR", os.path.join(ENV_CACHE_DIR, "wheels"))
+NPM_CACHE_DIR = os.environ.get("REVIEW_NPM_CACHE_DIR", os.path.join(ENV_CACHE_DIR, "npm-cache"))
+INSTALL_TIMEOUT = 300
+BUILD_RETRY_MINUTES = int(os.environ.get("REVIEW_ENV_RETRY_MINUTES", 30))  # after a failed build
+READY_MARKER = ".ready"
+FAILED_SUFFIX = ".failed"  # next to the env dir; holds the error of the last failed build
+SANDBOX_BUILD_DIR = "envbuild"  # inside the build sandbox
+
+PYTHON_MANIFESTS = ("requirements.txt", "pyproject.toml")
+PYTHON_LOCKFILES = ("poetry.lock", "Pipfile.lock", "uv.lock")
+NODE_MANIFESTS = ("package.json",)
+NODE_LOCKFILES = ("package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml")
+
+
+def _hash_files(repo_dir: str, names: List[str], salt: str) -> str:
+    """Stable hash over the given dependency files (missing ones are skipped)."""
+    digest = hashlib.sha256(salt.encode())
+    for name in sorted(names):
+        path = os.path.join(repo_dir, name)
+        if os.path.isfile(path):
+            digest.update(name.encode())
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:24]
+
+
+def _pyproject_dependencies(path: str) -> List[str]:
+    """Reads PEP 621 `[project].dependencies` from a pyproject.toml."""
+    if tomllib is None:
+        logger.warning("tomllib unavailable, skipping pyproject.toml dependencies")
+        return []
+    try:
+        with open(path, "rb") as f:
+            data = tomllib.load(f)
+        return list(data.get("project", {}).get("dependencies", []))
+    except Exception as e:
+        logger.warning(f"Could not parse {path}: {e}")
+        return []
+
+
+def _run(cmd: List[str], cwd: Optional[str] = None, env: Optional[Dict[str, str]] = None) -> subprocess.CompletedProcess:
+    return subprocess.run(cmd, cwd=cwd, env=env, capture_output=True, text=True, timeout=INSTALL_TIMEOUT)
+
+
+def _cached_failure(env_dir: str) -> Optional[str]:
+    """Error of a build of this manifest hash that failed within the retry window, if any."""
+    path = env_dir + FAILED_SUFFIX
+    try:
+        if time.time() - os.path.getmtime(path) < BUILD_RETRY_MINUTES * 60:
+            with open(path) as f:
+                return f.read()
+    except OSError:
+        pass
+    return None
+
+
+def _record_failure(env_dir: str, error: str):
+    try:
+        with open(env_dir + FAILED_SUFFIX, "w") as f:
+            f.write(error)
+    except OSError as e:
+        logger.debug(f"Could not record failed build {env_dir}: {e}")
+
+
+def _package_manager(repo_dir: str, files: List[str]) -> str:
+    """npm, yarn or pnpm: the package.json `packageManager` field, else the lockfile present."""
+    try:
+        with open(os.path.join(repo_dir, "package.json"), encoding="utf-8") as f:
+            declared = str(json.load(f).get("packageManager") or "").split("@")[0]
+    except (OSError, ValueError, AttributeError):
+        declared = ""
+    if declared in ("npm", "yarn", "pnpm"):
+        return declared
+    if "pnpm-lock.yaml" in files:
+        return "pnpm"
+    if "yarn.lock" in files and not any(f in files for f in ("package-lock.json", "npm-shrinkwrap.json")):
+        return "yarn"
+    return "npm"
+
+
+class EnvironmentBuilder:
+    def __init__(self, cache_dir: str = ENV_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._backend = None
+
+    def _lock_for(self, key: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _sandbox_backend(self):
+        """The sandbox backend wheels are built on, created on first use."""
+        with self._locks_guard:
+            if self._backend is None:
+                self._backend = create_backend(SANDBOX_BACKEND)
+            return self._backend
+
+    def detect(self, repo_dir: str) -> Dict[str, List[str]]:
+        """Returns the dependency files found at the repository root, per ecosystem."""
+        found = {"python": [], "node": []}
+        for name in PYTHON_MANIFESTS + PYTHON_LOCKFILES:
+            if os.path.isfile(os.path.join(repo_dir, name)):
+                found["python"].append(name)
+        if os.path.isfile(os.path.join(repo_dir, "package.json")):
+            for name in NODE_MANIFESTS + NODE_LOCKFILES:
+                if os.path.isfile(os.path.join(repo_dir, name)):
+                    found["node"].append(name)
+        # A lockfile without a manifest is not enough to install anything
+        if not any(m in found["python"] for m in PYTHON_MANIFESTS):
+            found["python"] = []
+        return found
+
+    def prepare(self, repo_dir: str) -> Dict:
+        """
+        Builds (or reuses) the environments for a cloned repo.
+        Returns {"python": status, "node": status, "env": subprocess env vars}.
+        """
+        found = self.detect(repo_dir)
+        result = {"python": None, "node": None, "env": dict(os.environ)}
+
+        if found["python"]:
+            result["python"] = self._prepare_python(repo_dir, found["python"])
+            if result["python"].get("ready"):
+                venv_dir = result["python"]["path"]
+                bin_dir = os.path.join(venv_dir, "Scripts" if os.name == "nt" else "bin")
+                result["env"]["VIRTUAL_ENV"] = venv_dir
+                result["env"]["PATH"] = bin_dir + os.pathsep + result["env"].get("PATH", "")
+                result["env"].pop("PYTHONHOME", None)
+
+        if found["node"]:
+            result["node"] = self._prepare_node(repo_dir, found["node"])
+            if result["node"].get("ready"):
+                modules_dir = os.path.join(result["node"]["path"], "node_modules")
+                result["env"]["NODE_PATH"] = modules_dir
+                result["env"]["PATH"] = (
+                    os.path.join(modules_dir, ".bin") + os.pathsep + result["env"].get("PATH", "")
+                )
+                self._link_node_modules(repo_dir, modules_dir)
+
+        return result
+
+    # --- Python ---
+
+    def _prepare_python(self, repo_dir: str, files: List[str]) -> Dict:
+        salt = f"py{sys.version_info.major}.{sys.version_info.minor}"
+        key = _hash_files(repo_dir, files, salt)
+        env_dir = os.path.join(self.cache_dir, "python", key)
+        status = {"key": key, "path": env_dir, "files": files, "cached": True, "ready": False, "error": None}
+
+        with self._lock_for(env_dir):
+            if os.path.exists(os.path.join(env_dir, READY_MARKER)):
+                status["ready"] = True
+                return status
+            status["error"] = _cached_failure(env_dir)
+            if status["error"] is not None:
+                return status
+
+            status["cached"] = False
+            try:
+                backend = self._sandbox_backend()
+            except Exception as e:
+                # Not the manifest's fault, so it is not remembered as a failed build
+                logger.warning(f"No sandbox backend to build Python env {key}: {e}")
+                status["error"] = f"Sandbox backend unavailable: {e}"
+                return status
+
+            logger.info(f"Building Python env {key} for {files}")
+            shutil.rmtree(env_dir, ignore_errors=True)
+            os.makedirs(WHEEL_CACHE_DIR, exist_ok=True)
+            try:
+                res = _run([sys.executable, "-m", "venv", env_dir])
+                if res.returncode != 0:
+                    raise RuntimeError(res.stderr.strip()[:500])
+                python = os.path.join(env_dir, "Scripts" if os.name == "nt" else "bin", "python")
+
+                wheels = self._build_wheels(backend, repo_dir, files)
+                if wheels:
+                    # Installing a wheel only unpacks it; --no-deps since the sandbox already resolved them
+                    res = _run([python, "-m", "pip", "install", "-q", "--disable-pip-version-check",
+                                "--no-index", "--no-deps"] + wheels)
+                    if res.returncode != 0:
+                        raise RuntimeError(res.stderr.strip()[-500:])
+
+                with open(os.path.join(env_dir, READY_MARKER), "w") as f:
+                    f.write(json.dumps({"files": files}))
+                status["ready"] = True
+            except Exception as e:
+                logger.warning(f"Python env build failed ({key}): {e}")
+                shutil.rmtree(env_dir, ignore_errors=True)
+                status["error"] = str(e)
+                _record_failure(env_dir, status["error"])
+        return status
+
+    @staticmethod
+    def _build_wheels(backend, repo_dir: str, files: List[str]) -> List[str]:
+        """
+        Builds wheels for the repo's requirements and all their dependencies in a fresh
+        sandbox and downloads the ones missing from WHEEL_CACHE_DIR.
+        Only the manifests are uploaded (they are what the env is keyed by), so
+        requirements that point at other files in the repo fail the build. Wheels with
+        compiled code only install here if the sandbox runs the same Python as this host.
+        Returns the local wheel paths.
+        """
+        uploads: Dict[str, bytes] = {}
+        if "requirements.txt" in files:
+            with open(os.path.join(repo_dir, "requirements.txt"), "rb") as f:
+                uploads["requirements.txt"] = f.read()
+        if "pyproject.toml" in files:
+            dependencies = _pyproject_dependencies(os.path.join(repo_dir, "pyproject.toml"))
+            if dependencies:
+                uploads["pyproject-requirements.txt"] = "\n".join(dependencies).encode()
+        if not uploads:
+            return []
+
+        sandbox = backend.create()
+        try:
+            for name, content in uploads.items():
+                sandbox.fs.upload_file(content, f"{SANDBOX_BUILD_DIR}/{name}")
+            req_args = " ".join(f"-r {shlex.quote(name)}" for name in uploads)
+            res = sandbox.process.exec(
+                f"cd {SANDBOX_BUILD_DIR} && python3 -m pip wheel -q --disable-pip-version-check -w wheels {req_args} 2>&1",
+                timeout=INSTALL_TIMEOUT,
+            )
+            if res.exit_code != 0:
+                raise RuntimeError(res.result.strip()[-500:])
+            listing = sandbox.process.exec(f"ls {SANDBOX_BUILD_DIR}/wheels", timeout=60)
+            if listing.exit_code != 0:
+                raise RuntimeError(listing.result.strip()[-500:])
+
+            wheels = []
+            for name in listing.result.split():
+                # Names come from the sandbox, so anything but a plain wheel file name is ignored
+                if not name.endswith(".whl") or os.path.basename(name) != name or name.startswith("."):
+                    continue
+                local = os.path.join(WHEEL_CACHE_DIR, name)
+                if not os.path.exists(local):
+                    fd, tmp = tempfile.mkstemp(dir=WHEEL_CACHE_DIR, prefix=".", suffix=".tmp")
+                    with os.fdopen(fd, "wb") as f:
+                        f.write(sandbox.fs.download_file(f"{SANDBOX_BUILD_DIR}/wheels/{name}"))
+                    os.replace(tmp, local)
+                wheels.append(local)
+            return wheels
+        finally:
+            try:
+                backend.destroy(sandbox)
+            except Exception as e:
+                logger.warning(f"Could not destroy wheel build sandbox: {e}")
+
+    # --- Node ---
+
+    def _prepare_node(self, repo_dir: str, files: List[str]) -> Dict:
+        key = _hash_files(repo_dir, files, "node")
+        env_dir = os.path.join(self.cache_dir, "node", key)
+        status = {"key": key, "path": env_dir, "files": files, "cached": True, "ready": False, "error": None}
+
+        with self._lock_for(env_dir):
+            if os.path.exists(os.path.join(env_dir, READY_MARKER)):
+                status["ready"] = True
+                return status
+            status["error"] = _cached_failure(env_dir)
+            if status["error"] is not None:
+                return status
+
+            status["cached"] = False
+            manager = _package_manager(repo_dir, files)
+            executable = shutil.which(manager)
+            if not executable:
+                status["error"] = f"{manager} not available"
+                return status
+
+            logger.info(f"Building node_modules {key} for {files} with {manager}")
+            shutil.rmtree(env_dir, ignore_errors=True)
+            os.makedirs(env_dir, exist_ok=True)
+            os.makedirs(NPM_CACHE_DIR, exist_ok=True)
+            try:
+                for name in files:
+                    shutil.copy2(os.path.join(repo_dir, name), os.path.join(env_dir, name))
+
+                cmd, env = self._node_install_command(manager, executable, files)
+                res = _run(cmd, cwd=env_dir, env=env)
+                if res.returncode != 0:
+                    raise RuntimeError((res.stderr.strip() or res.stdout.strip())[-500:])
+
+                with open(os.path.join(env_dir, READY_MARKER), "w") as f:
+                    f.write(json.dumps({"files": files, "package_manager": manager}))
+                status["ready"] = True
+            except Exception as e:
+                logger.warning(f"Node env build failed ({key}): {e}")
+                shutil.rmtree(env_dir, ignore_errors=True)
+                status["error"] = str(e)
+                _record_failure(env_dir, status["error"])
+        return status
+
+    @staticmethod
+    def _node_install_command(manager: str, executable: str, files: List[str]):
+        """
+        Install command for the package manager, in its frozen-lockfile mode when the repo has
+        its lockfile (the install fails instead of resolving new versions), and without running
+        install scripts. Returns (cmd, env).
+        """
+        env = dict(os.environ)
+        if manager == "pnpm":
+            frozen = ["--frozen-lockfile"] if "pnpm-lock.yaml" in files else []
+            return [executable, "install", *frozen, "--prefer-offline", "--ignore-scripts",
+                    "--store-dir", os.path.join(NPM_CACHE_DIR, "pnpm-store")], env
+
+        if manager == "yarn":
+            version = _run([executable, "--version"]).stdout.strip()
+            locked = "yarn.lock" in files
+            if version.startswith("1."):
+                frozen = ["--frozen-lockfile"] if locked else []
+                return [executable, "install", *frozen, "--prefer-offline", "--ignore-scripts", "--non-interactive",
+                        "--cache-folder", os.path.join(NPM_CACHE_DIR, "yarn")], env
+            # Yarn 2+: node_modules instead of Plug'n'Play, so NODE_PATH resolution works
+            env.update(YARN_NODE_LINKER="node-modules", YARN_ENABLE_GLOBAL_CACHE="0",
+                       YARN_CACHE_FOLDER=os.path.join(NPM_CACHE_DIR, "yarn-berry"))
+            frozen = ["--immutable"] if locked else []
+            return [executable, "install", *frozen, "--mode=skip-build"], env
+
+        has_npm_lock = any(f in files for f in ("package-lock.json", "npm-shrinkwrap.json"))
+        return [executable, "ci" if has_npm_lock else "install", "--prefer-offline", "--no-audit",
+                "--no-fund", "--ignore-scripts", "--cache", NPM_CACHE_DIR], env
+
+    @staticmethod
+    def _link_node_modules(repo_dir: str, modules_dir: str):
+        """Exposes the cached node_modules inside the checkout so ESM resolution works too."""
+        target = os.path.join(repo_dir, "node_modules")
+        if os.path.lexists(target):
+            return
+        try:
+            os.symlink(modules_dir, target, target_is_directory=True)
+        except OSError as e:
+            logger.debug(f"Could not link node_modules into {repo_dir}: {e}")
+
+
+env_builder = EnvironmentBuilder()
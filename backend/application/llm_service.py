@@ -1,6 +1,4 @@
-import os
-from pathlib import Path
-from dotenv import load_dotenv
+import time
 import asyncio
 from domain.models import ChatAnalysisResponse
 from langchain_google_genai import ChatGoogleGenerativeAI
@@ -16,6 +14,7 @@ from domain.models import (
     ChatAnalysisResponse
 )
 from infrastructure.constants import get_level_description
+from infrastructure.llm_clients import llm_clients
 
 # Lazy imports applied throughout to improve startup time
 
@@ -77,29 +76,9 @@ Generate Personas for:
 Output a list of personas (including the Client).
 """
 
-def _ensure_env():
-    from pathlib import Path
-    from dotenv import load_dotenv
-    _current_dir = Path(__file__).resolve().parent
-    # Project root is 2 levels up from backend/application/llm_service.py
-    _root = _current_dir.parent.parent
-    _backend_dir = _current_dir.parent
-    load_dotenv(dotenv_path=_backend_dir / ".env")
-    load_dotenv(dotenv_path=_root / ".env.local")
-    load_dotenv(dotenv_path=_root / ".env")
-
 def _get_llm(model: str | None = None, temperature=0.7):
-    _ensure_env()
-    from langchain_google_genai import ChatGoogleGenerativeAI
-    api_key = os.getenv("GEMINI_API_KEY")
-    default_model = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
-    if not api_key:
-        raise ValueError("GEMINI_API_KEY not found in environment variables.")
-    return ChatGoogleGenerativeAI(
-        model=model or default_model,
-        google_api_key=api_key,
-        temperature=temperature,
-    )
+    """Shared chat model client for (model, temperature); built once per process."""
+    return llm_clients.get(model, temperature)
 
 async def generate_project_structure(title, context, level, level_description):
     from domain.models import ProjectStructure
@@ -300,8 +279,8 @@ Tone instructions: {tone}
 Always answer in English, as this client only (unless specifically asked differently). Refer to specific project details when natural.
 FORMATTING: Use Markdown for all lists, code snippets, and emphasis to improve readability."""
 
-async def generate_chat_response(req) -> dict:
-    """Generates a chat response from the persona. Higher level = higher temperature for more varied tone."""
+def _chat_request(req):
+    """Model and messages for a persona chat turn. Higher level = higher temperature for more varied tone."""
     level = max(1, min(8, getattr(req, "level", 1) or 1))
     temperature = 0.75 if level <= 3 else 0.85  # more variation at higher levels
     llm = _get_llm(temperature=temperature)
@@ -316,10 +295,43 @@ async def generate_chat_response(req) -> dict:
             messages.append(HumanMessage(content=m.content))
         else:
             messages.append(AIMessage(content=m.content))
-            
+    return llm, messages
+
+async def generate_chat_response(req) -> dict:
+    """Generates a chat response from the persona."""
+    llm, messages = _chat_request(req)
     response = await llm.ainvoke(messages)
     return {"reply": response.content}
 
+def stream_chat_response(req):
+    """Streams the persona's reply: token events as text arrives, then done with the same reply as generate_chat_response."""
+    llm, messages = _chat_request(req)
+    return _stream_reply(llm, messages)
+
+
+async def _stream_reply(llm, messages):
+    """
+    Yields {"event": "token", "data": {"text"}} per streamed chunk, then {"event": "done", "data":
+    {"reply", "ttft_ms", "total_ms"}}. The chunks are merged the way ainvoke merges them, so the final
+    reply has the same shape as the non-streaming response.
+    """
+    started = time.perf_counter()
+    ttft_ms = None
+    message = None
+    async for chunk in llm.astream(messages):
+        message = chunk if message is None else message + chunk
+        text = chunk.text
+        if not text:
+            continue
+        if ttft_ms is None:
+            ttft_ms = (time.perf_counter() - started) * 1000
+        yield {"event": "token", "data": {"text": text}}
+    total_ms = (time.perf_counter() - started) * 1000
+    llm_clients.record_stream(ttft_ms, total_ms)
+    yield {"event": "done", "data": {
+        "reply": message.content if message is not None else "", "ttft_ms": ttft_ms, "total_ms": total_ms,
+    }}
+
 
 def _review_system_prompt(req) -> str:
     hint = "Respond in Arabic when possible." if req.language_hint == "ar" else "Respond in English."
@@ -413,9 +425,9 @@ def _interviewer_system_prompt(req: InterviewChatRequest) -> str:
     return f"{role_en}\n{style_en}\n{job_context}\n{constraint_en}\nSpeak in English."
 
 
-async def generate_interview_chat(req: InterviewChatRequest) -> dict:
+def _interview_request(req: InterviewChatRequest):
     """
-    Generates a response from the AI Interviewer. 
+    Model and messages for an interviewer turn.
     Supports multimodal input (text + image) using Gemini 2.5 Flash.
     """
     # Use Flash for speed and multimodal capabilities
@@ -444,10 +456,19 @@ async def generate_interview_chat(req: InterviewChatRequest) -> dict:
 
     if len(messages) == 1: # Only system prompt
         messages.append(HumanMessage(content="Hello, I am ready. Please start the interview."))
+    return llm, messages
 
+async def generate_interview_chat(req: InterviewChatRequest) -> dict:
+    """Generates a response from the AI Interviewer."""
+    llm, messages = _interview_request(req)
     response = await llm.ainvoke(messages)
     return {"reply": response.content}
 
+def stream_interview_chat(req: InterviewChatRequest):
+    """Streams the interviewer's reply; events as in stream_chat_response."""
+    llm, messages = _interview_request(req)
+    return _stream_reply(llm, messages)
+
 
 async def generate_interview_feedback(req: InterviewFeedbackRequest) -> dict:
     """
@@ -1,11 +1,29 @@
 import os
+import stat
+import re
+import time
+import uuid
+import base64
+import hashlib
+import mimetypes
 import shutil
+import struct
+import asyncio
+import threading
 import subprocess
 import tempfile
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from fastapi import HTTPException
-from typing import Dict, Optional, List, Any
+from typing import Dict, Optional, List, Any, AsyncIterator, Callable, Iterator, Tuple, Set
 import logging
 
+from infrastructure.file_locks import lock_file
+from infrastructure.session_registry import NODE_ID, FileSessionRegistry
+from application.search_index import SessionIndex
+from infrastructure.archive_stream import TarGzStream, ZipStream, read_chunks
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -13,120 +31,1156 @@ logger = logging.getLogger(__name__)
 # --- Configuration ---
 MAX_FILE_SIZE = 1 * 1024 * 1024  # 1MB per file (optimized for browser display)
 MAX_FILES = 300                 # Increased slightly
-CLONE_TIMEOUT = 60
+CLONE_TIMEOUT = 60              # async clones: seconds without progress output before giving up
+CLONE_JOB_TTL = 5 * 60          # started clone jobs whose stream is never opened are dropped after this
+EXCLUDE_DIRS = {'.git', '.next', 'node_modules', '__pycache__', 'dist', 'build'}
+MANIFEST_MAX_ENTRIES = int(os.environ.get("REPO_MANIFEST_MAX_ENTRIES", 20000))
+READ_WORKERS = int(os.environ.get("REPO_READ_WORKERS", min(32, (os.cpu_count() or 1) * 4)))  # shared by all requests
+READ_BATCH_FILES = 64  # files per pool task (amortises task overhead for small files)
+READ_BATCH_BYTES = 4 * 1024 * 1024
+READ_WINDOW = READ_WORKERS * 2  # batches in flight per walk
+BINARY_SNIFF_BYTES = 8000  # same heuristic as git: a NUL byte in the first 8000 bytes means binary
+HASH_CHUNK = 1024 * 1024
+HASH_CACHE_ENTRIES = 50000  # blob ids per (device, inode, mtime, size); hardlinked base files are hashed once
+# Text types served under their own name; other text files (source code of any language) as text/plain
+TEXT_MEDIA_TYPES = {"text/html", "text/css", "text/csv", "text/markdown", "text/xml", "application/json",
+                    "application/javascript", "text/javascript", "application/xml", "image/svg+xml"}
+
+# Session lifecycle: idle sessions expire, and total checkout size is capped (LRU eviction)
+SESSIONS_DIR = os.environ.get("REPO_SESSIONS_DIR", os.path.join(tempfile.gettempdir(), "interna-repo-sessions"))
+SESSION_IDLE_TTL = int(os.environ.get("REPO_SESSION_IDLE_TTL", 2 * 60 * 60))  # seconds
+SESSION_DISK_QUOTA = int(os.environ.get("REPO_SESSION_DISK_QUOTA", 2 * 1024 * 1024 * 1024))  # bytes
+# Saves enforce the quota inline only after a session grew this much; the reaper covers the rest
+QUOTA_CHECK_GROWTH = int(os.environ.get("REPO_QUOTA_CHECK_GROWTH", 64 * 1024 * 1024))  # bytes
+REAPER_INTERVAL = 60
+
+# Sessions of the same repo + commit share one read-only base checkout, hardlinked into each
+# session; writes replace the link with a new file. Bases live inside SESSIONS_DIR (same filesystem)
+# and are recorded in the registry, so every worker on the node sees, reuses and accounts for them.
+SHARED_BASES = os.environ.get("REPO_SHARED_BASES", "1") == "1"
+BASES_DIR = os.path.join(SESSIONS_DIR, ".bases")
+
+# Session records shared by all workers on a node; point it at shared storage for several replicas
+REGISTRY_DIR = os.environ.get("REPO_REGISTRY_DIR", os.path.join(SESSIONS_DIR, ".registry"))
+
+# Session history: every save is a commit in the session checkout
+GIT_IDENTITY = ["-c", "user.name=Interna IDE", "-c", "user.email=ide@interna.local", "-c", "commit.gpgsign=false"]
+GIT_TIMEOUT = 30
+MAX_DIFF_SIZE = 2 * 1024 * 1024
+MAX_BATCH_FILES = 500  # edits per write_files call
+MAX_RECORDED_CHANGES = int(os.environ.get("REPO_MAX_RECORDED_CHANGES", 5000))  # paths kept in a session's change log
+REVISION_RE = re.compile(r"^[0-9a-f]{4,40}$")
+
+# `git clone --progress` phases and the slice of the overall percentage each one covers
+CLONE_PHASES = {
+    "counting objects": (0, 5),
+    "compressing objects": (5, 10),
+    "receiving objects": (10, 80),
+    "resolving deltas": (80, 95),
+    "updating files": (95, 100),
+}
+CLONE_PROGRESS_RE = re.compile(r"^(?:remote: )?([A-Za-z ]+):\s+(\d+)%")
+
+# Search: each session gets a trigram/symbol index, built in the background after creation
+INDEX_WORKERS = int(os.environ.get("REPO_INDEX_WORKERS", 2))
+INDEX_WAIT = 5  # seconds a query waits for a build in progress before answering from a partial index
+
+# Export: already-compressed formats are zipped without recompressing, and files still shared with
+# a base checkout reuse deflate data cached per base (<base path>.deflate/<blob id>)
+PRECOMPRESSED_EXTENSIONS = {
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif", ".zip", ".gz", ".tgz", ".bz2", ".xz", ".zst", ".7z",
+    ".rar", ".jar", ".whl", ".woff", ".woff2", ".mp3", ".mp4", ".m4a", ".mov", ".webm", ".ogg", ".docx", ".xlsx", ".pptx",
+}
+EXPORT_CACHE_SUFFIX = ".deflate"
+_DEFLATE_HEADER = struct.Struct("<IQQ")  # crc32, size, compressed size
+
+_hash_cache: "OrderedDict[Tuple[int, int, int, int], str]" = OrderedDict()
+_hash_cache_lock = threading.Lock()
+
+_read_pool = ThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix="repo-read")
+_index_pool = ThreadPoolExecutor(max_workers=INDEX_WORKERS, thread_name_prefix="repo-index")
+
+
+def _dir_size(path: str, exclusive: bool = False) -> int:
+    """Bytes used under path; exclusive=True skips hardlinked files (they belong to a shared base)."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for file in files:
+            try:
+                st = os.lstat(os.path.join(root, file))
+            except OSError:
+                continue
+            if not exclusive or st.st_nlink == 1:
+                total += st.st_size
+    return total
+
+
+def _freeze(path: str):
+    """
+    Makes the worktree files of a base read-only. Sessions hardlink them, so an in-place write
+    through any session (an editor, executed code) would change the base and every other session
+    on that commit; session writes replace the file instead (_write_atomic, git checkout).
+    """
+    for root, dirs, files in os.walk(path):
+        if root == path and ".git" in dirs:
+            dirs.remove(".git")
+        for file in files:
+            file_path = os.path.join(root, file)
+            st = os.lstat(file_path)
+            if stat.S_ISREG(st.st_mode):
+                os.chmod(file_path, stat.S_IMODE(st.st_mode) & ~0o222)
+
+
+def _materialize(base_path: str, dest: str, git_dir: str):
+    """
+    Creates a session checkout from a base by hardlinking every file; the base's .git goes to
+    git_dir, outside the checkout. Git replaces index, refs and config via lockfile + rename,
+    so links to them are safe; only reflogs are appended in place, so .git/logs is copied.
+    Worktree files are read-only (see _freeze). Falls back to copying when linking fails.
+    """
+    base_git = os.path.join(base_path, ".git")
+    logs_dir = os.path.join(base_git, "logs")
+    for root, dirs, files in os.walk(base_path):
+        if root == base_git or root.startswith(base_git + os.sep):
+            target_root = os.path.join(git_dir, os.path.relpath(root, base_git))
+        else:
+            target_root = os.path.join(dest, os.path.relpath(root, base_path))
+        os.makedirs(target_root, exist_ok=True)
+        copy_only = root == logs_dir or root.startswith(logs_dir + os.sep)
+        for file in files:
+            src, dst = os.path.join(root, file), os.path.join(target_root, file)
+            if os.path.islink(src):
+                os.symlink(os.readlink(src), dst)
+                continue
+            if not copy_only:
+                try:
+                    os.link(src, dst)
+                    continue
+                except OSError:
+                    pass
+            shutil.copy2(src, dst)
+
+
+def _write_atomic(path: str, content: str):
+    """
+    Writes a file via a temp file in the same directory and a rename, so readers never see a
+    partial file. Renaming over a hardlink also leaves the shared base's copy untouched, and the
+    new file is the session's own, so it gets its owner write bit back.
+    """
+    directory, name = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        try:
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(path).st_mode) | 0o200)
+        except FileNotFoundError:
+            os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _blob_hash(data: bytes) -> str:
+    """Git blob id of some content, the same hash the manifest reports."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def _file_hash(path: str) -> str:
+    """Blob id of a file on disk; "" if it does not exist."""
+    try:
+        f = open(path, "rb")
+    except (FileNotFoundError, IsADirectoryError):
+        return ""
+    with f:
+        return _blob_id(f)
+
+
+def _blob_id(f) -> str:
+    """
+    Blob id of an open binary file, hashed in chunks (never loaded whole) and cached by inode,
+    mtime and size; atomic writes create a new inode, so edits never hit a stale entry.
+    The file is left positioned at its start.
+    """
+    st = os.fstat(f.fileno())
+    key = (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+    with _hash_cache_lock:
+        blob_id = _hash_cache.get(key)
+        if blob_id is not None:
+            _hash_cache.move_to_end(key)
+            return blob_id
+    f.seek(0)
+    digest = hashlib.sha1(b"blob %d\0" % st.st_size)
+    for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+        digest.update(chunk)
+    f.seek(0)
+    blob_id = digest.hexdigest()
+    with _hash_cache_lock:
+        _hash_cache[key] = blob_id
+        if len(_hash_cache) > HASH_CACHE_ENTRIES:
+            _hash_cache.popitem(last=False)
+    return blob_id
+
+
+def _media_type(path: str) -> str:
+    """Content type from the extension, checked against the first bytes (binary vs text)."""
+    with open(path, "rb") as f:
+        head = f.read(BINARY_SNIFF_BYTES)
+    guessed, _ = mimetypes.guess_type(path)
+    if _is_binary(head):
+        return guessed or "application/octet-stream"
+    if guessed in TEXT_MEDIA_TYPES:
+        return f"{guessed}; charset=utf-8"
+    return "text/plain; charset=utf-8"
+
+
+def _is_binary(data: bytes) -> bool:
+    return b"\0" in data[:BINARY_SNIFF_BYTES]
+
+
+def _is_excluded(rel_path: str) -> bool:
+    return any(part in EXCLUDE_DIRS for part in rel_path.split("/")[:-1])
+
+
+def _scan_files(repo_path: str, exclude: Set[str]) -> Iterator[Tuple[str, str, os.stat_result]]:
+    """
+    Yields (rel_path, full_path, stat) for regular files, depth first.
+    Uses os.scandir so file type and size come from the directory entry
+    instead of separate isdir/getsize calls per file.
+    """
+    stack = [repo_path]
+    while stack:
+        current = stack.pop()
+        try:
+            entries = list(os.scandir(current))
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in exclude:
+                        subdirs.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    rel_path = os.path.relpath(entry.path, repo_path).replace("\\", "/") # Ensure forward slashes
+                    yield rel_path, entry.path, entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+        stack.extend(reversed(subdirs))
+
+
+def _read_text(f_path: str, size: int, max_size: Optional[int]) -> Tuple[Optional[str], Optional[str]]:
+    if max_size is not None and size > max_size:
+        return None, "too_large"
+    try:
+        with open(f_path, "r", encoding="utf-8") as f:
+            return f.read(), None
+    except UnicodeDecodeError:
+        return None, "binary"
+    except OSError:
+        return None, "unreadable"
+
+
+def _read_batch(batch: List[Tuple[str, str, int]], max_size: Optional[int]) -> List[Tuple[str, Optional[str], Optional[str]]]:
+    return [(rel_path, *_read_text(f_path, size, max_size)) for rel_path, f_path, size in batch]
+
+
+def iter_text_files(
+    repo_path: str,
+    exclude: Set[str] = EXCLUDE_DIRS,
+    max_size: Optional[int] = MAX_FILE_SIZE,
+) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+    """
+    Walks a checkout lazily, yielding (rel_path, content, skip_reason) per file.
+    content is None for files that are skipped (too large, binary, unreadable).
+    Files are read in batches on the shared read pool while the walk continues;
+    at most READ_WINDOW batches are in flight, and results keep walk order.
+    """
+    pending: deque = deque()
+    batch: List[Tuple[str, str, int]] = []
+    batch_bytes = 0
+    try:
+        for rel_path, f_path, st in _scan_files(repo_path, exclude):
+            batch.append((rel_path, f_path, st.st_size))
+            batch_bytes += st.st_size
+            if len(batch) < READ_BATCH_FILES and batch_bytes < READ_BATCH_BYTES:
+                continue
+            pending.append(_read_pool.submit(_read_batch, batch, max_size))
+            batch, batch_bytes = [], 0
+            if len(pending) >= READ_WINDOW:
+                yield from pending.popleft().result()
+        if batch:
+            pending.append(_read_pool.submit(_read_batch, batch, max_size))
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        # Consumer stopped early (MAX_FILES reached, client disconnected)
+        for future in pending:
+            future.cancel()
+
+def _stat_index(repo_path: str) -> Dict[str, Tuple[int, int]]:
+    """(mtime_ns, size) per file, used to spot changes made outside RepoService."""
+    return {
+        rel_path: (st.st_mtime_ns, st.st_size)
+        for rel_path, _, st in _scan_files(repo_path, EXCLUDE_DIRS)
+    }
+
+
+def _git(repo_path: str, *args: str, check: bool = True, git_dir: Optional[str] = None) -> str:
+    """Runs git in repo_path; with git_dir, against that repository and repo_path as its work tree."""
+    location = [f"--git-dir={git_dir}", f"--work-tree={repo_path}"] if git_dir else []
+    result = subprocess.run(
+        ["git", "-C", repo_path, *location, *GIT_IDENTITY, *args],
+        capture_output=True, text=True, errors="replace", timeout=GIT_TIMEOUT,
+    )
+    if check and result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"git {args[0]} failed")
+    return result.stdout
+
+
+def _clean_token(access_token: Optional[str]) -> Optional[str]:
+    if access_token and str(access_token).strip().lower() not in ["", "none", "null"]:
+        return access_token.strip()
+    return None
+
+
+def _auth_env(clean_token: Optional[str]) -> Optional[Dict[str, str]]:
+    """
+    Environment passing the token to git as http.extraheader. Unlike `git clone -c`, config
+    from the environment is not written to the clone's .git/config.
+    """
+    if not clean_token:
+        return None
+    return {
+        **os.environ,
+        "GIT_CONFIG_COUNT": "1",
+        "GIT_CONFIG_KEY_0": "http.extraheader",
+        "GIT_CONFIG_VALUE_0": f"AUTHORIZATION: bearer {clean_token}",
+    }
+
+
+def _rel_path(session: "RepoSession", full_path: str) -> str:
+    return os.path.relpath(full_path, session.repo_path).replace("\\", "/")
+
+
+def _git_manifest(repo_path: str, git_dir: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+    """
+    Manifest from the git index: blob hashes and text/binary detection come from git,
+    so file contents are never read. Returns None if repo_path is not a git checkout.
+    """
+    git_dir = git_dir or os.path.join(repo_path, ".git")
+    if not os.path.isdir(git_dir):
+        return None
+    result = subprocess.run(
+        ["git", "-C", repo_path, f"--git-dir={git_dir}", f"--work-tree={repo_path}", "ls-files", "--stage", "--eol", "-z"],
+        capture_output=True, timeout=CLONE_TIMEOUT,
+    )
+    if result.returncode != 0:
+        return None
+
+    manifest = []
+    for record in result.stdout.decode("utf-8", errors="surrogateescape").split("\0"):
+        if not record:
+            continue
+        # "<mode> <hash> <stage>\ti/<eol> w/<eol> attr/<attr>\t<path>"
+        stage, eol, rel_path = record.split("\t", 2)
+        mode, blob_hash, _ = stage.split(" ")
+        if mode not in ("100644", "100755") or _is_excluded(rel_path):
+            continue  # symlinks, submodules
+        try:
+            size = os.lstat(os.path.join(repo_path, rel_path)).st_size
+        except OSError:
+            continue
+        manifest.append({
+            "path": rel_path,
+            "size": size,
+            "hash": blob_hash,
+            "binary": eol.startswith("i/-text"),
+        })
+        if len(manifest) >= MANIFEST_MAX_ENTRIES:
+            break
+    return manifest
+
+
+def _walk_manifest(repo_path: str) -> List[Dict[str, Any]]:
+    """Manifest for checkouts without git metadata; hashes match git blob ids."""
+    manifest = []
+    for root, dirs, files in os.walk(repo_path):
+        dirs[:] = [d for d in dirs if d not in EXCLUDE_DIRS]
+        for file in files:
+            f_path = os.path.join(root, file)
+            if os.path.islink(f_path):
+                continue
+            with open(f_path, "rb") as f:
+                data = f.read()
+            manifest.append({
+                "path": os.path.relpath(f_path, repo_path).replace("\\", "/"),
+                "size": len(data),
+                "hash": _blob_hash(data),
+                "binary": _is_binary(data),
+            })
+            if len(manifest) >= MANIFEST_MAX_ENTRIES:
+                return manifest
+    return manifest
+
+
+def build_manifest(repo_path: str, git_dir: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Lists the files of a checkout as [{path, size, hash, binary}], capped at MANIFEST_MAX_ENTRIES."""
+    manifest = _git_manifest(repo_path, git_dir)
+    if manifest is None:
+        manifest = _walk_manifest(repo_path)
+    return sorted(manifest, key=lambda entry: entry["path"])
+
+
+class RepoSession:
+    def __init__(self, session_id: str, root: str, owner: Optional[str] = None):
+        self.id = session_id
+        self.root = root
+        self.owner = owner
+        self.created_at = time.time()
+        self.last_access = self.created_at
+        self.registry_touched = self.created_at
+        self.size_bytes = 0
+        self.published_size = 0  # size_bytes as last written to the registry
+        # Change tracking: the version counter and the latest (version, kind) per path live in
+        # the shared registry record; `stat_index` is this worker's (mtime_ns, size) view of
+        # the checkout, current as of `synced_version`.
+        self.version = 0
+        self.synced_version = 0
+        self.stat_index: Dict[str, Tuple[int, int]] = {}
+        # History: `base_commit` is the original checkout; git calls on one session are serialised
+        self.base_commit: Optional[str] = None
+        self.git_lock = threading.Lock()
+        # Writes to one session are serialised across threads (write_lock) and workers (file lock)
+        self.write_lock = threading.RLock()
+        self.write_depth = 0
+        # Shared base checkout this session was materialized from, if any
+        self.base_key: Optional[str] = None
+        # Full-text and symbol index held by this worker; None until built
+        self.index: Optional[SessionIndex] = None
+
+    @property
+    def repo_path(self) -> str:
+        return os.path.join(self.root, "repo")
+
+    @property
+    def git_dir(self) -> str:
+        """The session's history repository; kept outside the checkout, which clients can write to."""
+        return os.path.join(self.root, "history.git")
+
 
 class RepoService:
     def __init__(self):
-        self.active_sessions: Dict[str, str] = {}
+        self.active_sessions: Dict[str, RepoSession] = {}
+        self._lock = threading.RLock()
+        self._reaper_task: Optional[asyncio.Task] = None
+        self._metrics = {"created": 0, "expired": 0, "evicted": 0, "removed": 0, "base_hits": 0, "base_clones": 0,
+                         "clones_cancelled": 0}
+        # Shared base checkouts are registry records (registry.bases()); this only keeps async
+        # clones of the same base in one worker from queueing threads on its file lock
+        self._async_base_locks: Dict[str, asyncio.Lock] = {}
+        # Clone jobs started with start_clone: id -> request fields, plus the task once streaming
+        self.clone_jobs: Dict[str, Dict[str, Any]] = {}
+        os.makedirs(SESSIONS_DIR, exist_ok=True)
+        os.makedirs(BASES_DIR, exist_ok=True)
+        self.registry = FileSessionRegistry(REGISTRY_DIR)
 
-    def create_session(self, initial_files: Dict[str, str]) -> str:
-        import uuid
-        session_id = str(uuid.uuid4())
-        temp_root = tempfile.mkdtemp()
-        self.active_sessions[session_id] = temp_root
-        
-        repo_path = os.path.join(temp_root, "repo")
+    # --- Session lifecycle ---
+
+    def _new_session(self, owner: Optional[str] = None) -> RepoSession:
+        session = RepoSession(str(uuid.uuid4()), tempfile.mkdtemp(dir=SESSIONS_DIR), owner)
+        self.registry.register(session.id, session.root, owner)
+        with self._lock:
+            self.active_sessions[session.id] = session
+            self._metrics["created"] += 1
+        return session
+
+    def _get_session(self, session_id: str) -> RepoSession:
+        """Looks up a live session and marks it as recently used."""
+        with self._lock:
+            session = self.active_sessions.get(session_id)
+        if session is None:
+            session = self._adopt(session_id)
+        elif not os.path.isdir(session.root):
+            # Removed by another worker (reaped or evicted)
+            with self._lock:
+                self.active_sessions.pop(session_id, None)
+            raise HTTPException(status_code=404, detail="Session not found or expired")
+        session.last_access = time.time()
+        session.registry_touched = self.registry.touch(session_id, session.registry_touched)
+        return session
+
+    def _adopt(self, session_id: str) -> RepoSession:
+        """
+        Loads a session created by another worker from the registry. Sessions held by another
+        node are refused with 421 and an X-Session-Node header, so the caller can re-route.
+        """
+        record = self.registry.get(session_id)
+        if record is None:
+            raise HTTPException(status_code=404, detail="Session not found or expired")
+        if record["node"] != NODE_ID:
+            raise HTTPException(
+                status_code=421,
+                detail=f"Session is held by node {record['node']}",
+                headers={"X-Session-Node": record["node"]},
+            )
+        if not os.path.isdir(record["root"]):
+            self.registry.remove(session_id)
+            raise HTTPException(status_code=404, detail="Session not found or expired")
+
+        session = RepoSession(session_id, record["root"], record.get("owner"))
+        session.created_at = record["created_at"]
+        session.base_commit = record.get("base_commit")
+        session.base_key = record.get("base_key")
+        session.version = session.synced_version = record.get("version", 0)
+        session.stat_index = _stat_index(session.repo_path)
+        session.size_bytes = _dir_size(session.root, exclusive=True)
+        with self._lock:
+            return self.active_sessions.setdefault(session_id, session)
+
+    def session_info(self, session_id: str) -> Dict[str, Any]:
+        """Registry record of a session (node, owner, last access, version), from any worker or node."""
+        record = self.registry.get(session_id)
+        if record is None:
+            raise HTTPException(status_code=404, detail="Session not found or expired")
+        return {key: value for key, value in record.items() if key not in ("root", "pid", "changes")}
+
+    def _init_history(self, session: RepoSession):
+        """
+        Gives the checkout a history repository at session.git_dir (moving a clone's .git there,
+        or creating one) and records its base commit.
+        """
+        repo_path, git_dir = session.repo_path, session.git_dir
+        with session.git_lock:
+            clone_git = os.path.join(repo_path, ".git")
+            if os.path.isdir(clone_git) and not os.path.exists(git_dir):
+                os.replace(clone_git, git_dir)
+            if not os.path.isdir(git_dir):
+                _git(repo_path, "init", "-q", git_dir=git_dir)
+                _git(repo_path, "add", "-A", git_dir=git_dir)
+                _git(repo_path, "commit", "-q", "--no-verify", "--allow-empty", "-m", "v0: initial files", git_dir=git_dir)
+            session.base_commit = _git(repo_path, "rev-parse", "HEAD", git_dir=git_dir).strip()
+        self.registry.update(session.id, base_commit=session.base_commit, base_key=session.base_key)
+
+    def _commit_save(self, session: RepoSession, rel_paths: List[str], message: str):
+        """Records one save as a commit touching only those paths. Failures never fail the save."""
+        if session.base_commit is None:
+            return
+        try:
+            with session.git_lock:
+                _git(session.repo_path, "add", "-A", "--", *rel_paths, git_dir=session.git_dir)
+                _git(session.repo_path, "commit", "-q", "--no-verify", "--allow-empty", "-m", message, "--", *rel_paths,
+                     git_dir=session.git_dir)
+        except (RuntimeError, subprocess.TimeoutExpired) as e:
+            logger.warning(f"Could not record save of {', '.join(rel_paths)} in session {session.id}: {e}")
+
+    @contextmanager
+    def _write_lock(self, session: RepoSession):
+        """Holds the session's write lock; re-entrant within a thread, and a file lock on the session's lock file."""
+        with session.write_lock:
+            session.write_depth += 1
+            try:
+                if session.write_depth > 1:
+                    yield
+                    return
+                with open(os.path.join(session.root, "write.lock"), "a") as lock:
+                    lock_file(lock)
+                    yield
+            finally:
+                session.write_depth -= 1
+
+    def _resolve_revision(self, session: RepoSession, revision: Optional[str], default: str) -> str:
+        revision = (revision or default).lower()
+        if revision == "base":
+            if session.base_commit is None:
+                raise HTTPException(status_code=409, detail="Session has no history")
+            return session.base_commit
+        if revision == "head":
+            return "HEAD"
+        if not REVISION_RE.match(revision):
+            raise HTTPException(status_code=400, detail="Invalid revision")
+        return revision
+
+    def _track_size(self, session: RepoSession):
+        """Records the checkout size of a freshly populated session and enforces the disk quota."""
+        session.size_bytes = _dir_size(session.root, exclusive=True)
+        session.stat_index = _stat_index(session.repo_path)
+        self._enforce_quota(keep=session.id)
+
+    def _adjust_size(self, session: RepoSession, delta: int):
+        with self._lock:
+            session.size_bytes = max(0, session.size_bytes + delta)
+
+    def _publish_sizes(self):
+        """Writes this worker's changed session sizes to the registry, where other workers' quota passes read them."""
+        with self._lock:
+            changed = [s for s in self.active_sessions.values() if s.size_bytes != s.published_size]
+        for session in changed:
+            size = session.size_bytes
+            if self.registry.update(session.id, size_bytes=size) is not None:
+                session.published_size = size
+
+    def _check_quota(self, session: RepoSession):
+        """
+        Called after a save or restore. Enforces the quota right away only once the session grew
+        by QUOTA_CHECK_GROWTH since its size was last published; otherwise the reaper does it.
+        """
+        if session.size_bytes - session.published_size >= QUOTA_CHECK_GROWTH:
+            self._enforce_quota(keep=session.id)
+
+    def _enforce_quota(self, keep: Optional[str] = None):
+        """
+        Evicts least-recently-used sessions of this node (any worker's) until the node's total
+        size fits the quota; unused bases go first. Under the quota this reads the registry once.
+        """
+        self._publish_sizes()
+        sessions = self._node_sessions()
+        session_bytes = sum(size for _, _, size in sessions)
+        total = session_bytes + sum(b["size_bytes"] for b in self.registry.bases())
+        if total <= SESSION_DISK_QUOTA:
+            return
+        if self._reap_bases(idle_for=0, needed=total - SESSION_DISK_QUOTA):
+            total = session_bytes + sum(b["size_bytes"] for b in self.registry.bases())
+        evicted = []
+        for session_id, _, size in sorted(sessions, key=lambda s: s[1]):
+            if total <= SESSION_DISK_QUOTA:
+                break
+            if session_id != keep:
+                total -= size
+                evicted.append(session_id)
+        for session_id in evicted:
+            logger.info(f"Evicting session {session_id} (disk quota)")
+            if self.cleanup_session(session_id):
+                self._metrics["evicted"] += 1
+        if evicted:
+            # Bases only the evicted sessions used can go now as well
+            self._reap_bases(idle_for=0, needed=self._disk_usage() - SESSION_DISK_QUOTA)
+            total = self._disk_usage()
+        if total > SESSION_DISK_QUOTA:
+            logger.warning(f"Repo sessions use {total} bytes, above the {SESSION_DISK_QUOTA} byte quota")
+
+    def _record_changes(self, session: RepoSession, changes: List[Tuple[str, str]]) -> Dict[str, Any]:
+        """
+        Records (path, kind) changes that form one save in the shared record: the session version
+        goes up once for all of them. Returns the updated record. Caller holds self._lock.
+        """
+        def apply(record: Dict[str, Any]):
+            record["version"] += 1
+            for rel_path, kind in changes:
+                previous = record["changes"].get(rel_path)
+                merged = kind
+                if previous and previous[1] == "added" and kind == "modified":
+                    merged = "added"  # still new relative to anything before it was added
+                record["changes"][rel_path] = [record["version"], merged]
+            excess = len(record["changes"]) - MAX_RECORDED_CHANGES
+            if excess > 0:
+                # Oldest entries go; clients behind the newest dropped version must re-read the tree
+                oldest = sorted(record["changes"].items(), key=lambda item: item[1][0])[:excess]
+                for rel_path, _ in oldest:
+                    del record["changes"][rel_path]
+                record["changes_floor"] = oldest[-1][1][0]
+            record["last_access"] = time.time()
+
+        record = self.registry.update(session.id, apply)
+        if record is None:
+            raise HTTPException(status_code=404, detail="Session not found or expired")
+        session.version = record["version"]
+        for rel_path, _ in changes:
+            self._restat(session, rel_path)
+        if session.synced_version == session.version - 1:
+            session.synced_version = session.version
+        return record
+
+    def _sync_recorded_changes(self, session: RepoSession, record: Dict[str, Any]) -> List[str]:
+        """Re-stats the paths other workers recorded since our last look and returns them. Caller holds self._lock."""
+        paths = [p for p, (version, _) in record["changes"].items() if version > session.synced_version]
+        for rel_path in paths:
+            self._restat(session, rel_path)
+        session.version = session.synced_version = record["version"]
+        return paths
+
+    def _restat(self, session: RepoSession, rel_path: str):
+        try:
+            st = os.lstat(os.path.join(session.repo_path, rel_path))
+            session.stat_index[rel_path] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            session.stat_index.pop(rel_path, None)
+
+    def _detect_external_changes(self, session: RepoSession) -> Dict[str, Any]:
+        """
+        Records files changed outside RepoService (e.g. by a sandbox run) by comparing mtime/size.
+        Paths other workers recorded since our last look are re-stated first, so their edits are
+        not counted twice. Returns the up-to-date registry record.
+        """
+        with self._write_lock(session):
+            record = self.registry.get(session.id)
+            if record is None:
+                raise HTTPException(status_code=404, detail="Session not found or expired")
+            current = _stat_index(session.repo_path)
+            with self._lock:
+                changed = self._sync_recorded_changes(session, record)
+                known = session.stat_index
+                changes = [(rel_path, "added" if rel_path not in known else "modified")
+                           for rel_path, stamp in current.items() if known.get(rel_path) != stamp]
+                changes += [(rel_path, "deleted") for rel_path in known if rel_path not in current]
+                if changes:
+                    record = self._record_changes(session, changes)  # one version and one registry write
+                    changed += [rel_path for rel_path, _ in changes]
+                session.stat_index = current
+            self._reindex(session, changed)
+        return record
+
+    # --- Search index ---
+
+    def _start_index(self, session: RepoSession):
+        """Builds the session's search index on the index pool, once per worker."""
+        with self._lock:
+            if session.index is not None:
+                return
+            index = session.index = SessionIndex()
+        files = ((rel_path, content) for rel_path, content, _ in iter_text_files(session.repo_path))
+        _index_pool.submit(index.build, files)
+
+    def _reindex(self, session: RepoSession, paths: List[str]):
+        """Re-reads changed paths into the session's index; files that are gone or no longer text are dropped."""
+        index = session.index
+        if index is None:
+            return
+        for rel_path in paths:
+            if _is_excluded(rel_path):
+                continue
+            f_path = os.path.join(session.repo_path, rel_path)
+            try:
+                content, _ = _read_text(f_path, os.path.getsize(f_path), MAX_FILE_SIZE)
+            except OSError:
+                content = None
+            if content is None:
+                index.remove(rel_path)
+            else:
+                index.add(rel_path, content)
+
+    def _index(self, session: RepoSession) -> SessionIndex:
+        """The session's index, brought up to date with edits made through other workers."""
+        self._start_index(session)
+        record = self.registry.get(session.id)
+        if record is None:
+            raise HTTPException(status_code=404, detail="Session not found or expired")
+        with self._lock:
+            changed = self._sync_recorded_changes(session, record)
+        self._reindex(session, changed)
+        session.index.ready.wait(INDEX_WAIT)
+        return session.index
+
+    def _node_sessions(self) -> List[Tuple[str, float, int]]:
+        """(session id, last access, bytes) of every session on this node, from the registry."""
+        with self._lock:
+            local = {s.id: s for s in self.active_sessions.values()}
+        sessions = []
+        for record in self.registry.records(node=NODE_ID):
+            session = local.get(record["session_id"])
+            if session is not None:
+                sessions.append((session.id, max(session.last_access, record["last_access"]), session.size_bytes))
+            else:
+                sessions.append((record["session_id"], record["last_access"], record.get("size_bytes", 0)))
+        return sessions
+
+    def _disk_usage(self) -> int:
+        return sum(size for _, _, size in self._node_sessions()) + sum(b["size_bytes"] for b in self.registry.bases())
+
+    def _use_base(self, key: str) -> Optional[str]:
+        """Marks a recorded base as used and returns its path; None if there is none (or it vanished)."""
+        record = self.registry.update_base(key, last_used=time.time())
+        if record is None:
+            return None
+        if not os.path.isdir(record["path"]):
+            self.registry.remove_base(key)
+            return None
+        self._metrics["base_hits"] += 1
+        return record["path"]
+
+    def _reap_bases(self, idle_for: float = SESSION_IDLE_TTL, needed: Optional[int] = None) -> int:
+        """
+        Removes base checkouts no session on this node uses, least recently used first, once they
+        have been idle for `idle_for` seconds. With `needed`, stops after freeing that many bytes.
+        Bases locked by another worker (being cloned or handed to a session) are skipped.
+        """
+        if needed is not None and needed <= 0:
+            return 0
+        cutoff = time.time() - idle_for
+        in_use = {r.get("base_key") for r in self.registry.records(node=NODE_ID)}
+        removed = 0
+        for base in sorted(self.registry.bases(), key=lambda b: b["last_used"]):
+            if needed is not None and needed <= 0:
+                break
+            if base["last_used"] > cutoff:
+                continue
+            lock = self.registry.lock_base(base["key"], blocking=False)
+            if lock is None:
+                continue
+            with lock:
+                # Re-checked under the lock. A session that took the base after in_use was read
+                # did so under this lock and bumped last_used past the cutoff first
+                base = self.registry.get_base(base["key"])
+                if base is None or base["last_used"] > cutoff or base["key"] in in_use:
+                    continue
+                self.registry.remove_base(base["key"])
+                shutil.rmtree(base["path"], ignore_errors=True)
+                shutil.rmtree(base["path"] + EXPORT_CACHE_SUFFIX, ignore_errors=True)
+            needed = None if needed is None else needed - base["size_bytes"]
+            removed += 1
+        return removed
+
+    def reap_expired(self) -> int:
+        """
+        Removes sessions on this node idle for longer than SESSION_IDLE_TTL, including sessions
+        created by other workers. Returns how many were removed.
+        """
+        cutoff = time.time() - SESSION_IDLE_TTL
+        with self._lock:
+            local = {s.id: s.last_access for s in self.active_sessions.values()}
+        expired = [s_id for s_id, last_access in local.items() if last_access < cutoff]
+        for record in self.registry.records(node=NODE_ID):
+            s_id = record["session_id"]
+            if s_id not in local and record["last_access"] < cutoff:
+                expired.append(s_id)
+        removed = 0
+        for session_id in expired:
+            if self.cleanup_session(session_id):
+                removed += 1
+        self._metrics["expired"] += removed
+        if removed:
+            logger.info(f"Reaped {removed} idle repo sessions")
+        bases = self._reap_bases()
+        if bases:
+            logger.info(f"Removed {bases} unused base checkouts")
+        self._enforce_quota()
+        stale = time.time() - CLONE_JOB_TTL
+        for clone_id, job in list(self.clone_jobs.items()):
+            if job["task"] is None and job["created_at"] < stale:
+                self.clone_jobs.pop(clone_id, None)  # never streamed; drop the stored token
+        return removed
+
+    def _purge_orphans(self):
+        """Deletes checkouts left in SESSIONS_DIR by earlier processes once they are older than the TTL."""
+        with self._lock:
+            live = {s.root for s in self.active_sessions.values()}
+        for base in self.registry.bases():
+            live |= {base["path"], base["path"] + EXPORT_CACHE_SUFFIX}
+        live |= {record["root"] for record in self.registry.records()}
+        live |= {BASES_DIR, REGISTRY_DIR}
+        cutoff = time.time() - SESSION_IDLE_TTL
+        for directory in (SESSIONS_DIR, BASES_DIR):
+            for entry in os.scandir(directory):
+                if entry.path not in live and entry.is_dir(follow_symlinks=False) and entry.stat().st_mtime < cutoff:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+
+    async def _reaper(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.reap_expired)
+                await asyncio.to_thread(self._purge_orphans)
+            except Exception as e:
+                logger.error(f"Repo session reaper failed: {e}")
+            await asyncio.sleep(REAPER_INTERVAL)
+
+    def start_reaper(self):
+        if self._reaper_task is None:
+            self._reaper_task = asyncio.get_running_loop().create_task(self._reaper())
+
+    def stop_reaper(self):
+        if self._reaper_task is not None:
+            self._reaper_task.cancel()
+            self._reaper_task = None
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            sessions = list(self.active_sessions.values())
+        now = time.time()
+        bases = list(self.registry.bases())
+        base_bytes = sum(b["size_bytes"] for b in bases)
+        base_count = len(bases)
+        return {
+            "node": NODE_ID,
+            "live_sessions": len(sessions),
+            "bytes_on_disk": sum(s.size_bytes for s in sessions) + base_bytes,
+            "shared_bases": base_count,
+            "shared_base_bytes": base_bytes,
+            "disk_quota": SESSION_DISK_QUOTA,
+            "idle_ttl": SESSION_IDLE_TTL,
+            "oldest_idle_seconds": max((now - s.last_access for s in sessions), default=0),
+            **self._metrics,
+        }
+
+    # --- Sessions ---
+
+    def create_session(self, initial_files: Dict[str, str], owner: Optional[str] = None) -> str:
+        session = self._new_session(owner)
+        repo_path = session.repo_path
         os.makedirs(repo_path, exist_ok=True)
 
-        for rel_path, content in initial_files.items():
-            full_path = os.path.join(repo_path, rel_path)
-            os.makedirs(os.path.dirname(full_path), exist_ok=True)
-            with open(full_path, "w", encoding="utf-8") as f:
-                f.write(content)
-        
-        return session_id
+        try:
+            for rel_path, content in initial_files.items():
+                full_path = self._resolve_path(session, rel_path)
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                with open(full_path, "w", encoding="utf-8") as f:
+                    f.write(content)
+        except HTTPException:
+            self.cleanup_session(session.id)
+            raise
+
+        self._init_history(session)
+        self._track_size(session)
+        self._start_index(session)
+        return session.id
 
     def get_session_files(self, session_id: str) -> Dict[str, str]:
-        if session_id not in self.active_sessions:
-            raise HTTPException(status_code=404, detail="Session not found")
-        
-        temp_root = self.active_sessions[session_id]
-        repo_path = os.path.join(temp_root, "repo")
-        repo_data = {}
+        repo_path = self._get_session(session_id).repo_path
+        return {
+            rel_path: content
+            for rel_path, content, _ in iter_text_files(repo_path, exclude={".git"}, max_size=None)
+            if content is not None
+        }
+
+    def changes_since(self, session_id: str, since: int = 0) -> Dict[str, Any]:
+        """
+        Files added, modified or deleted after version `since`, with contents for the first two.
+        Version 0 is the session's initial checkout. Clients store the returned version and pass
+        it back next time instead of re-reading the whole tree. The change log keeps the newest
+        MAX_RECORDED_CHANGES paths; older versions answer 410 and the client re-reads the tree.
+        """
+        session = self._get_session(session_id)
+        record = self._detect_external_changes(session)
+        version = record["version"]
+        if since > version:
+            raise HTTPException(status_code=409, detail=f"Unknown version {since}; session is at {version}")
+        floor = record.get("changes_floor", 0)
+        if since < floor:
+            raise HTTPException(status_code=410, detail=f"Changes before version {floor} were compacted; re-read the files")
+        changed = [(p, kind) for p, (v, kind) in record["changes"].items() if v > since]
+
+        added, modified, deleted, skipped = {}, {}, [], {}
+        for rel_path, kind in sorted(changed):
+            if kind == "deleted":
+                deleted.append(rel_path)
+                continue
+            f_path = os.path.join(session.repo_path, rel_path)
+            try:
+                st = os.lstat(f_path)
+            except OSError:
+                deleted.append(rel_path)  # removed again since it was recorded
+                continue
+            if not stat.S_ISREG(st.st_mode):
+                skipped[rel_path] = "not_a_file"  # e.g. replaced by a symlink
+                continue
+            size = st.st_size
+            content, reason = _read_text(f_path, size, MAX_FILE_SIZE)
+            if content is None:
+                skipped[rel_path] = reason
+            else:
+                (added if kind == "added" else modified)[rel_path] = content
+
+        return {
+            "session_id": session_id,
+            "since": since,
+            "version": version,
+            "added": added,
+            "modified": modified,
+            "deleted": deleted,
+            "skipped": skipped,
+        }
+
+    def _clone_commands(self, github_url: str, branch: str, clean_token: Optional[str], dest: str,
+                        progress: bool = False) -> Tuple[List[str], Optional[List[str]]]:
+        """
+        The clone command and, when a token is used, the tokenless retry for public repos.
+        The token itself is passed in the environment (_auth_env).
+        """
+        extra = ["--progress"] if progress else []
+        # Use strict checking to prevent command injection if possible, though git clone is generally safe with urls
+        clone_cmd = ["git", "clone", *extra, "--depth", "1", "--single-branch", "--branch", branch, github_url, dest]
+        retry_cmd = ["git", "clone", *extra, "--depth", "1", github_url, dest] if clean_token else None
+        return clone_cmd, retry_cmd
+
+    def _clone_error(self, stderr: str, branch: str, clean_token: Optional[str]) -> HTTPException:
+        err = stderr.replace(clean_token, "****") if clean_token else stderr
+        # Check for "Remote branch not found" to give a better error
+        if "Remote branch" in err and "not found" in err:
+            return HTTPException(status_code=404, detail=f"Branch '{branch}' not found in repository.")
+        return HTTPException(status_code=400, detail=f"Git Error: {err}")
+
+    def _clone(self, github_url: str, branch: str, clean_token: Optional[str], dest: str):
+        """Shallow-clones into dest, retrying without the token for public repos. Raises HTTPException."""
+        clone_cmd, retry_cmd = self._clone_commands(github_url, branch, clean_token, dest)
+
+        logger.info(f"Cloning {github_url} (branch: {branch})...")
         
-        for root, _, files in os.walk(repo_path):
-            for file in files:
-                f_path = os.path.join(root, file)
-                rel_path = os.path.relpath(f_path, repo_path).replace("\\", "/")
+        # Execution & Retry Logic
+        result = subprocess.run(clone_cmd, capture_output=True, text=True, timeout=CLONE_TIMEOUT,
+                                env=_auth_env(clean_token))
+
+        if result.returncode != 0 and retry_cmd:
+            logger.warning("Clone failed with token, retrying without token...")
+            # Fallback for public repos if token is invalid
+            shutil.rmtree(dest, ignore_errors=True)
+            result = subprocess.run(retry_cmd, capture_output=True, text=True, timeout=CLONE_TIMEOUT)
+
+        if result.returncode != 0:
+            raise self._clone_error(result.stderr, branch, clean_token)
+
+    async def _run_clone(self, cmd: List[str], on_progress: Callable[[Dict[str, Any]], None],
+                         env: Optional[Dict[str, str]] = None) -> Tuple[int, str]:
+        """
+        Runs one `git clone --progress` as an asyncio subprocess, reporting each new percentage.
+        Gives up after CLONE_TIMEOUT seconds without output; the process is killed on timeout or
+        cancellation. Returns (returncode, stderr without the progress lines).
+        """
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+            env=env,
+        )
+        messages, pending, last = [], "", None
+        try:
+            while True:
                 try:
-                    with open(f_path, "r", encoding="utf-8") as f:
-                        repo_data[rel_path] = f.read()
-                except Exception:
-                    pass
-        return repo_data
+                    chunk = await asyncio.wait_for(proc.stderr.read(4096), CLONE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    raise subprocess.TimeoutExpired(cmd, CLONE_TIMEOUT)
+                if not chunk:
+                    break
+                # git redraws progress lines with \r
+                *lines, pending = re.split(r"[\r\n]", pending + chunk.decode("utf-8", errors="replace"))
+                for line in lines:
+                    match = CLONE_PROGRESS_RE.match(line)
+                    phase = match and match.group(1).strip().lower()
+                    if phase not in CLONE_PHASES:
+                        if line:
+                            messages.append(line)
+                        continue
+                    start, end = CLONE_PHASES[phase]
+                    phase_percent = int(match.group(2))
+                    percent = start + (end - start) * phase_percent // 100
+                    if (phase, phase_percent) != last:
+                        last = (phase, phase_percent)
+                        on_progress({"phase": phase, "phase_percent": phase_percent, "percent": percent})
+            messages.append(pending)
+            return await proc.wait(), "\n".join(messages).strip()
+        finally:
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
 
-    def clone_and_read(self, github_url: str, branch: str = "main", access_token: Optional[str] = None) -> Dict[str, Any]:
-        import uuid
-        session_id = str(uuid.uuid4())
-        temp_root = tempfile.mkdtemp()
-        self.active_sessions[session_id] = temp_root
+    async def _clone_async(self, github_url: str, branch: str, clean_token: Optional[str], dest: str,
+                           on_progress: Callable[[Dict[str, Any]], None]):
+        """Async counterpart of _clone with progress reporting; same retry and error handling."""
+        clone_cmd, retry_cmd = self._clone_commands(github_url, branch, clean_token, dest, progress=True)
+        logger.info(f"Cloning {github_url} (branch: {branch})...")
+        returncode, stderr = await self._run_clone(clone_cmd, on_progress, _auth_env(clean_token))
+        if returncode != 0 and retry_cmd:
+            logger.warning("Clone failed with token, retrying without token...")
+            await asyncio.to_thread(shutil.rmtree, dest, True)
+            returncode, stderr = await self._run_clone(retry_cmd, on_progress)
+        if returncode != 0:
+            raise self._clone_error(stderr, branch, clean_token)
 
-        repo_data = {}
+    def _remote_commit(self, github_url: str, branch: str, clean_token: Optional[str]) -> Optional[str]:
+        """Commit the branch points at, checked with the caller's credentials; None if it cannot be resolved."""
+        cmd = ["git", "ls-remote", "--", github_url, f"refs/heads/{branch}"]
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=CLONE_TIMEOUT, env=_auth_env(clean_token))
+        except subprocess.TimeoutExpired:
+            return None
+        if result.returncode != 0 or not result.stdout.strip():
+            return None
+        return result.stdout.split()[0]
+
+    def _install_base(self, key: str, staging: str) -> str:
+        """Moves a finished clone (staging/repo) into place as the base for key. Caller holds the base lock."""
+        path = os.path.join(BASES_DIR, key)
+        shutil.rmtree(path, ignore_errors=True)  # left over from a base whose record is gone
+        shutil.rmtree(path + EXPORT_CACHE_SUFFIX, ignore_errors=True)
+        _freeze(os.path.join(staging, "repo"))
+        os.replace(os.path.join(staging, "repo"), path)
+        self.registry.put_base(key, path, _dir_size(path))
+        self._metrics["base_clones"] += 1
+        return path
+
+    def _assign_base(self, session: RepoSession, key: str):
+        """Records the session as a user of the base. Caller holds the base lock, so the reaper cannot race it."""
+        session.base_key = key
+        self.registry.update(session.id, base_key=key)
+
+    def _shared_base(self, session: RepoSession, github_url: str, branch: str,
+                     clean_token: Optional[str]) -> Optional[str]:
+        """
+        Path of the read-only base checkout for this repo/branch at its current commit, cloning it
+        on first use, and assigned to session. Only callers whose credentials can see the commit
+        get the base.
+        """
+        commit = self._remote_commit(github_url, branch, clean_token)
+        if commit is None:
+            return None
+        key = hashlib.sha1(f"{github_url}\0{branch}\0{commit}".encode()).hexdigest()[:20]
+        with self.registry.lock_base(key):
+            path = self._use_base(key)
+            if path is None:
+                staging = tempfile.mkdtemp(dir=BASES_DIR)
+                try:
+                    self._clone(github_url, branch, clean_token, os.path.join(staging, "repo"))
+                    path = self._install_base(key, staging)
+                finally:
+                    shutil.rmtree(staging, ignore_errors=True)
+            self._assign_base(session, key)
+            return path
+
+    async def _shared_base_async(self, session: RepoSession, github_url: str, branch: str,
+                                 clean_token: Optional[str],
+                                 on_progress: Callable[[Dict[str, Any]], None]) -> Optional[str]:
+        """Async counterpart of _shared_base; a base clone reports progress to on_progress."""
+        commit = await asyncio.to_thread(self._remote_commit, github_url, branch, clean_token)
+        if commit is None:
+            return None
+        key = hashlib.sha1(f"{github_url}\0{branch}\0{commit}".encode()).hexdigest()[:20]
+        async with self._async_base_locks.setdefault(key, asyncio.Lock()):
+            lock = await asyncio.to_thread(self.registry.lock_base, key)
+            with lock:
+                path = await asyncio.to_thread(self._use_base, key)
+                if path is None:
+                    staging = tempfile.mkdtemp(dir=BASES_DIR)
+                    try:
+                        await self._clone_async(github_url, branch, clean_token, os.path.join(staging, "repo"), on_progress)
+                        path = await asyncio.to_thread(self._install_base, key, staging)
+                    finally:
+                        await asyncio.to_thread(shutil.rmtree, staging, True)
+                await asyncio.to_thread(self._assign_base, session, key)
+                return path
+
+    def clone_session(self, github_url: str, branch: str = "main", access_token: Optional[str] = None,
+                      owner: Optional[str] = None) -> RepoSession:
+        """
+        Clones the repository into a new session. The session is removed again if the clone fails.
+        With REPO_SHARED_BASES, the checkout is hardlinked from a shared base of the same commit.
+        """
+        session = self._new_session(owner)
+        session_id = session.id
 
         try:
-            repo_path = os.path.join(temp_root, "repo")
-            
-            # 1. Token Cleaning
-            clean_token = None
-            if access_token and str(access_token).strip().lower() not in ["", "none", "null"]:
-                clean_token = access_token.strip()
-
-            # 2. Setup Clone Command
-            # Use strict checking to prevent command injection if possible, though git clone is generally safe with urls
-            clone_cmd = ["git", "clone", "--depth", "1", "--single-branch", "--branch", branch]
-            if clean_token:
-                clone_cmd.extend(["-c", f"http.extraheader=AUTHORIZATION: bearer {clean_token}"])
-            clone_cmd.extend([github_url, repo_path])
-
-            logger.info(f"Cloning {github_url} (branch: {branch})...")
-            
-            # 3. Execution & Retry Logic
-            result = subprocess.run(clone_cmd, capture_output=True, text=True, timeout=CLONE_TIMEOUT)
-
-            if result.returncode != 0 and clean_token:
-                logger.warning("Clone failed with token, retrying without token...")
-                # Fallback for public repos if token is invalid
-                shutil.rmtree(repo_path, ignore_errors=True)
-                retry_cmd = ["git", "clone", "--depth", "1", github_url, repo_path]
-                result = subprocess.run(retry_cmd, capture_output=True, text=True, timeout=CLONE_TIMEOUT)
-
-            if result.returncode != 0:
-                err = result.stderr.replace(clean_token, "****") if clean_token else result.stderr
-                # Check for "Remote branch not found" to give a better error
-                if "Remote branch" in err and "not found" in err:
-                     raise HTTPException(status_code=404, detail=f"Branch '{branch}' not found in repository.")
-                raise HTTPException(status_code=400, detail=f"Git Error: {err}")
-
-            # 4. File Extraction Loop
-            count = 0
-            # We also want to exclude .git and maybe other binary/large folders
-            exclude_dirs = {'.git', '.next', 'node_modules', '__pycache__', 'dist', 'build'}
+            repo_path = session.repo_path
             
-            for root, dirs, files in os.walk(repo_path):
-                # Modify dirs in-place to skip excluded directories
-                dirs[:] = [d for d in dirs if d not in exclude_dirs]
-
-                for file in files:
-                    if count >= MAX_FILES: break
-                    
-                    f_path = os.path.join(root, file)
-                    rel_path = os.path.relpath(f_path, repo_path).replace("\\", "/") # Ensure forward slashes
-                    
-                    try:
-                        if os.path.getsize(f_path) <= MAX_FILE_SIZE:
-                            # Try reading as text
-                            with open(f_path, "r", encoding="utf-8") as f:
-                                repo_data[rel_path] = f.read()
-                                count += 1
-                        else:
-                            logger.debug(f"Skipping large file: {rel_path}")
-                    except (UnicodeDecodeError, PermissionError):
-                        # Construct a placeholder for binary files if we want to show them in the tree but not edit
-                        # For now, just skip
-                        continue 
+            clean_token = _clean_token(access_token)
+            base_path = self._shared_base(session, github_url, branch, clean_token) if SHARED_BASES else None
+            if base_path is not None:
+                _materialize(base_path, repo_path, session.git_dir)
+            else:
+                self._clone(github_url, branch, clean_token, repo_path)
 
-            logger.info(f"Extracted {len(repo_data)} files.")
-            return {"files": repo_data, "session_id": session_id}
+            self._init_history(session)
+            self._track_size(session)
+            self._start_index(session)
+            return session
 
         except subprocess.TimeoutExpired:
             self.cleanup_session(session_id)
@@ -140,48 +1194,565 @@ class RepoService:
             try: self.cleanup_session(session_id)
             except: pass
             raise HTTPException(status_code=500, detail=f"Extraction failed: {str(e)}")
+
+    def clone_manifest(self, github_url: str, branch: str = "main", access_token: Optional[str] = None,
+                       owner: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Clones the repository and returns its file manifest only (path, size, hash, binary flag).
+        Contents are fetched on demand with read_file.
+        """
+        return self._session_manifest(self.clone_session(github_url, branch, access_token, owner))
+
+    def _session_manifest(self, session: RepoSession) -> Dict[str, Any]:
+        try:
+            manifest = build_manifest(session.repo_path, session.git_dir)
+        except Exception as e:
+            logger.error(f"Error building manifest: {e}")
+            self.cleanup_session(session.id)
+            raise HTTPException(status_code=500, detail=f"Extraction failed: {str(e)}")
+
+        logger.info(f"Listed {len(manifest)} files.")
+        return {
+            "session_id": session.id,
+            "manifest": manifest,
+            "file_count": len(manifest),
+            "total_bytes": sum(entry["size"] for entry in manifest),
+            "truncated": len(manifest) >= MANIFEST_MAX_ENTRIES,
+        }
+
+    async def clone_session_async(self, github_url: str, branch: str = "main", access_token: Optional[str] = None,
+                                  owner: Optional[str] = None,
+                                  on_progress: Callable[[Dict[str, Any]], None] = lambda event: None) -> RepoSession:
+        """
+        clone_session on the event loop: git runs as an asyncio subprocess and reports progress
+        instead of holding a threadpool slot. Cancelling the awaiting task kills git and removes
+        the session.
+        """
+        session = await asyncio.to_thread(self._new_session, owner)
+        try:
+            clean_token = _clean_token(access_token)
+            base_path = await self._shared_base_async(session, github_url, branch, clean_token, on_progress) if SHARED_BASES else None
+            if base_path is not None:
+                await asyncio.to_thread(_materialize, base_path, session.repo_path, session.git_dir)
+            else:
+                await self._clone_async(github_url, branch, clean_token, session.repo_path, on_progress)
+
+            await asyncio.to_thread(self._init_history, session)
+            await asyncio.to_thread(self._track_size, session)
+            self._start_index(session)
+            return session
+
+        except BaseException as e:
+            await asyncio.shield(asyncio.to_thread(self.cleanup_session, session.id))
+            if isinstance(e, (HTTPException, asyncio.CancelledError)):
+                raise
+            if isinstance(e, subprocess.TimeoutExpired):
+                raise HTTPException(status_code=408, detail="Git clone timed out.")
+            logger.error(f"Error extracting repo: {e}")
+            raise HTTPException(status_code=500, detail=f"Extraction failed: {str(e)}")
+
+    def start_clone(self, github_url: str, branch: str = "main", access_token: Optional[str] = None,
+                    owner: Optional[str] = None) -> str:
+        """Registers a clone job; it runs once its progress stream is opened (clone_events)."""
+        clone_id = f"clone-{uuid.uuid4().hex[:12]}"
+        self.clone_jobs[clone_id] = {
+            "github_url": github_url,
+            "branch": branch,
+            "access_token": access_token,
+            "owner": owner,
+            "created_at": time.time(),
+            "task": None,
+        }
+        return clone_id
+
+    async def clone_events(self, clone_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Runs a clone job and yields its events: "progress" ({phase, phase_percent, percent}),
+        then one of "done" (the manifest response), "error" ({status, detail}) or "cancelled".
+        Closing the iterator (client disconnected) cancels the clone.
+        """
+        job = self.clone_jobs.get(clone_id)
+        if job is None or job["task"] is not None:
+            raise HTTPException(status_code=404, detail="Clone job not found")
+        queue: asyncio.Queue = asyncio.Queue()
+        task = job["task"] = asyncio.create_task(self.clone_session_async(
+            job.pop("github_url"), job.pop("branch"), job.pop("access_token"), job.pop("owner"), queue.put_nowait,
+        ))
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            while (progress := await queue.get()) is not None:
+                yield {"event": "progress", "data": progress}
+            try:
+                session = task.result()
+            except asyncio.CancelledError:
+                self._metrics["clones_cancelled"] += 1
+                yield {"event": "cancelled", "data": {"clone_id": clone_id}}
+                return
+            except HTTPException as e:
+                yield {"event": "error", "data": {"status": e.status_code, "detail": e.detail}}
+                return
+            try:
+                result = await asyncio.to_thread(self._session_manifest, session)
+            except HTTPException as e:
+                yield {"event": "error", "data": {"status": e.status_code, "detail": e.detail}}
+                return
+            yield {"event": "done", "data": result}
+        finally:
+            self.clone_jobs.pop(clone_id, None)
+            if not task.done():
+                task.cancel()
+
+    def cancel_clone(self, clone_id: str) -> bool:
+        job = self.clone_jobs.get(clone_id)
+        if job is None:
+            return False
+        if job["task"] is None:
+            self.clone_jobs.pop(clone_id, None)
+        else:
+            job["task"].cancel()
+        return True
+
+    def clone_and_read(self, github_url: str, branch: str = "main", access_token: Optional[str] = None,
+                       owner: Optional[str] = None) -> Dict[str, Any]:
+        """Legacy eager extraction: clones and returns up to MAX_FILES text files inline."""
+        session = self.clone_session(github_url, branch, access_token, owner)
+        session_id = session.id
+        repo_path = session.repo_path
+
+        repo_data = {}
+
+        try:
+            for rel_path, content, _ in iter_text_files(repo_path):
+                if len(repo_data) >= MAX_FILES: break
+                if content is not None:
+                    repo_data[rel_path] = content
+
+            logger.info(f"Extracted {len(repo_data)} files.")
+            return {"files": repo_data, "session_id": session_id}
+
+        except Exception as e:
+            logger.error(f"Error extracting repo: {e}")
+            try: self.cleanup_session(session_id)
+            except: pass
+            raise HTTPException(status_code=500, detail=f"Extraction failed: {str(e)}")
             
-    def cleanup_session(self, session_id: str):
-        if session_id in self.active_sessions:
-            path = self.active_sessions.pop(session_id)
+    def stream_files(self, session_id: str) -> Iterator[Dict[str, Any]]:
+        """
+        NDJSON records for every file in a session checkout, produced while the tree is walked:
+        {"type": "session"}, then one {"type": "file"} or {"type": "skipped"} per file, then {"type": "done"}.
+        Only one file is held in memory at a time.
+        """
+        session = self._get_session(session_id)
+        yield {"type": "session", "session_id": session_id}
+
+        files = skipped = 0
+        for rel_path, content, reason in iter_text_files(session.repo_path):
+            if content is None:
+                skipped += 1
+                yield {"type": "skipped", "path": rel_path, "reason": reason}
+            else:
+                files += 1
+                yield {"type": "file", "path": rel_path, "content": content}
+        session.last_access = time.time()
+        yield {"type": "done", "session_id": session_id, "file_count": files, "skipped": skipped}
+
+    def export_archive(self, session_id: str, fmt: str = "zip") -> Iterator[bytes]:
+        """
+        The session checkout (without .git) as a zip or tar.gz, produced chunk by chunk while the
+        response is sent; files are read in chunks, so memory use does not grow with the project.
+        The file list is taken under the write lock, so no half-written temp files end up in it.
+        """
+        if fmt not in ("zip", "tar.gz"):
+            raise HTTPException(status_code=400, detail="Format must be zip or tar.gz")
+        session = self._get_session(session_id)
+        with self._write_lock(session):
+            files = [(rel_path, full_path) for rel_path, full_path, _ in _scan_files(session.repo_path, {".git"})]
+        root = f"workspace-{session_id[:8]}"
+        if fmt == "zip":
+            return self._export_zip(session, files, root)
+        return self._export_tar_gz(files, root)
+
+    def _export_tar_gz(self, files: List[Tuple[str, str]], root: str) -> Iterator[bytes]:
+        archive = TarGzStream()
+        for rel_path, full_path in files:
             try:
-                shutil.rmtree(path, ignore_errors=True)
-            except Exception as e:
-                logger.warning(f"Cleanup failed for {path}: {e}")
+                f = open(full_path, "rb")
+            except OSError:
+                continue  # deleted since it was listed
+            with f:
+                st = os.fstat(f.fileno())
+                yield from archive.add(f"{root}/{rel_path}", read_chunks(f), st.st_size, st.st_mtime, st.st_mode & 0o7777)
+        yield from archive.close()
+
+    def _export_zip(self, session: RepoSession, files: List[Tuple[str, str]], root: str) -> Iterator[bytes]:
+        cache_dir = None
+        if session.base_key is not None:
+            base = self.registry.get_base(session.base_key)
+            if base is not None:
+                cache_dir = base["path"] + EXPORT_CACHE_SUFFIX
+
+        archive = ZipStream()
+        for rel_path, full_path in files:
+            try:
+                f = open(full_path, "rb")
+            except OSError:
+                continue  # deleted since it was listed
+            with f:
+                st = os.fstat(f.fileno())
+                name, mode = f"{root}/{rel_path}", st.st_mode & 0o7777
+                if os.path.splitext(rel_path)[1].lower() in PRECOMPRESSED_EXTENSIONS:
+                    yield from archive.add(name, read_chunks(f), st.st_mtime, mode, compress=False, size_hint=st.st_size)
+                elif cache_dir is None or st.st_nlink == 1:
+                    yield from archive.add(name, read_chunks(f), st.st_mtime, mode, size_hint=st.st_size)
+                else:
+                    # Still hardlinked to the base, so unchanged: its deflate data can be shared
+                    yield from self._zip_cached(archive, name, f, st, cache_dir, session.base_key)
+        yield from archive.close()
+
+    def _zip_cached(self, archive: ZipStream, name: str, f, st: os.stat_result, cache_dir: str,
+                    base_key: str) -> Iterator[bytes]:
+        """Adds a base file from the deflate cache, compressing it into the cache on a miss."""
+        mode = st.st_mode & 0o7777
+        cache_path = os.path.join(cache_dir, _blob_id(f))
+        try:
+            cached = open(cache_path, "rb")
+        except FileNotFoundError:
+            cached = None
+        if cached is not None:
+            with cached:
+                crc, size, compressed_size = _DEFLATE_HEADER.unpack(cached.read(_DEFLATE_HEADER.size))
+                yield from archive.add_deflated(name, read_chunks(cached), crc, size, compressed_size, st.st_mtime, mode)
+            return
+
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                out.write(b"\0" * _DEFLATE_HEADER.size)
+                yield from archive.add(name, read_chunks(f), st.st_mtime, mode, size_hint=st.st_size, tee=out.write)
+                out.seek(0)
+                out.write(_DEFLATE_HEADER.pack(*archive.last_entry))
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        size = os.path.getsize(cache_path)
+        self.registry.update_base(base_key, lambda base: base.update(size_bytes=base["size_bytes"] + size))
+
+    def cleanup_session(self, session_id: str) -> bool:
+        with self._lock:
+            session = self.active_sessions.pop(session_id, None)
+        root = session.root if session else None
+        if root is None:
+            # Created by another worker on this node
+            record = self.registry.get(session_id)
+            if record is None or record["node"] != NODE_ID:
+                return False
+            root = record["root"]
+        try:
+            shutil.rmtree(root, ignore_errors=True)
+        except Exception as e:
+            logger.warning(f"Cleanup failed for {root}: {e}")
+        self.registry.remove(session_id)
+        self._metrics["removed"] += 1
+        return True
 
     def get_file_path(self, session_id: str, rel_path: str) -> str:
-        if session_id not in self.active_sessions:
-            raise HTTPException(status_code=404, detail="Session not found or expired")
-        
-        base_path = os.path.join(self.active_sessions[session_id], "repo")
+        return self._resolve_path(self._get_session(session_id), rel_path)
+
+    def _resolve_path(self, session: RepoSession, rel_path: str) -> str:
+        """
+        Path of rel_path in the checkout. Directories are resolved through symlinks; the last
+        component is not, so callers must lstat it before following it.
+        """
+        base_path = os.path.realpath(session.repo_path)
         full_path = os.path.join(base_path, rel_path)
         
-        # Security check: ensure path is within base_path
-        if not os.path.abspath(full_path).startswith(os.path.abspath(base_path)):
+        # Security check: ensure path is within base_path, also after following symlinked directories
+        resolved = os.path.normpath(os.path.join(os.path.realpath(os.path.dirname(full_path)), os.path.basename(full_path)))
+        if resolved != base_path and not resolved.startswith(base_path + os.sep):
              raise HTTPException(status_code=403, detail="Access denied")
-        return full_path
+        # Git metadata is never served or written (its config can run commands)
+        if any(part.lower() == ".git" for part in re.split(r"[\\/]", rel_path)):
+            raise HTTPException(status_code=403, detail="Access denied")
+        return os.path.join(session.repo_path, os.path.relpath(resolved, base_path))
 
-    def update_file(self, session_id: str, rel_path: str, content: str):
+    def read_file(self, session_id: str, rel_path: str, offset: int = 0, length: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Reads a file, or a byte range of it, from the session checkout.
+        Returns at most MAX_FILE_SIZE bytes; text as UTF-8, binary content as base64.
+        """
         path = self.get_file_path(session_id, rel_path)
         try:
-             with open(path, "w", encoding="utf-8") as f:
-                 f.write(content)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Write failed: {e}")
+            fd = os.open(path, os.O_RDONLY | os.O_NOFOLLOW | os.O_NONBLOCK)
+        except OSError:
+            raise HTTPException(status_code=404, detail="File not found")  # missing, or a symlink
+        st = os.fstat(fd)
+        if not stat.S_ISREG(st.st_mode):
+            os.close(fd)
+            raise HTTPException(status_code=404, detail="File not found")  # directories, fifos, devices
+        with open(fd, "rb") as f:
+            size = st.st_size
+            if offset < 0 or offset > size or (length is not None and length < 0):
+                raise HTTPException(status_code=416, detail="Requested range not satisfiable")
+            if length is None:
+                length = size - offset
+            length = min(length, MAX_FILE_SIZE)
+
+            f.seek(offset)
+            data = f.read(length)
+
+        binary = _is_binary(data)
+        content = None
+        if not binary:
+            try:
+                content = data.decode("utf-8")
+            except UnicodeDecodeError:
+                # A partial range may cut a multi-byte character; only whole files count as binary
+                binary = offset == 0 and len(data) == size
+        encoding = "utf-8"
+        if content is None:
+            content = base64.b64encode(data).decode("ascii")
+            encoding = "base64"
 
-    def create_file(self, session_id: str, rel_path: str, content: str = ""):
+        return {
+            "path": rel_path,
+            "size": size,
+            "offset": offset,
+            "length": len(data),
+            "eof": offset + len(data) >= size,
+            "binary": binary,
+            "encoding": encoding,
+            "content": content,
+        }
+
+    def raw_file(self, session_id: str, rel_path: str) -> Dict[str, Any]:
+        """
+        What is needed to serve a file as-is: its path on disk, size, a strong ETag (the git blob
+        id) and a content type. The contents are streamed by the caller, not read here.
+        """
+        path = self.get_file_path(session_id, rel_path)
+        try:
+            st = os.lstat(path)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="File not found")
+        if not stat.S_ISREG(st.st_mode):
+            raise HTTPException(status_code=404, detail="File not found")  # directories, symlinks out of the checkout
+        return {
+            "path": path,
+            "size": st.st_size,
+            "etag": f'"{_file_hash(path)}"',
+            "media_type": _media_type(path),
+        }
+
+    def update_file(self, session_id: str, rel_path: str, content: str, expected_hash: Optional[str] = None) -> int:
+        """
+        Writes a file and returns the new session version. With expected_hash (the file's git
+        blob id as last read, "" for a file that must not exist yet) the write is refused with
+        409 if the file has changed meanwhile.
+        """
+        edit = {"path": rel_path, "content": content, "expected_hash": expected_hash}
+        return self.write_files(session_id, [edit])["version"]
+
+    def create_file(self, session_id: str, rel_path: str, content: str = "") -> int:
         path = self.get_file_path(session_id, rel_path)
         if os.path.exists(path):
             raise HTTPException(status_code=409, detail="File already exists")
-        
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        self.update_file(session_id, rel_path, content)
+        return self.update_file(session_id, rel_path, content, expected_hash="")
+
+    def delete_file(self, session_id: str, rel_path: str, expected_hash: Optional[str] = None) -> int:
+        edit = {"path": rel_path, "content": None, "expected_hash": expected_hash}
+        return self.write_files(session_id, [edit])["version"]
+
+    def write_files(self, session_id: str, edits: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Applies several edits as one save: {"path", "content"} writes a file, content None deletes
+        it, and an optional "expected_hash" works as in update_file. All hashes are checked before
+        anything is written; on a mismatch nothing changes and 409 lists the conflicts. Each file
+        is replaced atomically and the session write lock is held throughout.
+        """
+        if not edits:
+            raise HTTPException(status_code=400, detail="No edits given")
+        if len(edits) > MAX_BATCH_FILES:
+            raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_FILES} files per batch")
+        session = self._get_session(session_id)
+        targets = []
+        for edit in edits:
+            path = self._resolve_path(session, edit["path"])
+            targets.append((_rel_path(session, path), path, edit.get("content"), edit.get("expected_hash")))
+        if len({rel_path for rel_path, *_ in targets}) != len(targets):
+            raise HTTPException(status_code=400, detail="Each path may appear only once per batch")
+
+        with self._write_lock(session):
+            conflicts = []
+            for rel_path, path, content, expected_hash in targets:
+                if content is None and not os.path.isfile(path):
+                    raise HTTPException(status_code=404, detail=f"File not found: {rel_path}")
+                if expected_hash is not None:
+                    current = _file_hash(path)
+                    if current != expected_hash:
+                        conflicts.append({"path": rel_path, "expected": expected_hash, "current": current})
+            if conflicts:
+                raise HTTPException(status_code=409, detail={"message": "Files changed since they were read", "conflicts": conflicts})
+
+            changes = []
+            for rel_path, path, content, _ in targets:
+                kind = self._delete(session, path) if content is None else self._write(session, path, content)
+                changes.append((rel_path, kind))
+            with self._lock:
+                version = self._record_changes(session, changes)["version"]
+            paths = [rel_path for rel_path, _ in changes]
+            self._reindex(session, paths)
+            message = f"v{version}: {changes[0][1]} {paths[0]}" if len(changes) == 1 else f"v{version}: {len(changes)} files"
+            self._commit_save(session, paths, message)
+        self._check_quota(session)
+        return {
+            "session_id": session_id,
+            "version": version,
+            "files": [{"path": rel_path, "kind": kind} for rel_path, kind in changes],
+        }
+
+    def _write(self, session: RepoSession, path: str, content: str) -> str:
+        """Replaces one file atomically; returns the change kind. Caller holds the write lock."""
+        try:
+            st = os.lstat(path)
+        except FileNotFoundError:
+            st = None
+        # A hardlink into a shared base is not counted against the session
+        old_size = st.st_size if st is not None and st.st_nlink == 1 else 0
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _write_atomic(path, content)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Write failed: {e}")
+        self._adjust_size(session, os.path.getsize(path) - old_size)
+        return "added" if st is None else "modified"
+
+    def _delete(self, session: RepoSession, path: str) -> str:
+        st = os.lstat(path)
+        os.remove(path)
+        self._adjust_size(session, -(st.st_size if st.st_nlink == 1 else 0))
+        return "deleted"
+
+    # --- Search ---
+
+    def search(self, session_id: str, query: str, case_sensitive: bool = False, path: str = "",
+               limit: int = 100) -> Dict[str, Any]:
+        """
+        Substring search over the session's text files. Only files containing every trigram of
+        the query are scanned. `indexing` is true while the initial build is still running.
+        """
+        if not query:
+            raise HTTPException(status_code=400, detail="Query must not be empty")
+        index = self._index(self._get_session(session_id))
+        result = index.search(query, case_sensitive=case_sensitive, path_prefix=path, limit=limit)
+        result["indexing"] = not index.ready.is_set()
+        return result
+
+    def symbols(self, session_id: str, query: str = "", limit: int = 100) -> Dict[str, Any]:
+        """Definitions (functions, classes, ...) whose name starts with query."""
+        index = self._index(self._get_session(session_id))
+        return {"query": query, "symbols": index.symbols(query, limit), "indexing": not index.ready.is_set()}
+
+    def references(self, session_id: str, name: str, limit: int = 100) -> Dict[str, Any]:
+        """Where an identifier is defined and every whole-word use of it."""
+        if not name:
+            raise HTTPException(status_code=400, detail="Name must not be empty")
+        index = self._index(self._get_session(session_id))
+        result = index.references_to(name, limit)
+        result["definitions"] = index.definitions_of(name)
+        result["indexing"] = not index.ready.is_set()
+        return result
+
+    # --- History ---
 
-    def delete_file(self, session_id: str, rel_path: str):
-         path = self.get_file_path(session_id, rel_path)
-         if not os.path.exists(path):
-             raise HTTPException(status_code=404, detail="File not found")
-         os.remove(path)
+    def history(self, session_id: str, limit: int = 100) -> Dict[str, Any]:
+        """Save points of a session, newest first, down to the original checkout."""
+        session = self._get_session(session_id)
+        if session.base_commit is None:
+            raise HTTPException(status_code=409, detail="Session has no history")
+        with session.git_lock:
+            log = _git(session.repo_path, "log", f"-{max(1, limit)}", "--format=%H%x00%ct%x00%s", "HEAD", git_dir=session.git_dir)
+        saves = []
+        for line in log.splitlines():
+            commit, timestamp, subject = line.split("\0", 2)
+            match = re.match(r"^v(\d+): ", subject)
+            saves.append({
+                "commit": commit,
+                "version": int(match.group(1)) if match else None,
+                "message": subject,
+                "timestamp": int(timestamp),
+                "base": commit == session.base_commit,
+            })
+            if commit == session.base_commit:
+                break
+        return {"session_id": session_id, "base_commit": session.base_commit, "saves": saves}
+
+    def diff(self, session_id: str, from_rev: Optional[str] = None, to_rev: Optional[str] = None,
+             path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Diff between two save points, read from git's object store. Defaults to the original
+        checkout vs the latest save; "base" and "head" can be used instead of commit ids.
+        """
+        session = self._get_session(session_id)
+        old = self._resolve_revision(session, from_rev, "base")
+        new = self._resolve_revision(session, to_rev, "head")
+        paths = ["--", self.get_file_path(session_id, path)] if path else []
+        try:
+            with session.git_lock:
+                numstat = _git(session.repo_path, "diff", "--numstat", "--no-renames", old, new, *paths, git_dir=session.git_dir)
+                patch = _git(session.repo_path, "diff", "--no-renames", old, new, *paths, git_dir=session.git_dir)
+        except RuntimeError as e:
+            raise HTTPException(status_code=404, detail=f"Unknown revision: {e}")
+
+        files = []
+        for line in numstat.splitlines():
+            added, deleted, rel_path = line.split("\t", 2)
+            files.append({
+                "path": rel_path,
+                "additions": None if added == "-" else int(added),
+                "deletions": None if deleted == "-" else int(deleted),
+                "binary": added == "-",
+            })
+        truncated = len(patch) > MAX_DIFF_SIZE
+        return {
+            "from": old,
+            "to": new,
+            "files": files,
+            "patch": patch[:MAX_DIFF_SIZE],
+            "truncated": truncated,
+        }
+
+    def restore(self, session_id: str, revision: str) -> Dict[str, Any]:
+        """
+        Resets the checkout to a save point. The restore is itself recorded as a new save,
+        so it can be undone, and shows up in changes_since like any other edit.
+        """
+        session = self._get_session(session_id)
+        commit = self._resolve_revision(session, revision, "head")
+        with self._write_lock(session):
+            try:
+                with session.git_lock:
+                    _git(session.repo_path, "read-tree", "-u", "--reset", commit, git_dir=session.git_dir)
+                    target = _git(session.repo_path, "rev-parse", "--short", commit, git_dir=session.git_dir).strip()
+            except RuntimeError as e:
+                raise HTTPException(status_code=404, detail=f"Cannot restore {revision}: {e}")
+
+            self._detect_external_changes(session)
+            with self._lock:
+                version = session.version
+            try:
+                with session.git_lock:
+                    _git(session.repo_path, "commit", "-q", "--no-verify", "--allow-empty",
+                         "-m", f"v{version}: restore {target}", git_dir=session.git_dir)
+            except RuntimeError as e:
+                logger.warning(f"Could not record restore in session {session_id}: {e}")
 
+        session.size_bytes = _dir_size(session.root, exclusive=True)
+        self._check_quota(session)
+        return {"session_id": session_id, "restored": commit, "version": version}
 
 repo_service = RepoService()
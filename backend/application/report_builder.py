@@ -0,0 +1,258 @@
+"""
+Streaming Code Review Report Builder
+Keeps the review as a structured JSON result, renders each file's Markdown
+section once as soon as its analysis completes, and renders the whole result
+on demand to Markdown, JSON or SARIF.
+"""
+
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+REPORT_FORMATS = ("markdown", "json", "sarif")
+
+SARIF_SCHEMA = "https://json.schemastore.org/sarif-2.1.0.json"
+SARIF_LEVELS = {"PASS": "note", "WARN": "warning", "FAIL": "error"}
+LINT_LOCATION = re.compile(r'^(?P<path>[^:\n]+):(?P<line>\d+):(?:(?P<col>\d+):)?\s*(?P<message>.+)$')
+
+
+def _verdict_emoji(verdict: str) -> str:
+    return "✅" if verdict == "PASS" else "⚠️" if verdict == "WARN" else "❌"
+
+
+def render_file_section(review: Dict) -> str:
+    """Markdown section for one reviewed file."""
+    ai = review["ai_analysis"]
+    execution = review["execution"]
+
+    exec_status = '✅ SUCCESS' if execution["success"] else f'❌ FAILED (exit {execution["exit_code"]})'
+    exec_error_section = f'```\n{execution["error"][:200]}\n```' if execution.get("error") else ''
+
+    lint_status = '✅ Clean' if review["linting"].get("clean") else f'⚠️ {review["linting"]["issues_count"]} issues found'
+
+    tests_section = ""
+    if review.get("tests"):
+        tests_section = "**Failing Tests**:\n" + "".join(
+            f"- `{t['test']}`" + (f" (line {t['line']})" if t["line"] else "") + "\n"
+            for t in review["tests"]
+        ) + "\n"
+
+    issues = "".join(f"- {issue}\n" for issue in ai["issues"])
+
+    return f"""### {_verdict_emoji(ai["verdict"])} `{review["path"]}`  [{ai["verdict"]}]
+
+**Language**: {review["language"]}  
+**Lines**: {review["lines"]}  
+**Quality Score**: {review["score"]}/10  
+
+**Execution**: {exec_status}  
+{exec_error_section}
+
+**Linter**: {lint_status}  
+
+{tests_section}**Issues Found**:
+{issues}
+**Security**: {ai["security"]}  
+**Best Practices**: {ai["best_practices"]}  
+
+**Verdict**: {ai["reason"]}
+
+---
+
+"""
+
+
+def render_markdown_header(result: Dict) -> str:
+    summary = result["summary"]
+    overall_score = summary["overall_score"]
+    health_status = "✅ EXCELLENT" if overall_score >= 8 else "⚠️ NEEDS WORK" if overall_score >= 6 else "❌ CRITICAL ISSUES"
+
+    test_section = ""
+    if result.get("tests"):
+        test_section = "## 🧪 Test Suites\n\n"
+        for suite in result["tests"]:
+            counts = suite["summary"]
+            test_section += (
+                f"- **{suite['framework']}**: {counts['passed']}/{counts['total']} passed, "
+                f"{counts['failed'] + counts['error']} failing, {counts['skipped']} skipped "
+                f"({suite['shards']} shard(s), {suite['duration']:.1f}s)\n"
+            )
+        test_section += "\n---\n\n"
+
+    return f"""# 🔍 Comprehensive Code Review Report
+
+## 📊 Repository Overview
+
+**Repository**: {result["repo_url"]}  
+**Analysis Date**: {result["analysis_date"]}  
+**Files Scanned**: {summary["file_count"]}  
+**Code Files Analyzed**: {summary["analyzed_count"]}  
+**Total Lines of Code**: {summary["total_lines"]:,}  
+
+## 🎯 Overall Score: {overall_score:.1f}/10
+
+**Health Status**: {health_status}
+
+**Verdict Distribution**:
+- ✅ PASS: {summary["pass_count"]} files
+- ⚠️ WARN: {summary["warn_count"]} files
+- ❌ FAIL: {summary["fail_count"]} files
+
+---
+
+{test_section}## 📁 Detailed File Reviews
+
+"""
+
+
+def render_markdown_footer(result: Dict) -> str:
+    summary = result["summary"]
+    return f"""
+## 🎯 Overall Recommendations
+
+1. **Quality Improvements**: Focus on {summary["fail_count"] + summary["warn_count"]} files flagged with warnings or failures
+2. **Testing**: Add comprehensive unit tests for critical functionality
+3. **Security**: Review security concerns identified in {summary["security_flagged"]} files
+4. **Best Practices**: Apply recommended improvements across the codebase
+5. **Documentation**: Add inline comments and documentation
+
+## 📈 Statistics
+
+- **Average Score**: {summary["overall_score"]:.1f}/10
+- **Execution Success Rate**: {summary["execution_success_rate"]:.1f}%
+- **Clean Linting**: {summary["clean_lint_rate"]:.1f}%
+
+---
+
+*AI-powered comprehensive review with execution testing and scoring. Manual verification recommended for production.*
+"""
+
+
+def render_markdown(result: Dict, sections: Optional[List[str]] = None) -> str:
+    """Full Markdown report. Pass already-rendered `sections` to avoid re-rendering files."""
+    if sections is None:
+        sections = [render_file_section(review) for review in result["files"]]
+    return render_markdown_header(result) + "".join(sections) + render_markdown_footer(result)
+
+
+def render_sarif(result: Dict) -> Dict:
+    """SARIF 2.1.0 log with AI findings, lint findings and failing tests as results."""
+    rules = {
+        "ai-review": "AI code review finding",
+        "lint": "Linter finding",
+        "test-failure": "Failing test attributed to this file",
+        "execution-failure": "File failed to execute",
+    }
+    results = []
+
+    def location(path: str, line: Optional[int] = None, column: Optional[int] = None) -> Dict:
+        physical = {"artifactLocation": {"uri": path}}
+        if line:
+            physical["region"] = {"startLine": line, **({"startColumn": column} if column else {})}
+        return {"physicalLocation": physical}
+
+    for review in result["files"]:
+        ai = review["ai_analysis"]
+        level = SARIF_LEVELS.get(ai.get("verdict"), "warning")
+        for issue in ai.get("issues") or []:
+            if issue and str(issue).strip().lower() != "none":
+                results.append({"ruleId": "ai-review", "level": level,
+                                "message": {"text": str(issue)}, "locations": [location(review["path"])]})
+
+        if not review["execution"]["success"] and not review["execution"].get("covered_by_tests"):
+            results.append({"ruleId": "execution-failure", "level": "error",
+                            "message": {"text": (review["execution"].get("error") or "Execution failed")[:1000]},
+                            "locations": [location(review["path"])]})
+
+        if review["linting"].get("available") and not review["linting"].get("clean"):
+            for raw in review["linting"].get("output", "").splitlines():
+                match = LINT_LOCATION.match(raw.strip())
+                if match:
+                    col = int(match.group("col")) if match.group("col") else None
+                    results.append({"ruleId": "lint", "level": "warning",
+                                    "message": {"text": match.group("message")},
+                                    "locations": [location(review["path"], int(match.group("line")), col)]})
+
+        for failure in review.get("tests") or []:
+            results.append({"ruleId": "test-failure", "level": "error",
+                            "message": {"text": f"Failing test: {failure['test']}"},
+                            "locations": [location(review["path"], failure.get("line"))]})
+
+    return {
+        "$schema": SARIF_SCHEMA,
+        "version": "2.1.0",
+        "runs": [{
+            "tool": {"driver": {
+                "name": "Interna Code Review",
+                "rules": [{"id": rule_id, "shortDescription": {"text": text}} for rule_id, text in rules.items()],
+            }},
+            "versionControlProvenance": [{"repositoryUri": result["repo_url"]}],
+            "results": results,
+        }],
+    }
+
+
+def summarize(reviews: List[Dict], file_count: int, total_lines: int) -> Dict:
+    """Summary metrics over all file reviews."""
+    analyzed = len(reviews)
+    verdicts = [r["ai_analysis"]["verdict"] for r in reviews]
+    return {
+        "file_count": file_count,
+        "analyzed_count": analyzed,
+        "total_lines": total_lines,
+        "overall_score": sum(r["score"] for r in reviews) / analyzed if analyzed else 0,
+        "pass_count": verdicts.count("PASS"),
+        "warn_count": verdicts.count("WARN"),
+        "fail_count": verdicts.count("FAIL"),
+        "security_flagged": sum(1 for r in reviews if r["ai_analysis"]["security"] != "None"),
+        "execution_success_rate": sum(1 for r in reviews if r["execution"]["success"]) / analyzed * 100 if analyzed else 0,
+        "clean_lint_rate": sum(1 for r in reviews if r["linting"].get("clean", False)) / analyzed * 100 if analyzed else 0,
+    }
+
+
+def finalize_report(result: Dict, sections: List[str], file_count: int, total_lines: int) -> Tuple[Dict, str]:
+    """
+    Adds the summary to a finished result and renders the full Markdown report from the
+    sections already streamed. Runs in the process pool; returns (result, markdown).
+    """
+    result = {**result, "summary": summarize(result["files"], file_count, total_lines)}
+    return result, render_markdown(result, sections)
+
+
+def render_report(result: Dict, fmt: str = "markdown"):
+    """Renders a structured review result to the requested format."""
+    if fmt == "markdown":
+        return render_markdown(result)
+    if fmt == "json":
+        return result
+    if fmt == "sarif":
+        return render_sarif(result)
+    raise ValueError(f"Unsupported report format: {fmt}")
+
+
+class ReportBuilder:
+    def __init__(self, repo_url: str, commit_sha: Optional[str] = None):
+        self.result: Dict = {
+            "repo_url": repo_url,
+            "commit_sha": commit_sha,
+            "analysis_date": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "summary": None,
+            "tests": [],
+            "files": [],
+        }
+        self._sections: List[str] = []
+
+    def add_file(self, review: Dict) -> str:
+        """Records one file review and returns its Markdown section."""
+        section = render_file_section(review)
+        self.result["files"].append(review)
+        self._sections.append(section)
+        return section
+
+    def set_tests(self, test_results: List[Dict]):
+        self.result["tests"] = test_results
+
+    @property
+    def sections(self) -> List[str]:
+        """Markdown sections rendered so far, in file order."""
+        return self._sections
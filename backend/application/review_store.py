@@ -0,0 +1,189 @@
+"""
+Persistent Storage for Repository Review Results
+Writes finished reviews, per-file results and scores to Postgres in one
+transaction per review, and serves paginated review history and score trends.
+Tables are defined in src/infrastructure/database/schema/code-reviews.ts.
+"""
+
+import json
+import uuid
+import logging
+from typing import Dict, List, Optional
+
+from infrastructure.database import db
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAX_PAGE_SIZE = 100
+TREND_POINTS = 50
+
+
+def _parse_user_id(user_id: Optional[str]) -> Optional[uuid.UUID]:
+    if not user_id:
+        return None
+    try:
+        return uuid.UUID(str(user_id))
+    except ValueError:
+        logger.warning(f"Ignoring invalid user_id for review history: {user_id}")
+        return None
+
+
+async def _existing_user_id(conn, user_id: Optional[str]) -> Optional[uuid.UUID]:
+    """The user's id if that user exists, else None, so an unknown user cannot fail the insert on the FK."""
+    user_uuid = _parse_user_id(user_id)
+    if user_uuid and not await conn.fetchval('SELECT 1 FROM "user" WHERE id = $1', user_uuid):
+        logger.warning(f"User {user_uuid} not found; storing review without a user")
+        return None
+    return user_uuid
+
+
+async def save_review(job_id: str, result: Dict, report: str, user_id: Optional[str] = None) -> str:
+    """
+    Stores a finished review and all its file results in a single transaction. Returns the review id.
+    Reviews by an unknown or invalid user are stored with a NULL user_id rather than dropped.
+    """
+    summary = result["summary"]
+    file_rows = [
+        (
+            review["path"],
+            review["language"],
+            review["lines"],
+            float(review["score"]),
+            review["ai_analysis"].get("verdict"),
+            json.dumps(review["execution"]),
+            json.dumps(review["linting"]),
+            json.dumps(review["ai_analysis"]),
+            json.dumps(review.get("tests") or []),
+        )
+        for review in result["files"]
+    ]
+
+    async with db.transaction() as conn:
+        user_uuid = await _existing_user_id(conn, user_id)
+        review_id = await conn.fetchval(
+            """
+            INSERT INTO code_reviews (
+                user_id, job_id, repo_url, commit_sha, overall_score,
+                file_count, analyzed_count, total_lines,
+                pass_count, warn_count, fail_count, summary, tests, report
+            ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12::jsonb, $13::jsonb, $14)
+            RETURNING id
+            """,
+            user_uuid,
+            job_id,
+            result["repo_url"],
+            result.get("commit_sha"),
+            float(summary["overall_score"]),
+            summary["file_count"],
+            summary["analyzed_count"],
+            summary["total_lines"],
+            summary["pass_count"],
+            summary["warn_count"],
+            summary["fail_count"],
+            json.dumps(summary),
+            json.dumps(result.get("tests") or []),
+            report,
+        )
+        if file_rows:
+            await conn.executemany(
+                """
+                INSERT INTO code_review_files (
+                    review_id, path, language, lines, score, verdict,
+                    execution, linting, ai_analysis, tests
+                ) VALUES ($1, $2, $3, $4, $5, $6, $7::jsonb, $8::jsonb, $9::jsonb, $10::jsonb)
+                """,
+                [(review_id,) + row for row in file_rows],
+            )
+
+    logger.info(f"Stored review {job_id} ({len(file_rows)} files) as {review_id}")
+    return str(review_id)
+
+
+async def load_review(job_id: str) -> Optional[Dict]:
+    """Rebuilds a stored review's structured result and Markdown report, or None if unknown."""
+    row = await db.fetchrow("SELECT * FROM code_reviews WHERE job_id = $1", job_id)
+    if not row:
+        return None
+    files = await db.fetch(
+        "SELECT * FROM code_review_files WHERE review_id = $1 ORDER BY path", row["id"]
+    )
+    result = {
+        "repo_url": row["repo_url"],
+        "commit_sha": row["commit_sha"],
+        "analysis_date": row["created_at"].strftime('%Y-%m-%d %H:%M:%S'),
+        "summary": json.loads(row["summary"]),
+        "tests": json.loads(row["tests"]),
+        "files": [
+            {
+                "path": f["path"],
+                "language": f["language"],
+                "lines": f["lines"],
+                "score": f["score"],
+                "execution": json.loads(f["execution"]),
+                "linting": json.loads(f["linting"]),
+                "ai_analysis": json.loads(f["ai_analysis"]),
+                "tests": json.loads(f["tests"]),
+            }
+            for f in files
+        ],
+    }
+    return {"result": result, "report": row["report"], "user_id": str(row["user_id"]) if row["user_id"] else None}
+
+
+async def get_review_history(user_id: str, page: int = 1, page_size: int = 20) -> Dict:
+    """Paginated past reviews for a user plus their score trend, read straight from stored rows."""
+    user_uuid = _parse_user_id(user_id)
+    if not user_uuid:
+        raise ValueError("Invalid User ID format")
+    page = max(1, page)
+    page_size = max(1, min(MAX_PAGE_SIZE, page_size))
+
+    total = await db.fetchval("SELECT count(*) FROM code_reviews WHERE user_id = $1", user_uuid)
+    rows = await db.fetch(
+        """
+        SELECT job_id, repo_url, commit_sha, overall_score, analyzed_count,
+               pass_count, warn_count, fail_count, created_at
+        FROM code_reviews
+        WHERE user_id = $1
+        ORDER BY created_at DESC
+        LIMIT $2 OFFSET $3
+        """,
+        user_uuid, page_size, (page - 1) * page_size,
+    )
+    trend_rows = await db.fetch(
+        """
+        SELECT repo_url, overall_score, created_at
+        FROM code_reviews
+        WHERE user_id = $1
+        ORDER BY created_at DESC
+        LIMIT $2
+        """,
+        user_uuid, TREND_POINTS,
+    )
+
+    reviews: List[Dict] = [
+        {
+            "job_id": r["job_id"],
+            "repo_url": r["repo_url"],
+            "commit_sha": r["commit_sha"],
+            "overall_score": r["overall_score"],
+            "analyzed_count": r["analyzed_count"],
+            "verdicts": {"PASS": r["pass_count"], "WARN": r["warn_count"], "FAIL": r["fail_count"]},
+            "created_at": r["created_at"].isoformat(),
+        }
+        for r in rows
+    ]
+    trend = [
+        {"repo_url": r["repo_url"], "overall_score": r["overall_score"], "created_at": r["created_at"].isoformat()}
+        for r in reversed(trend_rows)
+    ]
+
+    return {
+        "reviews": reviews,
+        "trend": trend,
+        "page": page,
+        "page_size": page_size,
+        "total": total,
+        "has_more": page * page_size < total,
+    }
@@ -0,0 +1,315 @@
+"""
+Per-Session Search Index
+Trigram full-text index and symbol table over the text files of one IDE
+session. It is built in the background when the session is created and then
+updated file by file on every save, so a query only has to verify the few
+candidate files whose trigrams match instead of scanning the whole checkout.
+Python definitions come from the `ast` module; other languages use
+per-extension definition patterns. References are identifier occurrences.
+"""
+
+import re
+import ast
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# --- Configuration ---
+MAX_RESULTS = 200
+MAX_INDEX_BYTES = 64 * 1024 * 1024  # per session; files beyond this are not indexed
+PREVIEW_CHARS = 200
+
+IDENTIFIER_RE = re.compile(r"[A-Za-z_$][A-Za-z0-9_$]*")
+
+# (pattern, kind); group 1 is the symbol name
+_JS_PATTERNS = [
+    (r"^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\s*\*?\s*([A-Za-z_$][\w$]*)", "function"),
+    (r"^\s*(?:export\s+)?(?:default\s+)?(?:abstract\s+)?class\s+([A-Za-z_$][\w$]*)", "class"),
+    (r"^\s*(?:export\s+)?(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*=\s*(?:async\s*)?(?:\([^)]*\)|[A-Za-z_$][\w$]*)\s*=>", "function"),
+    (r"^\s*(?:export\s+)?(?:const|let|var)\s+([A-Za-z_$][\w$]*)", "variable"),
+    (r"^\s*(?:export\s+)?interface\s+([A-Za-z_$][\w$]*)", "interface"),
+    (r"^\s*(?:export\s+)?type\s+([A-Za-z_$][\w$]*)\s*=", "type"),
+    (r"^\s*(?:export\s+)?enum\s+([A-Za-z_$][\w$]*)", "enum"),
+]
+DEFINITION_PATTERNS: Dict[str, List[Tuple[re.Pattern, str]]] = {
+    ext: [(re.compile(p), kind) for p, kind in patterns]
+    for exts, patterns in {
+        (".js", ".jsx", ".mjs", ".cjs", ".ts", ".tsx"): _JS_PATTERNS,
+        (".go",): [
+            (r"^func\s+(?:\([^)]*\)\s*)?([A-Za-z_]\w*)", "function"),
+            (r"^type\s+([A-Za-z_]\w*)\s+(?:struct|interface)", "class"),
+            (r"^type\s+([A-Za-z_]\w*)", "type"),
+        ],
+        (".java", ".kt", ".cs"): [
+            (r"^\s*(?:[\w@<>\[\]]+\s+)*(?:class|interface|enum|record|object)\s+([A-Za-z_]\w*)", "class"),
+            (r"^\s*(?:(?:public|private|protected|static|final|abstract|override|suspend|async|virtual)\s+)+[\w<>\[\],\s]*?\s([A-Za-z_]\w*)\s*\(", "method"),
+            (r"^\s*fun\s+(?:<[^>]*>\s*)?(?:[\w.]+\.)?([A-Za-z_]\w*)\s*\(", "function"),
+        ],
+        (".rs",): [
+            (r"^\s*(?:pub(?:\([^)]*\))?\s+)?(?:async\s+)?fn\s+([A-Za-z_]\w*)", "function"),
+            (r"^\s*(?:pub(?:\([^)]*\))?\s+)?(?:struct|enum|trait|union)\s+([A-Za-z_]\w*)", "class"),
+            (r"^\s*(?:pub(?:\([^)]*\))?\s+)?type\s+([A-Za-z_]\w*)", "type"),
+        ],
+        (".rb",): [
+            (r"^\s*def\s+(?:self\.)?([A-Za-z_]\w*[?!=]?)", "function"),
+            (r"^\s*(?:class|module)\s+([A-Z]\w*)", "class"),
+        ],
+        (".php",): [
+            (r"^\s*(?:(?:public|private|protected|static|abstract|final)\s+)*function\s+([A-Za-z_]\w*)", "function"),
+            (r"^\s*(?:abstract\s+|final\s+)?(?:class|interface|trait)\s+([A-Za-z_]\w*)", "class"),
+        ],
+        (".c", ".h", ".cpp", ".hpp", ".cc"): [
+            (r"^(?:[\w\*&:<>]+\s+)+\**([A-Za-z_]\w*)\s*\([^;]*$", "function"),
+            (r"^\s*(?:typedef\s+)?(?:struct|class|enum|union)\s+([A-Za-z_]\w*)", "class"),
+        ],
+    }.items()
+    for ext in exts
+}
+
+
+def _trigrams(text: str) -> Set[str]:
+    return set(map("".join, zip(text, text[1:], text[2:])))
+
+
+def _extension(path: str) -> str:
+    dot = path.rfind(".")
+    return path[dot:].lower() if dot > path.rfind("/") else ""
+
+
+def _python_definitions(content: str) -> Optional[List[Tuple[str, int, str]]]:
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError):
+        return None
+    found = []
+
+    def visit(node: ast.AST, in_class: bool):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.ClassDef):
+                found.append((child.name, child.lineno, "class"))
+                visit(child, True)
+            elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                found.append((child.name, child.lineno, "method" if in_class else "function"))
+                visit(child, False)
+            elif isinstance(child, (ast.Assign, ast.AnnAssign)) and node is tree:
+                targets = child.targets if isinstance(child, ast.Assign) else [child.target]
+                for target in targets:
+                    if isinstance(target, ast.Name):
+                        found.append((target.id, child.lineno, "variable"))
+            elif not isinstance(child, (ast.Lambda, ast.expr)):
+                visit(child, in_class)
+
+    visit(tree, False)
+    return found
+
+
+def extract_definitions(path: str, content: str) -> List[Tuple[str, int, str]]:
+    """(name, line, kind) for the definitions in one file."""
+    ext = _extension(path)
+    if ext == ".py":
+        found = _python_definitions(content)
+        if found is not None:
+            return found
+        patterns = [(re.compile(r"^\s*(?:async\s+)?def\s+([A-Za-z_]\w*)"), "function"),
+                    (re.compile(r"^\s*class\s+([A-Za-z_]\w*)"), "class")]
+    else:
+        patterns = DEFINITION_PATTERNS.get(ext)
+        if not patterns:
+            return []
+    found = []
+    for line_no, line in enumerate(content.splitlines(), 1):
+        for pattern, kind in patterns:
+            match = pattern.match(line)
+            if match:
+                found.append((match.group(1), line_no, kind))
+                break
+    return found
+
+
+class SessionIndex:
+    """Thread-safe index of one session's text files."""
+
+    def __init__(self):
+        self.files: Dict[str, str] = {}
+        self.postings: Dict[str, Set[str]] = defaultdict(set)
+        self.file_trigrams: Dict[str, Set[str]] = {}
+        self.definitions: Dict[str, List[Tuple[str, int, str]]] = defaultdict(list)  # name -> (path, line, kind)
+        self.file_definitions: Dict[str, Set[str]] = {}
+        self.references: Dict[str, Set[str]] = defaultdict(set)  # identifier -> paths
+        self.file_identifiers: Dict[str, Set[str]] = {}
+        self.total_bytes = 0
+        self.skipped = 0
+        self.ready = threading.Event()
+        self._lock = threading.RLock()
+        self._touched: Set[str] = set()  # paths updated or removed while the initial build runs
+
+    # --- Maintenance ---
+
+    def build(self, files: Iterable[Tuple[str, Optional[str]]]):
+        """Initial build; files changed meanwhile through add/remove keep their newer state."""
+        try:
+            for path, content in files:
+                if content is None:
+                    continue
+                with self._lock:
+                    if path in self._touched:
+                        continue
+                    self._add(path, content)
+        finally:
+            with self._lock:
+                self._touched.clear()
+            self.ready.set()
+
+    def add(self, path: str, content: str):
+        with self._lock:
+            if not self.ready.is_set():
+                self._touched.add(path)
+            self._add(path, content)
+
+    def remove(self, path: str):
+        with self._lock:
+            if not self.ready.is_set():
+                self._touched.add(path)
+            self._remove(path)
+
+    def _add(self, path: str, content: str):
+        self._remove(path)
+        if self.total_bytes + len(content) > MAX_INDEX_BYTES:
+            self.skipped += 1
+            return
+        self.files[path] = content
+        self.total_bytes += len(content)
+
+        trigrams = _trigrams(content.lower())
+        self.file_trigrams[path] = trigrams
+        for trigram in trigrams:
+            self.postings[trigram].add(path)
+
+        names = set()
+        for name, line, kind in extract_definitions(path, content):
+            self.definitions[name].append((path, line, kind))
+            names.add(name)
+        self.file_definitions[path] = names
+
+        identifiers = set(IDENTIFIER_RE.findall(content))
+        self.file_identifiers[path] = identifiers
+        for name in identifiers:
+            self.references[name].add(path)
+
+    def _remove(self, path: str):
+        content = self.files.pop(path, None)
+        if content is None:
+            return
+        self.total_bytes -= len(content)
+        for trigram in self.file_trigrams.pop(path, ()):
+            paths = self.postings[trigram]
+            paths.discard(path)
+            if not paths:
+                del self.postings[trigram]
+        for name in self.file_definitions.pop(path, ()):
+            remaining = [d for d in self.definitions[name] if d[0] != path]
+            if remaining:
+                self.definitions[name] = remaining
+            else:
+                del self.definitions[name]
+        for name in self.file_identifiers.pop(path, ()):
+            paths = self.references[name]
+            paths.discard(path)
+            if not paths:
+                del self.references[name]
+
+    # --- Queries ---
+
+    def _candidates(self, needle: str) -> List[str]:
+        """Files containing every trigram of the (lower-cased) needle."""
+        trigrams = _trigrams(needle)
+        if not trigrams:
+            return sorted(self.files)
+        postings = sorted((self.postings.get(t, set()) for t in trigrams), key=len)
+        result = set(postings[0])
+        for paths in postings[1:]:
+            result &= paths
+            if not result:
+                break
+        return sorted(result)
+
+    def search(self, query: str, case_sensitive: bool = False, path_prefix: str = "",
+               limit: int = MAX_RESULTS) -> Dict[str, Any]:
+        """Substring search; returns matches as {path, line, column, preview}."""
+        limit = max(1, min(limit, MAX_RESULTS))
+        needle = query if case_sensitive else query.lower()
+        matches = []
+        truncated = False
+        with self._lock:
+            candidates = [p for p in self._candidates(query.lower()) if p.startswith(path_prefix)]
+            for path in candidates:
+                content = self.files[path]
+                haystack = content if case_sensitive else content.lower()
+                start = haystack.find(needle)
+                while start != -1:
+                    if len(matches) >= limit:
+                        truncated = True
+                        break
+                    line_start = haystack.rfind("\n", 0, start) + 1
+                    line_end = haystack.find("\n", start)
+                    line_end = len(content) if line_end == -1 else line_end
+                    matches.append({
+                        "path": path,
+                        "line": content.count("\n", 0, start) + 1,
+                        "column": start - line_start + 1,
+                        "preview": content[line_start:line_end][:PREVIEW_CHARS],
+                    })
+                    start = haystack.find(needle, line_end)
+                if truncated:
+                    break
+        return {"query": query, "matches": matches, "files_scanned": len(candidates), "truncated": truncated}
+
+    def symbols(self, prefix: str, limit: int = MAX_RESULTS) -> List[Dict[str, Any]]:
+        """Definitions whose name starts with prefix (case-insensitive), for go-to-symbol."""
+        limit = max(1, min(limit, MAX_RESULTS))
+        prefix = prefix.lower()
+        results = []
+        with self._lock:
+            for name in sorted(n for n in self.definitions if n.lower().startswith(prefix)):
+                for path, line, kind in self.definitions[name]:
+                    results.append({"name": name, "kind": kind, "path": path, "line": line})
+                if len(results) >= limit:
+                    break
+        return results[:limit]
+
+    def definitions_of(self, name: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{"name": name, "kind": kind, "path": path, "line": line}
+                    for path, line, kind in sorted(self.definitions.get(name, []))]
+
+    def references_to(self, name: str, limit: int = MAX_RESULTS) -> Dict[str, Any]:
+        """Whole-word occurrences of an identifier."""
+        limit = max(1, min(limit, MAX_RESULTS))
+        word = re.compile(rf"(?<![\w$]){re.escape(name)}(?![\w$])")
+        matches = []
+        truncated = False
+        with self._lock:
+            for path in sorted(self.references.get(name, ())):
+                for line_no, line in enumerate(self.files[path].splitlines(), 1):
+                    match = word.search(line)
+                    if not match:
+                        continue
+                    if len(matches) >= limit:
+                        truncated = True
+                        break
+                    matches.append({"path": path, "line": line_no, "column": match.start() + 1,
+                                    "preview": line[:PREVIEW_CHARS]})
+                if truncated:
+                    break
+        return {"name": name, "matches": matches, "truncated": truncated}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ready": self.ready.is_set(),
+                "files": len(self.files),
+                "bytes": self.total_bytes,
+                "trigrams": len(self.postings),
+                "symbols": len(self.definitions),
+                "skipped": self.skipped,
+            }
@@ -0,0 +1,448 @@
+"""
+Test-Suite Runner Stage for Repository Reviews
+Detects pytest, unittest, jest and go test suites in a cloned repo, runs each
+suite once sharded across cores, and returns structured per-test results with
+failures attributed back to source files.
+"""
+
+import os
+import re
+import ast
+import json
+import time
+import asyncio
+import logging
+import tempfile
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Set
+
+from infrastructure.process_pool import process_pool
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+TEST_SHARDS = int(os.environ.get("REVIEW_TEST_SHARDS", os.cpu_count() or 2))
+TEST_TIMEOUT = 300
+
+SKIP_DIRECTORIES = {'.git', 'node_modules', 'venv', '.venv', '__pycache__', 'dist', 'build', '.next', 'coverage', 'target'}
+
+PY_TEST_FILE = re.compile(r'^(test_.*|.*_test)\.py$')
+JS_TEST_FILE = re.compile(r'^.*\.(test|spec)\.(js|jsx|ts|tsx|mjs|cjs)$')
+JS_EXTENSIONS = ('.js', '.jsx', '.ts', '.tsx', '.mjs', '.cjs')
+JS_IMPORT = re.compile(r'''(?:require\(\s*|from\s+|import\s*\(\s*|import\s+)['"](\.{1,2}/[^'"]+)['"]''')
+TRACE_LOCATION = re.compile(r'File "([^"]+)", line (\d+)|([\w./\\@-]+\.(?:py|js|jsx|ts|tsx|mjs|cjs|go)):(\d+)')
+
+# Runs unittest modules and prints one JSON document with per-test outcome and timing
+UNITTEST_RUNNER = r'''
+import json, os, sys, time, unittest
+
+root, paths = sys.argv[1], sys.argv[2:]
+results = []
+
+class _Result(unittest.TestResult):
+    def startTest(self, test):
+        self._started = time.perf_counter()
+        super().startTest(test)
+
+    def _record(self, test, outcome, err=None):
+        module = sys.modules.get(type(test).__module__)
+        results.append({
+            "id": test.id(),
+            "file": getattr(module, "__file__", None),
+            "outcome": outcome,
+            "duration": time.perf_counter() - getattr(self, "_started", time.perf_counter()),
+            "message": self._exc_info_to_string(err, test) if err else None,
+        })
+
+    def addSuccess(self, test):
+        super().addSuccess(test); self._record(test, "passed")
+    def addFailure(self, test, err):
+        super().addFailure(test, err); self._record(test, "failed", err)
+    def addError(self, test, err):
+        super().addError(test, err); self._record(test, "error", err)
+    def addSkip(self, test, reason):
+        super().addSkip(test, reason); self._record(test, "skipped")
+    def addExpectedFailure(self, test, err):
+        super().addExpectedFailure(test, err); self._record(test, "passed")
+    def addUnexpectedSuccess(self, test):
+        super().addUnexpectedSuccess(test); self._record(test, "failed")
+
+loader = unittest.TestLoader()
+suite = unittest.TestSuite()
+for path in paths:
+    start = os.path.dirname(path)
+    try:
+        suite.addTests(loader.discover(start, pattern=os.path.basename(path), top_level_dir=root))
+    except ImportError:
+        suite.addTests(loader.discover(start, pattern=os.path.basename(path), top_level_dir=start))
+suite.run(_Result())
+print(json.dumps(results))
+'''
+
+
+def _walk(repo_dir: str):
+    for root, dirs, files in os.walk(repo_dir):
+        dirs[:] = [d for d in dirs if d not in SKIP_DIRECTORIES and not d.startswith('.')]
+        for file in files:
+            yield root, file
+
+
+def _rel(repo_dir: str, path: str) -> str:
+    return os.path.relpath(path, repo_dir).replace('\\', '/')
+
+
+def _shard(paths: List[str], shards: int) -> List[List[str]]:
+    """Greedy largest-first split of files into shards of similar total size."""
+    bins: List[List[str]] = [[] for _ in range(max(1, min(shards, len(paths))))]
+    loads = [0] * len(bins)
+    for path in sorted(paths, key=lambda p: os.path.getsize(p) if os.path.exists(p) else 0, reverse=True):
+        i = loads.index(min(loads))
+        bins[i].append(path)
+        loads[i] += os.path.getsize(path) if os.path.exists(path) else 0
+    return [b for b in bins if b]
+
+
+async def _run_process(cmd: List[str], cwd: str, env: Optional[Dict[str, str]]) -> Dict:
+    started = time.perf_counter()
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, cwd=cwd, env=env,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+    except FileNotFoundError as e:
+        return {"exit_code": -1, "stdout": "", "stderr": str(e), "duration": 0.0}
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=TEST_TIMEOUT)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        return {"exit_code": -1, "stdout": "", "stderr": f"Test shard timeout ({TEST_TIMEOUT}s)",
+                "duration": time.perf_counter() - started}
+    return {
+        "exit_code": proc.returncode,
+        "stdout": stdout.decode(errors="replace"),
+        "stderr": stderr.decode(errors="replace"),
+        "duration": time.perf_counter() - started,
+    }
+
+
+# --- Coverage (static import resolution) ---
+
+def _python_imports(repo_dir: str, test_path: str) -> Set[str]:
+    """Repo files imported by a Python test file."""
+    try:
+        with open(test_path, 'r', encoding='utf-8', errors='ignore') as f:
+            tree = ast.parse(f.read())
+    except (SyntaxError, ValueError):
+        return set()
+
+    bases = [repo_dir, os.path.join(repo_dir, 'src'), os.path.dirname(test_path)]
+    modules: List[tuple] = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules += [(None, alias.name) for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            base = None
+            if node.level:
+                base = os.path.dirname(test_path)
+                for _ in range(node.level - 1):
+                    base = os.path.dirname(base)
+            mod = node.module or ''
+            modules.append((base, mod))
+            modules += [(base, f"{mod}.{alias.name}" if mod else alias.name) for alias in node.names]
+
+    found = set()
+    for base, mod in modules:
+        parts = mod.split('.') if mod else []
+        for root in ([base] if base else bases):
+            candidate = os.path.join(root, *parts)
+            for path in (candidate + '.py', os.path.join(candidate, '__init__.py')):
+                if parts and os.path.isfile(path):
+                    found.add(_rel(repo_dir, path))
+    return found
+
+
+def _js_imports(repo_dir: str, test_path: str) -> Set[str]:
+    """Repo files imported through relative paths by a JS/TS test file."""
+    try:
+        with open(test_path, 'r', encoding='utf-8', errors='ignore') as f:
+            source = f.read()
+    except OSError:
+        return set()
+
+    found = set()
+    for spec in JS_IMPORT.findall(source):
+        target = os.path.normpath(os.path.join(os.path.dirname(test_path), spec))
+        candidates = [target] + [target + ext for ext in JS_EXTENSIONS] + \
+                     [os.path.join(target, 'index' + ext) for ext in JS_EXTENSIONS]
+        for path in candidates:
+            if os.path.isfile(path):
+                found.add(_rel(repo_dir, path))
+                break
+    return found
+
+
+def _attribute(repo_dir: str, tests: List[Dict]) -> Dict[str, List[Dict]]:
+    """Maps failing tests to the repo files (and lines) named in their tracebacks."""
+    by_file: Dict[str, List[Dict]] = {}
+    real_root = os.path.realpath(repo_dir)
+    for test in tests:
+        if test["outcome"] not in ("failed", "error"):
+            continue
+        seen = set()
+        locations = []
+        for match in TRACE_LOCATION.finditer(test.get("message") or ""):
+            path, line = (match.group(1), match.group(2)) if match.group(1) else (match.group(3), match.group(4))
+            locations.append((path, int(line)))
+        # Fall back to the test file itself when the traceback names no repo file
+        locations.append((test.get("file"), None))
+
+        for path, line in locations:
+            if not path or (line is None and any(rel == _rel(repo_dir, os.path.join(repo_dir, path)) for rel, _ in seen)):
+                continue
+            candidates = [path] if os.path.isabs(path) else [
+                os.path.join(repo_dir, path),
+                os.path.join(repo_dir, os.path.dirname(test.get("file") or ""), path),
+            ]
+            for candidate in candidates:
+                real = os.path.realpath(candidate)
+                if real.startswith(real_root + os.sep) and os.path.isfile(real):
+                    rel = _rel(real_root, real)
+                    if (rel, line) not in seen:
+                        seen.add((rel, line))
+                        by_file.setdefault(rel, []).append({"test": test["id"], "line": line})
+                    break
+    return by_file
+
+
+# --- Detection ---
+
+def _read_text(path: str) -> str:
+    try:
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            return f.read()
+    except OSError:
+        return ''
+
+
+def _read_package_json(repo_dir: str) -> Dict:
+    try:
+        with open(os.path.join(repo_dir, 'package.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def detect_test_suites(repo_dir: str) -> List[Dict]:
+    """Returns [{"framework", "files"}] for every suite found in the repo."""
+    py_tests, js_tests, go_packages = [], [], set()
+    for root, file in _walk(repo_dir):
+        path = os.path.join(root, file)
+        if PY_TEST_FILE.match(file):
+            py_tests.append(path)
+        elif JS_TEST_FILE.match(file) or ('__tests__' in root and file.endswith(JS_EXTENSIONS)):
+            js_tests.append(path)
+        elif file.endswith('_test.go'):
+            go_packages.add(root)
+
+    suites = []
+    if py_tests:
+        markers = ('pytest.ini', 'conftest.py', 'tox.ini', 'setup.cfg', 'pyproject.toml')
+        uses_pytest = any('pytest' in _read_text(os.path.join(repo_dir, m)) for m in markers)
+        if not uses_pytest:
+            for path in py_tests:
+                source = _read_text(path)
+                if 'import pytest' in source or 'from pytest' in source or 'unittest' not in source:
+                    uses_pytest = True
+                    break
+        suites.append({"framework": "pytest" if uses_pytest else "unittest", "files": py_tests})
+
+    pkg = _read_package_json(repo_dir)
+    deps = {**pkg.get("dependencies", {}), **pkg.get("devDependencies", {})}
+    if js_tests and ("jest" in deps or "jest" in pkg.get("scripts", {}).get("test", "")):
+        suites.append({"framework": "jest", "files": js_tests})
+
+    if go_packages and os.path.isfile(os.path.join(repo_dir, 'go.mod')):
+        suites.append({"framework": "go", "files": sorted(go_packages)})
+
+    return suites
+
+
+# --- Framework runners (one shard each) ---
+
+async def _run_pytest_shard(repo_dir: str, files: List[str], env: Optional[Dict[str, str]]) -> List[Dict]:
+    fd, report = tempfile.mkstemp(suffix='.xml')
+    os.close(fd)
+    try:
+        await _run_process(
+            ["python", "-m", "pytest", "-q", "-p", "no:cacheprovider", "-o", "junit_family=xunit1",
+             f"--junitxml={report}"] + files, repo_dir, env
+        )
+        tests = []
+        try:
+            tree = ET.parse(report)
+        except (ET.ParseError, OSError):
+            return tests
+        for case in tree.iter('testcase'):
+            outcome, message = "passed", None
+            for tag, label in (("failure", "failed"), ("error", "error"), ("skipped", "skipped")):
+                node = case.find(tag)
+                if node is not None:
+                    outcome = label
+                    message = (node.text or node.get("message") or "").strip() or None
+                    break
+            file = case.get("file")
+            tests.append({
+                "id": f"{case.get('classname', '')}::{case.get('name', '')}",
+                "file": os.path.join(repo_dir, file) if file else None,
+                "outcome": outcome,
+                "duration": float(case.get("time") or 0),
+                "message": message,
+            })
+        return tests
+    finally:
+        os.remove(report)
+
+
+async def _run_unittest_shard(repo_dir: str, files: List[str], env: Optional[Dict[str, str]]) -> List[Dict]:
+    proc = await _run_process(["python", "-c", UNITTEST_RUNNER, repo_dir] + files, repo_dir, env)
+    try:
+        return json.loads(proc["stdout"].strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        return [{"id": _rel(repo_dir, f), "file": f, "outcome": "error", "duration": 0.0,
+                 "message": proc["stderr"][-2000:]} for f in files]
+
+
+async def _run_jest_shard(repo_dir: str, files: List[str], env: Optional[Dict[str, str]]) -> List[Dict]:
+    fd, report = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+    try:
+        await _run_process(
+            ["npx", "--no-install", "jest", "--ci", "--json", f"--outputFile={report}",
+             "--maxWorkers=1", "--passWithNoTests", "--runTestsByPath"] + files, repo_dir, env
+        )
+        try:
+            with open(report, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return []
+        tests = []
+        statuses = {"passed": "passed", "failed": "failed", "pending": "skipped", "skipped": "skipped", "todo": "skipped"}
+        for suite in data.get("testResults", []):
+            for case in suite.get("assertionResults", []):
+                tests.append({
+                    "id": case.get("fullName") or case.get("title"),
+                    "file": suite.get("name"),
+                    "outcome": statuses.get(case.get("status"), "error"),
+                    "duration": (case.get("duration") or 0) / 1000,
+                    "message": "\n".join(case.get("failureMessages") or []) or None,
+                })
+            if not suite.get("assertionResults") and suite.get("message"):
+                tests.append({"id": _rel(repo_dir, suite.get("name", "")), "file": suite.get("name"),
+                              "outcome": "error", "duration": 0.0, "message": suite["message"]})
+        return tests
+    finally:
+        os.remove(report)
+
+
+async def _run_go_shard(repo_dir: str, packages: List[str], env: Optional[Dict[str, str]]) -> List[Dict]:
+    targets = ["./" + _rel(repo_dir, p) if p != repo_dir else "." for p in packages]
+    proc = await _run_process(["go", "test", "-json"] + targets, repo_dir, env)
+    tests: Dict[str, Dict] = {}
+    for line in proc["stdout"].splitlines():
+        try:
+            event = json.loads(line)
+        except ValueError:
+            continue
+        name = event.get("Test")
+        if not name:
+            continue
+        key = f"{event.get('Package')}.{name}"
+        test = tests.setdefault(key, {"id": key, "file": None, "outcome": "error", "duration": 0.0, "message": ""})
+        action = event.get("Action")
+        if action == "output":
+            test["message"] += event.get("Output", "")
+        elif action in ("pass", "fail", "skip"):
+            test["outcome"] = {"pass": "passed", "fail": "failed", "skip": "skipped"}[action]
+            test["duration"] = event.get("Elapsed") or 0.0
+    results = list(tests.values())
+    for test in results:
+        if test["outcome"] == "passed":
+            test["message"] = None
+    return results
+
+
+RUNNERS = {
+    "pytest": _run_pytest_shard,
+    "unittest": _run_unittest_shard,
+    "jest": _run_jest_shard,
+    "go": _run_go_shard,
+}
+
+
+def _covered_files(repo_dir: str, framework: str, files: List[str]) -> Set[str]:
+    covered = set()
+    if framework == "go":
+        for package in files:
+            covered |= {_rel(repo_dir, os.path.join(package, f)) for f in os.listdir(package) if f.endswith('.go')}
+        return covered
+    for path in files:
+        covered.add(_rel(repo_dir, path))
+        covered |= _python_imports(repo_dir, path) if framework in ("pytest", "unittest") else _js_imports(repo_dir, path)
+    return covered
+
+
+async def run_test_suite(repo_dir: str, suite: Dict, env: Optional[Dict[str, str]] = None,
+                         shards: int = TEST_SHARDS) -> Dict:
+    """Runs one detected suite sharded across cores and returns structured results."""
+    framework = suite["framework"]
+    started = time.perf_counter()
+    shard_files = _shard(suite["files"], shards)
+
+    shard_results = await asyncio.gather(
+        *(RUNNERS[framework](repo_dir, files, env) for files in shard_files),
+        return_exceptions=True
+    )
+
+    tests: List[Dict] = []
+    # A shard that raised or reported nothing never ran (runner missing, no report, collection
+    # failed); its files must not count as covered, or they would skip execution untested
+    complete = True
+    for result in shard_results:
+        if isinstance(result, Exception):
+            logger.warning(f"{framework} shard failed: {result}")
+            complete = False
+            continue
+        complete = complete and bool(result)
+        tests.extend(result)
+
+    for test in tests:
+        if test.get("file") and os.path.isabs(test["file"]):
+            test["file"] = _rel(repo_dir, test["file"])
+
+    summary = {"total": len(tests), "passed": 0, "failed": 0, "error": 0, "skipped": 0}
+    for test in tests:
+        summary[test["outcome"]] = summary.get(test["outcome"], 0) + 1
+
+    covered = set()
+    if complete and tests:
+        covered = await process_pool.run(_covered_files, repo_dir, framework, suite["files"])
+    else:
+        logger.warning(f"{framework} suite did not run completely; its files are executed individually")
+
+    return {
+        "framework": framework,
+        "shards": len(shard_files),
+        "duration": time.perf_counter() - started,
+        "summary": summary,
+        "tests": tests,
+        "failures_by_file": await process_pool.run(_attribute, repo_dir, tests),
+        "covered_files": sorted(covered),
+    }
+
+
+async def run_test_suites(repo_dir: str, env: Optional[Dict[str, str]] = None) -> List[Dict]:
+    """Detects and runs every test suite in the repo."""
+    suites = detect_test_suites(repo_dir)
+    return await asyncio.gather(*(run_test_suite(repo_dir, suite, env) for suite in suites))
@@ -0,0 +1,101 @@
+"""
+Benchmark: per-request LLM client construction vs the shared client registry.
+
+Times the old _get_llm path (load three .env files, build a new
+ChatGoogleGenerativeAI) against llm_clients.get for the same model and
+temperature. With --live, also times real requests made through a fresh
+client each time vs one pooled client, which adds the TLS handshake that
+connection reuse saves (needs GEMINI_API_KEY and network access).
+
+Usage (from backend/):
+    python benchmarks/bench_llm_clients.py [--requests 200] [--live] [--live-requests 5]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from infrastructure.llm_clients import DEFAULT_MODEL, LLMClientRegistry, load_env
+
+
+def per_request_client(model: str, temperature: float):
+    """The pre-registry _get_llm, kept here as the baseline."""
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    backend_dir = Path(__file__).resolve().parent.parent
+    root = backend_dir.parent
+    load_dotenv(dotenv_path=backend_dir / ".env")
+    load_dotenv(dotenv_path=root / ".env.local")
+    load_dotenv(dotenv_path=root / ".env")
+    return ChatGoogleGenerativeAI(model=model, google_api_key=os.getenv("GEMINI_API_KEY"), temperature=temperature)
+
+
+def time_calls(fn, n: int):
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(label: str, samples):
+    print(f"{label:<18}: mean {statistics.mean(samples):8.3f} ms  median {statistics.median(samples):8.3f} ms  "
+          f"max {max(samples):8.3f} ms")
+
+
+async def live(model: str, n: int):
+    prompt = "Reply with the single word: ok"
+    fresh, pooled = [], []
+    registry = LLMClientRegistry()
+    for _ in range(n):
+        start = time.perf_counter()
+        await per_request_client(model, 0.0).ainvoke(prompt)
+        fresh.append((time.perf_counter() - start) * 1000)
+    for _ in range(n):
+        start = time.perf_counter()
+        await registry.get(model, 0.0).ainvoke(prompt)
+        pooled.append((time.perf_counter() - start) * 1000)
+    report("live per-request", fresh)
+    report("live pooled", pooled)
+    print(registry.stats()["by_client"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--live", action="store_true", help="also time real model calls (needs GEMINI_API_KEY)")
+    parser.add_argument("--live-requests", type=int, default=5)
+    args = parser.parse_args()
+
+    load_env()
+    if not os.getenv("GEMINI_API_KEY"):
+        if args.live:
+            parser.error("--live needs GEMINI_API_KEY")
+        os.environ["GEMINI_API_KEY"] = "bench-placeholder-key"  # construction never calls the API
+    model = os.getenv("GEMINI_MODEL", DEFAULT_MODEL)
+
+    per_request_client(model, 0.7)  # warm imports so neither side pays them
+    registry = LLMClientRegistry()
+    first = time_calls(lambda: registry.get(model, 0.7), 1)[0]
+    old = time_calls(lambda: per_request_client(model, 0.7), args.requests)
+    new = time_calls(lambda: registry.get(model, 0.7), args.requests)
+
+    print(f"{args.requests} client lookups for {model}")
+    report("per-request", old)
+    report("registry", new)
+    print(f"registry first use: {first:.3f} ms (one build per model/temperature)")
+    print(f"overhead removed  : {statistics.mean(old) - statistics.mean(new):.3f} ms per request")
+
+    if args.live:
+        asyncio.run(live(model, args.live_requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, field_validator
-from typing import List, Optional, Literal
+from typing import Dict, List, Optional, Literal
 
 class Milestone(BaseModel):
     title: str
@@ -145,6 +145,7 @@ class RepoRequest(BaseModel):
     github_url: str
     access_token: Optional[str] = None
     branch: Optional[str] = "main"
+    user_id: Optional[str] = None
 
     @field_validator('github_url')
     @classmethod
@@ -153,6 +154,35 @@ class RepoRequest(BaseModel):
             raise ValueError("Must be a valid GitHub URL")
         return v.strip().rstrip('/')
 
+class RepoInitRequest(BaseModel):
+    files: Dict[str, str] = {}
+    user_id: Optional[str] = None
+
+class RepoFileRequest(BaseModel):
+    session_id: str
+    rel_path: str
+    content: str = ""
+    expected_hash: Optional[str] = None  # git blob id the file must still have ("" = must not exist)
+
+class RepoFileDeleteRequest(BaseModel):
+    session_id: str
+    rel_path: str
+    expected_hash: Optional[str] = None
+
+class RepoFileEdit(BaseModel):
+    rel_path: str
+    content: str = ""
+    delete: bool = False
+    expected_hash: Optional[str] = None
+
+class RepoBatchWriteRequest(BaseModel):
+    session_id: str
+    edits: List[RepoFileEdit]
+
+class RepoRestoreRequest(BaseModel):
+    session_id: str
+    commit: str
+
 class SkillMetric(BaseModel):
     name: str
     score: int  # 0-100
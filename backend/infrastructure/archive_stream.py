@@ -0,0 +1,168 @@
+"""
+Streaming Archive Writers
+Zip and tar.gz archives produced as an iterator of byte chunks, so a download can start
+while the archive is still being built and neither the archive nor any whole file is held
+in memory. The zip writer never seeks: sizes and CRCs follow each entry in a data
+descriptor. Entries that are already deflated (e.g. from a cache) can be copied in as-is.
+"""
+
+import time
+import zlib
+import struct
+import tarfile
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+# --- Configuration ---
+CHUNK_SIZE = 256 * 1024
+COMPRESS_LEVEL = 6
+
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+ZIP64_LIMIT = 0xFFFFFFFF
+_FLAG_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+
+
+def _dos_time(mtime: float) -> Tuple[int, int]:
+    t = time.localtime(max(mtime, 315532800))  # zip dates start in 1980
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+
+def read_chunks(f, size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    return iter(lambda: f.read(size), b"")
+
+
+class ZipStream:
+    """Writes one zip archive; iterate add()/add_deflated() per entry, then close()."""
+
+    def __init__(self):
+        self._offset = 0
+        self._entries: List[Tuple[bytes, int, int, int, int, int, int, int, int, int]] = []
+
+    def _emit(self, data: bytes) -> bytes:
+        self._offset += len(data)
+        return data
+
+    def _local_header(self, name: bytes, flags: int, method: int, dos: Tuple[int, int],
+                      crc: int, compressed_size: int, size: int, zip64: bool) -> bytes:
+        extra = b""
+        if zip64:
+            extra = struct.pack("<HHQQ", 0x0001, 16, size, compressed_size)
+            size = compressed_size = ZIP64_LIMIT
+        return struct.pack(
+            "<IHHHHHIIIHH", 0x04034B50, 45 if zip64 else 20, flags, method, dos[0], dos[1],
+            crc, compressed_size, size, len(name), len(extra),
+        ) + name + extra
+
+    def add(self, name: str, chunks: Iterable[bytes], mtime: float, mode: int = 0o644, compress: bool = True,
+            size_hint: int = 0, tee: Optional[Callable[[bytes], None]] = None) -> Iterator[bytes]:
+        """
+        Streams one entry from raw chunks. tee, if given, receives the compressed data as written;
+        after the entry is consumed, last_entry holds its (crc, size, compressed_size).
+        """
+        name_bytes = name.encode("utf-8")
+        method = ZIP_DEFLATED if compress else ZIP_STORED
+        flags = _FLAG_DESCRIPTOR | _FLAG_UTF8
+        dos = _dos_time(mtime)
+        zip64 = size_hint * 1.05 > ZIP64_LIMIT  # same headroom rule as zipfile
+        offset = self._offset
+        yield self._emit(self._local_header(name_bytes, flags, method, dos, 0, 0, 0, zip64))
+
+        compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, -15) if compress else None
+        crc = size = compressed_size = 0
+        for chunk in chunks:
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            data = compressor.compress(chunk) if compressor else chunk
+            if data:
+                compressed_size += len(data)
+                if tee:
+                    tee(data)
+                yield self._emit(data)
+        if compressor:
+            data = compressor.flush()
+            compressed_size += len(data)
+            if tee:
+                tee(data)
+            yield self._emit(data)
+
+        if zip64:
+            yield self._emit(struct.pack("<IIQQ", 0x08074B50, crc, compressed_size, size))
+        elif size > ZIP64_LIMIT or compressed_size > ZIP64_LIMIT:
+            raise ValueError(f"{name} is larger than its size hint allowed")
+        else:
+            yield self._emit(struct.pack("<IIII", 0x08074B50, crc, compressed_size, size))
+        self._entries.append((name_bytes, flags, method, dos[0], dos[1], crc, compressed_size, size, offset, mode))
+        self.last_entry = (crc, size, compressed_size)
+
+    def add_deflated(self, name: str, deflated: Iterable[bytes], crc: int, size: int, compressed_size: int,
+                     mtime: float, mode: int = 0o644) -> Iterator[bytes]:
+        """Streams one entry whose raw deflate data, CRC and sizes are already known."""
+        name_bytes = name.encode("utf-8")
+        dos = _dos_time(mtime)
+        zip64 = size > ZIP64_LIMIT or compressed_size > ZIP64_LIMIT
+        offset = self._offset
+        yield self._emit(self._local_header(name_bytes, _FLAG_UTF8, ZIP_DEFLATED, dos, crc, compressed_size, size, zip64))
+        for chunk in deflated:
+            yield self._emit(chunk)
+        self._entries.append((name_bytes, _FLAG_UTF8, ZIP_DEFLATED, dos[0], dos[1], crc, compressed_size, size, offset, mode))
+
+    def close(self) -> Iterator[bytes]:
+        """Central directory and end records."""
+        start = self._offset
+        for name, flags, method, dos_t, dos_d, crc, compressed_size, size, offset, mode in self._entries:
+            extra = b""
+            fields = []
+            if size >= ZIP64_LIMIT:
+                fields.append(size)
+                size = ZIP64_LIMIT
+            if compressed_size >= ZIP64_LIMIT:
+                fields.append(compressed_size)
+                compressed_size = ZIP64_LIMIT
+            if offset >= ZIP64_LIMIT:
+                fields.append(offset)
+                offset = ZIP64_LIMIT
+            if fields:
+                extra = struct.pack(f"<HH{len(fields)}Q", 0x0001, 8 * len(fields), *fields)
+            yield self._emit(struct.pack(
+                "<IHHHHHHIIIHHHHHII", 0x02014B50, (3 << 8) | 45, 45 if fields else 20, flags, method,
+                dos_t, dos_d, crc, compressed_size, size, len(name), len(extra), 0, 0, 0,
+                ((0o100000 | mode) & 0xFFFF) << 16, offset,
+            ) + name + extra)
+
+        count, cd_size, cd_offset = len(self._entries), self._offset - start, start
+        if count >= 0xFFFF or cd_size >= ZIP64_LIMIT or cd_offset >= ZIP64_LIMIT:
+            zip64_end = self._offset
+            yield self._emit(struct.pack("<IQHHIIQQQQ", 0x06064B50, 44, 45, 45, 0, 0, count, count, cd_size, cd_offset))
+            yield self._emit(struct.pack("<IIQI", 0x07064B50, 0, zip64_end, 1))
+            count, cd_size, cd_offset = min(count, 0xFFFF), min(cd_size, ZIP64_LIMIT), min(cd_offset, ZIP64_LIMIT)
+        yield self._emit(struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, count, count, cd_size, cd_offset, 0))
+
+
+class TarGzStream:
+    """Writes one tar.gz archive; iterate add() per entry, then close()."""
+
+    def __init__(self):
+        self._gzip = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 31)
+
+    def add(self, name: str, chunks: Iterable[bytes], size: int, mtime: float, mode: int = 0o644) -> Iterator[bytes]:
+        info = tarfile.TarInfo(name)
+        info.size, info.mtime, info.mode = size, int(mtime), mode & 0o7777
+        data = self._gzip.compress(info.tobuf(format=tarfile.PAX_FORMAT))
+        if data:
+            yield data
+        written = 0
+        for chunk in chunks:
+            chunk = chunk[:size - written]  # the header promised `size` bytes
+            written += len(chunk)
+            data = self._gzip.compress(chunk)
+            if data:
+                yield data
+        # A file that shrank while being read is padded to its announced size
+        padding = (size - written) + (-size % tarfile.BLOCKSIZE)
+        data = self._gzip.compress(b"\0" * padding)
+        if data:
+            yield data
+
+    def close(self) -> Iterator[bytes]:
+        yield self._gzip.compress(b"\0" * tarfile.BLOCKSIZE * 2) + self._gzip.flush()
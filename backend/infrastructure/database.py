@@ -1,6 +1,7 @@
 import os
 import asyncpg
 import asyncio
+from contextlib import asynccontextmanager
 from typing import Optional
 
 DATABASE_URL = os.environ.get("DATABASE_URL")
@@ -43,4 +44,17 @@ class Database:
         async with self._pool.acquire() as conn:
             return await conn.fetchrow(query, *args)
 
+    async def fetchval(self, query: str, *args):
+        if not self._pool: await self.connect()
+        async with self._pool.acquire() as conn:
+            return await conn.fetchval(query, *args)
+
+    @asynccontextmanager
+    async def transaction(self):
+        """Yields a connection whose statements commit (or roll back) together."""
+        if not self._pool: await self.connect()
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                yield conn
+
 db = Database()
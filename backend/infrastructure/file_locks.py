@@ -0,0 +1,42 @@
+"""
+Cross-process file locks for the session registry and repo sessions.
+flock on POSIX. Windows has no flock, so there the first byte of the file is
+locked with msvcrt instead; those locks are always exclusive and are waited
+for by polling.
+"""
+
+import time
+from typing import IO
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# --- Configuration ---
+POLL_INTERVAL = 0.05  # seconds between attempts while a Windows lock is held elsewhere
+
+
+def lock_file(f: IO, exclusive: bool = True, blocking: bool = True) -> bool:
+    """
+    Locks an open file until it is closed. Returns False only when blocking is False and
+    another process holds the lock.
+    """
+    if fcntl is not None:
+        flags = (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | (0 if blocking else fcntl.LOCK_NB)
+        try:
+            fcntl.flock(f, flags)
+        except BlockingIOError:
+            return False
+        return True
+
+    f.seek(0)
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            if not blocking:
+                return False
+            time.sleep(POLL_INTERVAL)
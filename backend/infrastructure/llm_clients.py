@@ -0,0 +1,126 @@
+import os
+import time
+import threading
+import logging
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+DEFAULT_MODEL = "gemini-2.5-flash"
+STREAM_SAMPLES = 500  # recent streamed replies kept for latency percentiles
+
+_backend_dir = Path(__file__).resolve().parent.parent
+_root = _backend_dir.parent
+_env_lock = threading.Lock()
+_env_loaded = False
+
+
+def load_env():
+    """Loads backend/.env, .env.local and .env (first one wins) once per process."""
+    global _env_loaded
+    with _env_lock:
+        if _env_loaded:
+            return
+        load_dotenv(dotenv_path=_backend_dir / ".env")
+        load_dotenv(dotenv_path=_root / ".env.local")
+        load_dotenv(dotenv_path=_root / ".env")
+        _env_loaded = True
+
+
+def _connection_counts(llm: Any) -> Dict[str, Optional[int]]:
+    """Open HTTP connections in the google-genai transports behind a chat model (None if unknown)."""
+    api_client = getattr(getattr(llm, "client", None), "_api_client", None)
+    counts: Dict[str, Optional[int]] = {}
+    for label, attr in (("sync", "_httpx_client"), ("async", "_async_httpx_client")):
+        try:
+            counts[label] = len(getattr(api_client, attr)._transport._pool.connections)
+        except AttributeError:
+            counts[label] = None
+    return counts
+
+
+class LLMClientRegistry:
+    """
+    One chat model client per (model, temperature), built on first use and shared by all
+    requests afterwards. Building a ChatGoogleGenerativeAI validates settings and creates a
+    google-genai client with its own HTTP connection pools, so a client per request paid
+    that cost and a fresh TLS handshake every time. Clients are meant for the server's event
+    loop; their async connection pools are tied to it.
+    """
+
+    def __init__(self):
+        self._clients: Dict[Tuple[str, float], Any] = {}
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Any] = {"hits": 0, "misses": 0, "build_ms": 0.0, "clients": {}, "streams": 0}
+        self._ttft_ms: deque = deque(maxlen=STREAM_SAMPLES)
+        self._stream_ms: deque = deque(maxlen=STREAM_SAMPLES)
+
+    def get(self, model: Optional[str] = None, temperature: float = 0.7):
+        load_env()
+        key = (model or os.getenv("GEMINI_MODEL", DEFAULT_MODEL), float(temperature))
+        with self._lock:
+            llm = self._clients.get(key)
+            if llm is None:
+                llm = self._build(*key)
+                self._clients[key] = llm
+                self._metrics["misses"] += 1
+                return llm
+            self._metrics["hits"] += 1
+            self._metrics["clients"][f"{key[0]}@{key[1]}"]["uses"] += 1
+        return llm
+
+    def _build(self, model: str, temperature: float):
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY not found in environment variables.")
+        started = time.perf_counter()
+        llm = ChatGoogleGenerativeAI(model=model, google_api_key=api_key, temperature=temperature)
+        build_ms = (time.perf_counter() - started) * 1000
+        self._metrics["build_ms"] += build_ms
+        self._metrics["clients"][f"{model}@{temperature}"] = {
+            "model": model, "temperature": temperature, "created_at": time.time(), "build_ms": build_ms, "uses": 1,
+        }
+        logger.info(f"Created LLM client {model} (temperature {temperature}) in {build_ms:.0f} ms")
+        return llm
+
+    def record_stream(self, ttft_ms: Optional[float], total_ms: float):
+        """Latency of one streamed reply; ttft_ms is None when no text arrived."""
+        with self._lock:
+            self._metrics["streams"] += 1
+            if ttft_ms is not None:
+                self._ttft_ms.append(ttft_ms)
+            self._stream_ms.append(total_ms)
+
+    def _stream_stats(self) -> Dict[str, Any]:
+        """Call with _lock held."""
+        def percentile(samples, q):
+            return samples[min(len(samples) - 1, int(q * len(samples)))] if samples else None
+        ttft, total = sorted(self._ttft_ms), sorted(self._stream_ms)
+        return {
+            "count": self._metrics["streams"],
+            "ttft_ms_p50": percentile(ttft, 0.5),
+            "ttft_ms_p95": percentile(ttft, 0.95),
+            "total_ms_p50": percentile(total, 0.5),
+            "total_ms_p95": percentile(total, 0.95),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            clients = dict(self._clients)
+            per_client = {name: dict(s) for name, s in self._metrics["clients"].items()}
+            totals = {name: self._metrics[name] for name in ("hits", "misses", "build_ms")}
+            streams = self._stream_stats()
+        for (model, temperature), llm in clients.items():
+            per_client[f"{model}@{temperature}"]["connections"] = _connection_counts(llm)
+        return {"clients": len(clients), **totals, "by_client": per_client, "streams": streams}
+
+
+load_env()
+llm_clients = LLMClientRegistry()
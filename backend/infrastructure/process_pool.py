@@ -0,0 +1,125 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+POOL_WORKERS = int(os.environ.get("PROCESS_POOL_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+POOL_MAX_QUEUE = int(os.environ.get("PROCESS_POOL_MAX_QUEUE", POOL_WORKERS * 4))
+POOL_RECYCLE_AFTER = int(os.environ.get("PROCESS_POOL_RECYCLE_AFTER", 200))  # tasks per executor generation
+POOL_START_METHOD = os.environ.get(
+    "PROCESS_POOL_START_METHOD", "forkserver" if sys.platform.startswith("linux") else "spawn"
+)
+
+
+def _timed_call(fn: Callable, args: tuple, kwargs: dict):
+    """Runs in the worker; returns the result together with the pure run time."""
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+class ProcessPool:
+    """
+    Process pool for CPU-bound work, so it never runs on the event loop thread.
+    In-flight tasks are capped at workers + max_queue (callers wait beyond that),
+    and the executor is replaced every `recycle_after` tasks to bound worker memory.
+    """
+
+    def __init__(self, workers: int = POOL_WORKERS, max_queue: int = POOL_MAX_QUEUE,
+                 recycle_after: int = POOL_RECYCLE_AFTER, start_method: str = POOL_START_METHOD):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.recycle_after = recycle_after
+        self.start_method = start_method
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._generation_tasks = 0
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._metrics: Dict[str, Any] = {
+            "submitted": 0, "completed": 0, "failed": 0, "in_flight": 0, "waiting": 0,
+            "recycled": 0, "broken": 0, "tasks": {},
+        }
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None or self._generation_tasks >= self.recycle_after:
+            if self._executor is not None:
+                # Running tasks finish on the old workers; new work goes to fresh ones
+                self._executor.shutdown(wait=False)
+                self._metrics["recycled"] += 1
+            context = multiprocessing.get_context(self.start_method)
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            self._generation_tasks = 0
+        self._generation_tasks += 1
+        return self._executor
+
+    def _record(self, name: str, wait: float, run: float, ok: bool):
+        stats = self._metrics["tasks"].setdefault(
+            name, {"count": 0, "failed": 0, "total_run_ms": 0.0, "max_run_ms": 0.0, "total_wait_ms": 0.0}
+        )
+        stats["count"] += 1
+        stats["failed"] += 0 if ok else 1
+        stats["total_run_ms"] += run * 1000
+        stats["max_run_ms"] = max(stats["max_run_ms"], run * 1000)
+        stats["total_wait_ms"] += wait * 1000
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Runs a picklable, module-level function in the pool and awaits its result."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers + self.max_queue)
+
+        name = getattr(fn, "__qualname__", repr(fn))
+        queued_at = time.perf_counter()
+        self._metrics["waiting"] += 1
+        async with self._slots:
+            self._metrics["waiting"] -= 1
+            self._metrics["submitted"] += 1
+            self._metrics["in_flight"] += 1
+            loop = asyncio.get_running_loop()
+            try:
+                try:
+                    result, run_time = await loop.run_in_executor(self._get_executor(), _timed_call, fn, args, kwargs)
+                except BrokenProcessPool:
+                    # A worker died (OOM, segfault); start a new generation and retry once
+                    self._metrics["broken"] += 1
+                    self._generation_tasks = self.recycle_after
+                    result, run_time = await loop.run_in_executor(self._get_executor(), _timed_call, fn, args, kwargs)
+            except Exception:
+                self._metrics["failed"] += 1
+                self._record(name, time.perf_counter() - queued_at, 0.0, ok=False)
+                raise
+            finally:
+                self._metrics["in_flight"] -= 1
+
+        self._metrics["completed"] += 1
+        self._record(name, time.perf_counter() - queued_at - run_time, run_time, ok=True)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        tasks = {
+            name: {**s, "avg_run_ms": s["total_run_ms"] / s["count"] if s["count"] else 0.0,
+                   "avg_wait_ms": s["total_wait_ms"] / s["count"] if s["count"] else 0.0}
+            for name, s in self._metrics["tasks"].items()
+        }
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "recycle_after": self.recycle_after,
+            **{k: v for k, v in self._metrics.items() if k != "tasks"},
+            "tasks": tasks,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+process_pool = ProcessPool()
@@ -0,0 +1,200 @@
+"""
+Pluggable Sandbox Backends
+All backends hand out sandboxes with the Daytona tool interface
+(git.clone, process.exec, process.code_run, fs.download_file, fs.upload_file).
+The local backend runs each sandbox in its own scratch dir, with rlimits on
+every command (via `prlimit`) and, where `unshare` works, fresh user/PID/network
+namespaces. It has no filesystem isolation: the scratch dir is only the working
+directory, and executed code can read and write whatever the server user can
+(backend/.env, other sandboxes). It is therefore opt-in only
+(SANDBOX_BACKEND=local), Linux only, and meant for trusted code; untrusted code
+runs on Daytona, the default.
+This module is also used by the standalone review app in public/Sandbox, and is
+importable on every platform (the local backend checks its requirements when
+it is created).
+"""
+
+import os
+import uuid
+import shutil
+import signal
+import logging
+import tempfile
+import subprocess
+from types import SimpleNamespace
+from typing import List, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+SANDBOX_BACKEND = os.environ.get("SANDBOX_BACKEND") or "daytona"  # local only when asked for explicitly
+LOCAL_SANDBOX_ROOT = os.environ.get("LOCAL_SANDBOX_ROOT") or None
+LOCAL_SANDBOX_CPU_SECONDS = int(os.environ.get("LOCAL_SANDBOX_CPU_SECONDS", 120))
+LOCAL_SANDBOX_MEMORY_MB = int(os.environ.get("LOCAL_SANDBOX_MEMORY_MB", 2048))
+LOCAL_SANDBOX_FILE_MB = int(os.environ.get("LOCAL_SANDBOX_FILE_MB", 256))
+LOCAL_SANDBOX_NOFILE = int(os.environ.get("LOCAL_SANDBOX_NOFILE", 1024))
+LOCAL_SANDBOX_UNSHARE = os.environ.get("LOCAL_SANDBOX_UNSHARE", "1") == "1"
+LOCAL_SANDBOX_NETWORK = os.environ.get("LOCAL_SANDBOX_NETWORK", "0") == "1"
+CLONE_TIMEOUT = 120
+HOME_DIR = "home"  # per-sandbox $HOME inside the scratch dir
+
+
+class SandboxBackend:
+    """Creates and destroys sandboxes for one provider."""
+
+    name = "base"
+
+    def create(self):
+        raise NotImplementedError
+
+    def destroy(self, sandbox):
+        raise NotImplementedError
+
+
+class DaytonaBackend(SandboxBackend):
+    """Remote Daytona sandboxes via daytona_sdk."""
+
+    name = "daytona"
+
+    def __init__(self, api_key: Optional[str] = None, server_url: Optional[str] = None):
+        from daytona_sdk import Daytona, DaytonaConfig
+
+        config = {"api_key": api_key or os.environ.get("DAYTONA_API_KEY")}
+        server_url = server_url or os.environ.get("DAYTONA_SERVER_URL")
+        if server_url:
+            config["api_url"] = server_url
+        self.client = Daytona(DaytonaConfig(**config))
+
+    def create(self):
+        return self.client.create()
+
+    def destroy(self, sandbox):
+        self.client.delete(sandbox)
+
+
+def _probe_unshare(network: bool) -> List[str]:
+    """`unshare` prefix for commands, or [] if namespaces are not available on this host."""
+    if not LOCAL_SANDBOX_UNSHARE or not shutil.which("unshare"):
+        return []
+    prefix = ["unshare", "--user", "--map-root-user", "--pid", "--fork", "--kill-child"]
+    if not network:
+        prefix.append("--net")
+    try:
+        probe = subprocess.run(prefix + ["true"], capture_output=True, timeout=5)
+    except (OSError, subprocess.TimeoutExpired):
+        return []
+    if probe.returncode != 0:
+        logger.warning(f"unshare unavailable, local sandboxes use rlimits only: {probe.stderr.decode(errors='replace').strip()}")
+        return []
+    return prefix
+
+
+def _prlimit_prefix() -> List[str]:
+    """
+    `prlimit` prefix that applies the rlimits to every command. Setting them from a
+    preexec_fn is not safe while other threads (jobs, the pool) start processes too.
+    """
+    mb = 1024 * 1024
+    return [
+        "prlimit",
+        f"--cpu={LOCAL_SANDBOX_CPU_SECONDS}",
+        f"--data={LOCAL_SANDBOX_MEMORY_MB * mb}",
+        f"--fsize={LOCAL_SANDBOX_FILE_MB * mb}",
+        f"--nofile={LOCAL_SANDBOX_NOFILE}",
+        "--core=0",
+        "--",
+    ]
+
+
+class LocalSandbox:
+    """Scratch-dir sandbox exposing the Daytona tool interface."""
+
+    def __init__(self, root: str, prefix: List[str], unshare: List[str]):
+        self.id = f"local-{uuid.uuid4().hex[:8]}"
+        self.root = root
+        self.prefix = prefix
+        self.unshare = unshare
+        self.home = os.path.join(root, HOME_DIR)
+        os.makedirs(os.path.join(self.home, "tmp"), exist_ok=True)
+
+        self.git = SimpleNamespace(clone=self._clone)
+        self.process = SimpleNamespace(exec=self._exec, code_run=self._code_run)
+        self.fs = SimpleNamespace(download_file=self._download_file, upload_file=self._upload_file)
+
+    def _path(self, path: str) -> str:
+        full = os.path.realpath(os.path.join(self.root, path.lstrip("/")))
+        if full != self.root and not full.startswith(self.root + os.sep):
+            raise PermissionError(f"Path escapes the sandbox: {path}")
+        return full
+
+    def _run(self, args: List[str], timeout: int, isolated: bool = True) -> SimpleNamespace:
+        args = self.prefix + (self.unshare if isolated else []) + args
+        env = {
+            "PATH": os.environ.get("PATH", "/usr/local/bin:/usr/bin:/bin"),
+            "HOME": self.home,
+            "TMPDIR": os.path.join(self.home, "tmp"),
+            "LANG": os.environ.get("LANG", "C.UTF-8"),
+        }
+        proc = subprocess.Popen(
+            args, cwd=self.root, env=env, stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, start_new_session=True,
+        )
+        try:
+            output, _ = proc.communicate(timeout=timeout)
+            return SimpleNamespace(exit_code=proc.returncode, result=output.decode("utf-8", errors="replace"))
+        except subprocess.TimeoutExpired:
+            os.killpg(proc.pid, signal.SIGKILL)
+            proc.communicate()
+            return SimpleNamespace(exit_code=-1, result=f"Timed out after {timeout}s")
+
+    def _exec(self, command: str, timeout: int = 60) -> SimpleNamespace:
+        return self._run(["bash", "-c", command], timeout)
+
+    def _code_run(self, code: str, timeout: int = 60) -> SimpleNamespace:
+        return self._run(["python3", "-c", code], timeout)
+
+    def _clone(self, url: str, path: str, branch: Optional[str] = None):
+        # Cloning needs the network, so it runs outside the namespaces
+        args = ["git", "clone", "--depth", "1"] + (["--branch", branch] if branch else []) + [url, self._path(path)]
+        result = self._run(args, CLONE_TIMEOUT, isolated=False)
+        if result.exit_code != 0:
+            raise RuntimeError(result.result)
+
+    def _download_file(self, path: str) -> bytes:
+        with open(self._path(path), "rb") as f:
+            return f.read()
+
+    def _upload_file(self, content: bytes, path: str):
+        full = self._path(path)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        with open(full, "wb") as f:
+            f.write(content)
+
+
+class LocalBackend(SandboxBackend):
+    """Local sandboxes: start in milliseconds and work offline. For trusted code only (see module docstring)."""
+
+    name = "local"
+    scratch_prefix = "interna-sandbox-"
+
+    def __init__(self, root: Optional[str] = LOCAL_SANDBOX_ROOT, network: bool = LOCAL_SANDBOX_NETWORK):
+        if os.name != "posix" or not shutil.which("prlimit") or not shutil.which("bash"):
+            raise RuntimeError("The local sandbox backend needs Linux with prlimit (util-linux) and bash")
+        self.root = root
+        self.prefix = _prlimit_prefix()
+        self.unshare = _probe_unshare(network)
+
+    def create(self) -> LocalSandbox:
+        return LocalSandbox(tempfile.mkdtemp(prefix=self.scratch_prefix, dir=self.root), self.prefix, self.unshare)
+
+    def destroy(self, sandbox: LocalSandbox):
+        shutil.rmtree(sandbox.root, ignore_errors=True)
+
+
+def create_backend(name: str = SANDBOX_BACKEND) -> SandboxBackend:
+    if name == "local":
+        return LocalBackend()
+    if name == "daytona":
+        return DaytonaBackend()
+    raise ValueError(f"Unknown sandbox backend: {name}")
@@ -0,0 +1,217 @@
+"""
+Shared Registry for IDE Repo Sessions
+One small JSON record per session, visible to every uvicorn worker (and to
+other replicas when REPO_REGISTRY_DIR is on shared storage). Records say which
+node holds the checkout, where it lives, who owns it and when it was last used,
+and carry the session's version counter and change log, so edits made through
+different workers stay ordered. Records are rewritten under a lock file next to
+them (<record>.json.lock) by writing a temp file and renaming it over the record,
+so readers never see an empty or partial record and need no lock.
+Shared base checkouts get a record per node as well (bases/<node>/<key>.json),
+plus a lock file that is held while a base is cloned, handed out or removed.
+"""
+
+import os
+import json
+import time
+import socket
+import logging
+import tempfile
+from contextlib import contextmanager
+from typing import IO, Any, Callable, Dict, Iterator, Optional
+
+from infrastructure.file_locks import lock_file
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+NODE_ID = os.environ.get("REPO_NODE_ID") or socket.gethostname()
+TOUCH_INTERVAL = 30  # seconds between last_access writes for the same session
+
+
+def _read(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write(path: str, record: Dict[str, Any]):
+    """Replaces a record atomically. Caller holds its lock (_locked)."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(record, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+@contextmanager
+def _locked(path: str):
+    """Exclusive lock for rewriting the record at path."""
+    with open(path + ".lock", "a") as lock:
+        lock_file(lock)
+        yield
+
+
+def _discard(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _update(path: str, mutate: Optional[Callable[[Dict[str, Any]], None]],
+            fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Read-modify-write of the record at path; None if there is no record."""
+    with _locked(path):
+        record = _read(path)
+        if record is None:
+            _discard(path + ".lock")  # the record was removed; do not leave its lock file behind
+            return None
+        record.update(fields)
+        if mutate is not None:
+            mutate(record)
+        _write(path, record)
+        return record
+
+
+class FileSessionRegistry:
+    def __init__(self, directory: str, node: str = NODE_ID):
+        self.directory = directory
+        self.node = node
+        self.bases_directory = os.path.join(directory, "bases", "".join(c if c.isalnum() else "_" for c in node))
+        os.makedirs(self.bases_directory, exist_ok=True)
+
+    def _path(self, session_id: str) -> str:
+        # Session ids are uuid4 strings; anything else must not reach the filesystem
+        if not session_id or not all(c.isalnum() or c == "-" for c in session_id):
+            raise KeyError(session_id)
+        return os.path.join(self.directory, f"{session_id}.json")
+
+    def register(self, session_id: str, root: str, owner: Optional[str] = None, **fields: Any) -> Dict[str, Any]:
+        now = time.time()
+        record = {
+            "session_id": session_id,
+            "node": self.node,
+            "pid": os.getpid(),
+            "root": root,
+            "owner": owner,
+            "created_at": now,
+            "last_access": now,
+            "version": 0,
+            "changes": {},
+            **fields,
+        }
+        path = self._path(session_id)
+        with _locked(path):
+            _write(path, record)
+        return record
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            return _read(self._path(session_id))
+        except KeyError:
+            return None
+
+    def update(self, session_id: str, mutate: Optional[Callable[[Dict[str, Any]], None]] = None,
+               **fields: Any) -> Optional[Dict[str, Any]]:
+        """
+        Read-modify-write of one record under an exclusive lock: sets `fields`, then calls
+        mutate(record) if given. Returns the new record, or None if the session is gone.
+        """
+        try:
+            path = self._path(session_id)
+        except KeyError:
+            return None
+        return _update(path, mutate, fields)
+
+    def touch(self, session_id: str, last_written: float) -> float:
+        """Updates last_access at most every TOUCH_INTERVAL seconds. Returns when it was last written."""
+        now = time.time()
+        if now - last_written < TOUCH_INTERVAL:
+            return last_written
+        self.update(session_id, last_access=now)
+        return now
+
+    def remove(self, session_id: str):
+        try:
+            path = self._path(session_id)
+        except KeyError:
+            return
+        with _locked(path):
+            _discard(path)
+        _discard(path + ".lock")
+
+    def records(self, node: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".json"):
+                continue
+            record = self.get(entry.name[:-5])
+            if record is not None and (node is None or record.get("node") == node):
+                yield record
+
+    # --- Shared bases (this node's) ---
+
+    def _base_path(self, key: str, suffix: str = ".json") -> str:
+        if not key or not key.isalnum():
+            raise KeyError(key)
+        return os.path.join(self.bases_directory, f"{key}{suffix}")
+
+    def lock_base(self, key: str, blocking: bool = True) -> Optional[IO]:
+        """
+        Takes the exclusive lock of one base; release it by closing the returned file. Returns
+        None if blocking is False and another worker holds it.
+        """
+        f = open(self._base_path(key, ".lock"), "a")
+        if not lock_file(f, blocking=blocking):
+            f.close()
+            return None
+        return f
+
+    def get_base(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            return _read(self._base_path(key))
+        except KeyError:
+            return None
+
+    def put_base(self, key: str, path: str, size_bytes: int) -> Dict[str, Any]:
+        now = time.time()
+        record = {"key": key, "node": self.node, "path": path, "size_bytes": size_bytes,
+                  "created_at": now, "last_used": now}
+        path = self._base_path(key)
+        with _locked(path):
+            _write(path, record)
+        return record
+
+    def update_base(self, key: str, mutate: Optional[Callable[[Dict[str, Any]], None]] = None,
+                    **fields: Any) -> Optional[Dict[str, Any]]:
+        """Read-modify-write of one base record, as update(); None if there is no record."""
+        try:
+            path = self._base_path(key)
+        except KeyError:
+            return None
+        return _update(path, mutate, fields)
+
+    def remove_base(self, key: str):
+        try:
+            path = self._base_path(key)
+        except KeyError:
+            return
+        with _locked(path):
+            _discard(path)
+        _discard(path + ".lock")
+
+    def bases(self) -> Iterator[Dict[str, Any]]:
+        for entry in os.scandir(self.bases_directory):
+            if entry.name.endswith(".json"):
+                record = self.get_base(entry.name[:-5])
+                if record is not None:
+                    yield record
@@ -6,8 +6,19 @@ Streams live step-by-step progress to the frontend via Server-Sent Events.
 Endpoints:
   POST /review          → starts a review, returns { job_id }
   GET  /review/{job_id} → SSE stream of events until report is done
+                          (reconnect with Last-Event-ID to replay missed events)
+  GET  /jobs/stats      → running / queued job counts
+  GET  /sandbox/pool    → warm sandbox pool stats
+
+Reviews run in "agent" mode by default: the LangChain agent drives the tools.
+Pass {"mode": "pipeline"} for a fixed tool order where the model is only
+called for per-file reviews and the final summary.
+
+Sandboxes are leased from a pool of warm, pre-provisioned sandboxes
+(see sandbox_pool.py); set SANDBOX_BACKEND=local to run without Daytona.
 
 Event types sent to frontend:
+  { "type": "queue",   "message": "Waiting in queue (position 2)", "position": 2 }
   { "type": "step",    "message": "Cloning repository..." }
   { "type": "file",    "message": "Reading /home/user/repo/main.py" }
   { "type": "execute", "message": "Executing /home/user/repo/main.py → SUCCESS" }
@@ -27,24 +38,28 @@ import os
 import sys
 import json
 import asyncio
-import uuid
 import re
 from datetime import datetime
 from typing import AsyncIterator
 from dotenv import load_dotenv
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from sse_starlette.sse import EventSourceResponse
 
-from daytona import Daytona, DaytonaConfig, CreateSandboxBaseParams
 from langchain.tools import tool
 from langchain.agents import create_agent
 from langchain_google_genai import ChatGoogleGenerativeAI
 
 load_dotenv(dotenv_path=r"D:\Other\Interns\GDG\GDG_MZ_Sync\public\Sandbox\.env.local")
 
+from sandbox_backend import SANDBOX_BACKEND
+from sandbox_pool import create_pool
+from batch_runner import ensure_linters, run_batch, format_lint
+from pipeline import REVIEW_MODE, REVIEW_MODES, run_pipeline
+from job_manager import JobManager, QueueFullError
+
 # ─────────────────────────────────────────────────────────────────
 # Config
 # ─────────────────────────────────────────────────────────────────
@@ -71,9 +86,12 @@ SKIP_DIRS = {
 }
 
 # ─────────────────────────────────────────────────────────────────
-# In-memory job store  { job_id: asyncio.Queue }
+# Job manager  (concurrency limit, FIFO queue, bounded event buffers)
 # ─────────────────────────────────────────────────────────────────
-jobs: dict[str, asyncio.Queue] = {}
+manager = JobManager()
+
+# Warm sandbox pool, created on startup
+pool = None
 
 # ─────────────────────────────────────────────────────────────────
 # FastAPI app
@@ -87,11 +105,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.on_event("startup")
+async def startup():
+    global pool
+    pool = create_pool()
+    pool.start()
+    manager.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    manager.shutdown()
+    if pool:
+        await asyncio.to_thread(pool.close)
+
 # ─────────────────────────────────────────────────────────────────
 # Request / Response schemas
 # ─────────────────────────────────────────────────────────────────
 class ReviewRequest(BaseModel):
     repo_url: str
+    mode: str = REVIEW_MODE   # "agent" or "pipeline"
 
 class ReviewResponse(BaseModel):
     job_id: str
@@ -99,38 +133,35 @@ class ReviewResponse(BaseModel):
 
 
 # ─────────────────────────────────────────────────────────────────
-# Agent runner  (runs in a background thread via asyncio.to_thread)
+# Agent runner  (runs on the job manager's thread pool)
 # ─────────────────────────────────────────────────────────────────
-def run_review_sync(repo_url: str, queue: asyncio.Queue, loop: asyncio.AbstractEventLoop):
+def run_review_sync(publish, repo_url: str, mode: str = REVIEW_MODE):
     """
-    Synchronous agent runner. Emits events into the asyncio queue
+    Synchronous agent runner. Publishes events into the job's buffer
     so the SSE endpoint can stream them to the frontend.
     """
 
     def emit(event_type: str, message: str = "", data: str = ""):
-        payload = {"type": event_type, "message": message, "data": data}
-        asyncio.run_coroutine_threadsafe(queue.put(payload), loop)
+        publish({"type": event_type, "message": message, "data": data})
 
-    # ── Sandbox singleton (per-job) ───────────────────────────────
-    daytona_client = None
-    sandbox        = None
+    # ── Sandbox lease (per-job) ───────────────────────────────────
+    sandbox = None
 
     def get_sandbox():
-        nonlocal daytona_client, sandbox
+        nonlocal sandbox
         if sandbox is None:
-            emit("step", "🏗  Creating Daytona sandbox...")
-            daytona_client = Daytona(DaytonaConfig(api_key=DAYTONA_API_KEY))
-            sandbox = daytona_client.create(CreateSandboxBaseParams(language="python"))
+            emit("step", "🏗  Leasing sandbox from pool...")
+            sandbox = pool.acquire()
             emit("step", f"✅ Sandbox ready (id={sandbox.id})")
         return sandbox
 
-    def delete_sandbox():
-        nonlocal daytona_client, sandbox
-        if sandbox and daytona_client:
-            emit("step", "🧹 Cleaning up sandbox...")
-            daytona_client.delete(sandbox)
+    def release_sandbox():
+        nonlocal sandbox
+        if sandbox is not None:
+            emit("step", "🧹 Resetting sandbox...")
+            pool.release(sandbox)
             sandbox = None
-            emit("step", "✅ Sandbox deleted")
+            emit("step", "✅ Sandbox returned to pool")
 
     # ── Tools (defined inside runner so they share sandbox + queue) ──
 
@@ -213,7 +244,10 @@ print(json.dumps(files))
         sb = get_sandbox()
         emit("lint", f"🔍 Linting {file_path}")
         if language == "python":
-            sb.process.exec("pip install -q pylint flake8", timeout=60)
+            lint_error = ensure_linters(sb)
+            if lint_error:
+                emit("lint", f"⚠️  {lint_error.splitlines()[0]}")
+                return lint_error
             pylint = sb.process.exec(f"pylint --score=yes {file_path} 2>&1", timeout=30)
             flake8 = sb.process.exec(f"flake8 {file_path} 2>&1", timeout=30)
             return (
@@ -225,6 +259,37 @@ print(json.dumps(files))
             return result.result.strip() or "No ESLint issues found."
         return f"No linter configured for: {language}"
 
+    @tool
+    def execute_and_lint_all(directory: str = "repo") -> str:
+        """Execute and lint EVERY source file under directory in one parallel sandbox call.
+        Returns JSON [{path, language, execution, lint}] — prefer this over per-file execute_file/run_linter."""
+        sb = get_sandbox()
+        emit("step", "⚙️  Executing + linting all files in one batch...")
+        lint_error = ensure_linters(sb)
+        if lint_error:
+            emit("lint", f"⚠️  {lint_error.splitlines()[0]}")
+        try:
+            batch = run_batch(sb, directory, SUPPORTED_EXTENSIONS, SKIP_DIRS, lint_error=lint_error)
+        except Exception as e:
+            emit("error", f"Batch run failed: {str(e)[:200]}")
+            return f"BATCH FAILED:\n{e}"
+
+        files = []
+        for f in batch["files"]:
+            execution = f["execution"]
+            status = execution["status"] if execution else "NOT EXECUTED"
+            emit("execute", f"  → {f['path']}  [{status}]")
+            if f["lint"]:
+                emit("lint", f"🔍 Linted {f['path']} ({', '.join(f['lint'])})")
+            files.append({
+                "path":      f["path"],
+                "language":  f["language"],
+                "execution": f"[{status}]\n{execution['output'] or '(no output)'}" if execution else "Execution not supported",
+                "lint":      format_lint(f["lint"]),
+            })
+        emit("step", f"✅ Batch finished: {len(files)} file(s) in {batch['duration']:.1f}s")
+        return json.dumps(files)
+
     @tool
     def write_report(content: str, output_path: str = "/tmp/code_review_report.md") -> str:
         """Write the final Markdown report. Saves locally and emits the content to the frontend."""
@@ -241,19 +306,20 @@ print(json.dumps(files))
         return f"Report written to {output_path} and saved locally."
 
     # ── Build & run agent ─────────────────────────────────────────
-    tools = [clone_repo, list_source_files, read_file_code, execute_file, run_linter, write_report]
+    tools = [clone_repo, list_source_files, execute_and_lint_all, read_file_code, execute_file, run_linter, write_report]
 
     system_prompt = """You are an expert code review agent with access to an isolated Daytona sandbox.
 
 Given a GitHub repository URL:
 1. Clone the repo with clone_repo.
 2. Discover all source files with list_source_files — always pass directory="repo".
-3. For EACH file:
+3. Execute and lint ALL files in a single call with execute_and_lint_all — always pass directory="repo".
+   Only fall back to execute_file / run_linter to re-check an individual file.
+4. For EACH file:
    a. Read the code with read_file_code.
-   b. Execute it with execute_file.
-   c. Lint it with run_linter.
-   d. Analyse for bugs, security issues, missing error handling, code quality, best-practice violations.
-4. Write a Markdown report with write_report using this exact structure:
+   b. Use its execution and linter results from step 3.
+   c. Analyse for bugs, security issues, missing error handling, code quality, best-practice violations.
+5. Write a Markdown report with write_report using this exact structure:
 
 # Code Review Report
 **Repo:** <url>
@@ -293,23 +359,26 @@ Given a GitHub repository URL:
             temperature=0,
             max_tokens=8192,
         )
-        agent = create_agent(model=llm, tools=tools, system_prompt=system_prompt)
 
-        task = (
-            f"Review the code in this GitHub repository: {repo_url}\n"
-            f"Today's date: {datetime.now().strftime('%Y-%m-%d')}\n"
-            "Follow the full review process: clone → list files → "
-            "read + execute + lint each file → write the Markdown report."
-        )
+        if mode == "pipeline":
+            run_pipeline({t.name: t for t in tools}, llm, repo_url, "repo", log=lambda m: emit("step", m))
+        else:
+            agent = create_agent(model=llm, tools=tools, system_prompt=system_prompt)
+
+            task = (
+                f"Review the code in this GitHub repository: {repo_url}\n"
+                f"Today's date: {datetime.now().strftime('%Y-%m-%d')}\n"
+                "Follow the full review process: clone → list files → "
+                "execute + lint all files in one batch → read each file → write the Markdown report."
+            )
 
-        agent.invoke({"messages": [{"role": "user", "content": task}]})
+            agent.invoke({"messages": [{"role": "user", "content": task}]})
         emit("done", "✅ Review complete")
 
     except Exception as e:
         emit("error", f"Agent error: {str(e)}")
     finally:
-        delete_sandbox()
-        asyncio.run_coroutine_threadsafe(queue.put(None), loop)  # sentinel
+        release_sandbox()
 
 
 # ─────────────────────────────────────────────────────────────────
@@ -321,56 +390,60 @@ async def start_review(req: ReviewRequest):
     """Start a new code review job. Returns a job_id to stream from."""
     if not req.repo_url.startswith("http"):
         raise HTTPException(status_code=400, detail="repo_url must start with https://")
-    if not DAYTONA_API_KEY:
+    if req.mode not in REVIEW_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(REVIEW_MODES)}")
+    if SANDBOX_BACKEND == "daytona" and not DAYTONA_API_KEY:
         raise HTTPException(status_code=500, detail="DAYTONA_API_KEY not configured")
     if not GOOGLE_API_KEY:
         raise HTTPException(status_code=500, detail="GOOGLE_API_KEY not configured")
 
-    job_id = str(uuid.uuid4())
-    queue: asyncio.Queue = asyncio.Queue()
-    jobs[job_id] = queue
-
-    loop = asyncio.get_event_loop()
-
-    # Run the synchronous agent in a thread so it doesn't block the event loop
-    asyncio.get_event_loop().run_in_executor(
-        None,
-        run_review_sync,
-        req.repo_url,
-        queue,
-        loop,
-    )
+    # The synchronous agent runs on the job manager's own thread pool once admitted
+    try:
+        job = manager.submit(run_review_sync, req.repo_url, req.mode)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
 
     return ReviewResponse(
-        job_id=job_id,
-        stream_url=f"/review/{job_id}",
+        job_id=job.id,
+        stream_url=f"/review/{job.id}",
     )
 
 
 @app.get("/review/{job_id}")
-async def stream_review(job_id: str):
-    """SSE stream — yields live events until the review is complete."""
-    if job_id not in jobs:
+async def stream_review(job_id: str, request: Request, last_event_id: int = 0):
+    """SSE stream — yields live events until the review is complete. Replays from Last-Event-ID."""
+    job = manager.get(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    queue = jobs[job_id]
+    header = request.headers.get("last-event-id", "")
+    if header.isdigit():
+        last_event_id = int(header)
 
     async def event_generator() -> AsyncIterator[dict]:
         try:
-            while True:
-                event = await asyncio.wait_for(queue.get(), timeout=300)
-                if event is None:          # sentinel — agent finished
-                    yield {"event": "done", "data": json.dumps({"type": "done"})}
-                    break
-                yield {"event": event["type"], "data": json.dumps(event)}
-        except asyncio.TimeoutError:
+            async for seq, event in manager.stream(job, last_event_id):
+                yield {"event": event["type"], "id": str(seq), "data": json.dumps(event)}
+            # job finished — all buffered events delivered
+            yield {"event": "done", "data": json.dumps({"type": "done"})}
+        except TimeoutError:
             yield {"event": "error", "data": json.dumps({"type": "error", "message": "Timed out"})}
-        finally:
-            jobs.pop(job_id, None)
 
     return EventSourceResponse(event_generator())
 
 
+@app.get("/jobs/stats")
+async def job_stats():
+    """Running / queued job counts and admission totals."""
+    return manager.stats()
+
+
+@app.get("/sandbox/pool")
+async def pool_stats():
+    """Warm / leased sandbox counts and lease hit rates."""
+    return pool.stats()
+
+
 @app.get("/health")
 async def health():
     return {"status": "ok"}
\ No newline at end of file
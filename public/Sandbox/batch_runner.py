@@ -0,0 +1,160 @@
+"""
+Batch Runner — execute + lint every source file in one sandbox round trip
+-------------------------------------------------------------------------
+Instead of one `process.exec` per file for execution and another for linting,
+a single runner script is uploaded into the sandbox. It discovers the source
+files, executes and lints them in parallel, and writes one JSON document that
+is downloaded in a single call.
+
+Linters are installed at most once per sandbox lifetime (a marker file in the
+sandbox user's home records it), so they survive pool resets. A failed install
+is recorded the same way and only retried after LINTER_RETRY_MINUTES; until
+then the python linters report "Linters unavailable" instead of running.
+
+Usage:
+    lint_error = ensure_linters(sandbox)
+    result = run_batch(sandbox, "repo", SUPPORTED_EXTENSIONS, SKIP_DIRS, lint_error=lint_error)
+"""
+
+import os
+import json
+from typing import Optional
+
+# ─────────────────────────────────────────────────────────────────
+# Config
+# ─────────────────────────────────────────────────────────────────
+BATCH_WORKERS      = int(os.getenv("BATCH_WORKERS", "8"))
+BATCH_EXEC_TIMEOUT = int(os.getenv("BATCH_EXEC_TIMEOUT", "30"))
+BATCH_LINT_TIMEOUT = int(os.getenv("BATCH_LINT_TIMEOUT", "60"))
+BATCH_TIMEOUT      = int(os.getenv("BATCH_TIMEOUT", "900"))   # whole batch
+BATCH_MAX_OUTPUT   = 4000   # chars kept per execution / linter output
+
+LINTER_RETRY_MINUTES = int(os.getenv("LINTER_RETRY_MINUTES", "30"))  # after a failed install
+
+WORK_DIR     = ".review"    # relative to the sandbox working dir; removed on pool reset
+LINTERS_UNAVAILABLE = "Linters unavailable"
+LINTER_CHECK = (
+    'test -f "$HOME/.review-linters-ready" && exit 0; '
+    'if test -n "$(find "$HOME/.review-linters-failed" -mmin -{retry} 2>/dev/null)"; then '
+    'cat "$HOME/.review-linters-failed"; exit 1; fi; '
+    'if python -c "import pylint, flake8" 2>/dev/null || '
+    'pip install -q pylint flake8 > "$HOME/.review-linters-failed" 2>&1; then '
+    'rm -f "$HOME/.review-linters-failed"; touch "$HOME/.review-linters-ready"; '
+    'else tail -n 5 "$HOME/.review-linters-failed"; exit 1; fi'
+).format(retry=LINTER_RETRY_MINUTES)
+
+# Runs inside the sandbox — standard library only
+RUNNER_SCRIPT = r'''
+import os, sys, json, time, subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+config  = json.load(open(sys.argv[1]))
+RUNNERS = {
+    "python":     ["python"],
+    "javascript": ["node"],
+    "typescript": ["npx", "ts-node"],
+    "bash":       ["bash"],
+    "ruby":       ["ruby"],
+    "go":         ["go", "run"],
+}
+LINTERS = {
+    "python":     [("pylint", ["pylint", "--score=yes"]), ("flake8", ["flake8"])],
+    "javascript": [("eslint", ["npx", "eslint"])],
+    "typescript": [("eslint", ["npx", "eslint"])],
+}
+
+def run(cmd, timeout):
+    started = time.time()
+    try:
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, timeout=timeout)
+        code, output = proc.returncode, proc.stdout
+    except subprocess.TimeoutExpired:
+        code, output = -1, f"Timed out after {timeout}s"
+    except FileNotFoundError as e:
+        code, output = 127, str(e)
+    return {"exit_code": code, "output": output.strip()[-config["max_output"]:],
+            "duration": round(time.time() - started, 3)}
+
+def check(entry):
+    path, language = entry["path"], entry["language"]
+    result = {"path": path, "language": language, "execution": None, "lint": {}}
+    if language in RUNNERS:
+        execution = run(RUNNERS[language] + [path], config["exec_timeout"])
+        execution["status"] = "SUCCESS" if execution["exit_code"] == 0 else f"FAILED (exit_code={execution['exit_code']})"
+        result["execution"] = execution
+    for name, cmd in LINTERS.get(language, []):
+        if language in config["unavailable"]:
+            result["lint"][name] = {"exit_code": None, "output": config["unavailable"][language], "duration": 0}
+            continue
+        result["lint"][name] = run(cmd + [path], config["lint_timeout"])
+    return result
+
+started = time.time()
+files = []
+for root, dirs, filenames in os.walk(config["directory"]):
+    dirs[:] = [d for d in dirs if d not in config["skip_dirs"] and not d.startswith(".")]
+    for fn in sorted(filenames):
+        ext = os.path.splitext(fn)[1]
+        if ext in config["extensions"]:
+            files.append({"path": os.path.join(root, fn), "language": config["extensions"][ext]})
+
+with ThreadPoolExecutor(max_workers=config["workers"]) as pool:
+    results = list(pool.map(check, files))
+
+with open(config["output"], "w") as f:
+    json.dump({"files": results, "duration": round(time.time() - started, 3)}, f)
+'''
+
+
+# ─────────────────────────────────────────────────────────────────
+# Helpers
+# ─────────────────────────────────────────────────────────────────
+def ensure_linters(sandbox) -> Optional[str]:
+    """
+    Installs pylint + flake8 unless this sandbox already has them. One exec round trip.
+    Returns None when they are available, otherwise a "Linters unavailable: ..." message.
+    A failed install is remembered in the sandbox, so it is not retried on every call.
+    """
+    proc = sandbox.process.exec(LINTER_CHECK, timeout=180)
+    if proc.exit_code == 0:
+        return None
+    reason = proc.result.strip()[-500:] or f"install exited with {proc.exit_code}"
+    return f"{LINTERS_UNAVAILABLE}: {reason}"
+
+
+def run_batch(sandbox, directory: str, extensions: dict, skip_dirs: set,
+              workers: int = BATCH_WORKERS, lint_error: Optional[str] = None) -> dict:
+    """
+    Uploads the runner, executes + lints every source file under `directory`
+    in parallel inside the sandbox, and returns the parsed JSON result:
+        {"files": [{path, language, execution, lint: {linter: {...}}}], "duration": s}
+    `lint_error` is what ensure_linters returned; when set, the python linters are
+    skipped and report it as their output.
+    """
+    config = {
+        "directory":    directory,
+        "extensions":   extensions,
+        "skip_dirs":    sorted(skip_dirs),
+        "workers":      workers,
+        "exec_timeout": BATCH_EXEC_TIMEOUT,
+        "lint_timeout": BATCH_LINT_TIMEOUT,
+        "max_output":   BATCH_MAX_OUTPUT,
+        "output":       f"{WORK_DIR}/batch_result.json",
+        "unavailable":  {"python": lint_error} if lint_error else {},
+    }
+    sandbox.fs.upload_file(RUNNER_SCRIPT.encode(), f"{WORK_DIR}/batch_runner.py")
+    sandbox.fs.upload_file(json.dumps(config).encode(), f"{WORK_DIR}/batch_config.json")
+
+    proc = sandbox.process.exec(
+        f"python {WORK_DIR}/batch_runner.py {WORK_DIR}/batch_config.json 2>&1", timeout=BATCH_TIMEOUT
+    )
+    if proc.exit_code != 0:
+        raise RuntimeError(f"Batch runner failed (exit {proc.exit_code}):\n{proc.result.strip()[-2000:]}")
+    return json.loads(sandbox.fs.download_file(config["output"]).decode("utf-8"))
+
+
+def format_lint(lint: dict) -> str:
+    """Linter outputs of one file in the same shape the per-file run_linter tool returns."""
+    if not lint:
+        return "No linter configured."
+    return "\n\n".join(f"=== {name} ===\n{out['output'] or 'No issues found.'}" for name, out in lint.items())
@@ -0,0 +1,202 @@
+"""
+Job Manager — bounded review jobs for the Code Review Agent API
+---------------------------------------------------------------
+  • Concurrency   — at most MAX_CONCURRENT_JOBS reviews run at once, on a
+                    dedicated thread pool (not the event loop's default one)
+  • Admission     — further jobs wait in a FIFO queue of at most MAX_QUEUED_JOBS;
+                    queued jobs get {"type": "queue", "position": n} events
+  • Event buffers — each job keeps its last JOB_EVENT_BUFFER events with a
+                    sequence id, so clients can reconnect and replay from
+                    Last-Event-ID; producers never block on slow consumers
+  • TTL cleanup   — finished jobs are dropped JOB_TTL seconds after they end,
+                    queued jobs nobody streams within JOB_TTL are cancelled
+
+Usage:
+    manager = JobManager()
+    job = manager.submit(run_review_sync, repo_url, mode)   # runner(publish, *args)
+    async for seq, event in manager.stream(job, last_event_id): ...
+"""
+
+import os
+import time
+import uuid
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# ─────────────────────────────────────────────────────────────────
+# Config
+# ─────────────────────────────────────────────────────────────────
+MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", "4"))
+MAX_QUEUED_JOBS     = int(os.getenv("MAX_QUEUED_JOBS", "32"))
+JOB_EVENT_BUFFER    = int(os.getenv("JOB_EVENT_BUFFER", "500"))
+JOB_TTL             = float(os.getenv("JOB_TTL", "900"))
+JOB_EVENT_TIMEOUT   = float(os.getenv("JOB_EVENT_TIMEOUT", "300"))   # max silence while running
+CLEANUP_INTERVAL    = 60
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, runner: Callable, args: tuple, buffer_size: int):
+        self.id          = str(uuid.uuid4())
+        self.runner      = runner
+        self.args        = args
+        self.state       = "queued"     # queued → running → finished | cancelled
+        self.created_at  = time.time()
+        self.finished_at: Optional[float] = None
+        self.last_seen   = self.created_at
+        self.events: deque = deque(maxlen=buffer_size)   # (seq, event)
+        self.seq         = 0
+        self.dropped     = 0
+        self.consumers   = 0
+        self.position    = 0            # place in the admission queue, 0 once admitted
+        self._changed    = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.state in ("finished", "cancelled")
+
+    def append(self, event: dict):
+        """Event-loop thread only."""
+        if len(self.events) == self.events.maxlen:
+            self.dropped += 1
+        self.seq += 1
+        self.events.append((self.seq, event))
+        self._notify()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+
+class JobManager:
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_JOBS, max_queued: int = MAX_QUEUED_JOBS,
+                 buffer_size: int = JOB_EVENT_BUFFER, ttl: float = JOB_TTL):
+        self.max_concurrent = max_concurrent
+        self.max_queued     = max_queued
+        self.buffer_size    = buffer_size
+        self.ttl            = ttl
+        self.jobs: dict[str, Job] = {}
+        self.queue: deque   = deque()
+        self.running        = 0
+        self.executor       = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="review-job")
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._cleanup_task: Optional[asyncio.Task] = None
+        self._stats         = {"submitted": 0, "rejected": 0, "finished": 0, "cancelled": 0, "expired": 0}
+
+    # ── lifecycle ─────────────────────────────────────────────────
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        self._cleanup_task = self.loop.create_task(self._cleanup())
+
+    def shutdown(self):
+        if self._cleanup_task:
+            self._cleanup_task.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    # ── jobs ──────────────────────────────────────────────────────
+    def submit(self, runner: Callable, *args) -> Job:
+        """Queues a job. `runner(publish, *args)` runs in the job executor; publish(event) is thread-safe."""
+        if len(self.queue) >= self.max_queued:
+            self._stats["rejected"] += 1
+            raise QueueFullError(f"Review queue is full ({self.max_queued} waiting)")
+        job = Job(runner, args, self.buffer_size)
+        self.jobs[job.id] = job
+        self.queue.append(job)
+        self._stats["submitted"] += 1
+        self._admit()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def _admit(self):
+        while self.running < self.max_concurrent and self.queue:
+            job = self.queue.popleft()
+            job.state = "running"
+            job.position = 0
+            self.running += 1
+            future = self.loop.run_in_executor(self.executor, self._run, job)
+            future.add_done_callback(lambda _, job=job: self._finish(job))
+        for position, job in enumerate(self.queue, 1):
+            if job.position == position:
+                continue
+            job.position = position
+            job.append({"type": "queue", "message": f"⏳ Waiting in queue (position {position})",
+                        "position": position})
+
+    def _run(self, job: Job):
+        def publish(event: dict):
+            self.loop.call_soon_threadsafe(job.append, event)
+        try:
+            job.runner(publish, *job.args)
+        except Exception as e:
+            logger.exception(f"Job {job.id} crashed")
+            publish({"type": "error", "message": f"Job error: {e}"})
+
+    def _finish(self, job: Job):
+        self.running -= 1
+        job.state = "finished"
+        job.finished_at = time.time()
+        job._notify()
+        self._stats["finished"] += 1
+        self._admit()
+
+    def _cancel(self, job: Job, reason: str):
+        self.queue.remove(job)
+        job.append({"type": "error", "message": reason})
+        job.state = "cancelled"
+        job.finished_at = time.time()
+        job._notify()
+        self._stats["cancelled"] += 1
+        self._admit()
+
+    # ── streaming ─────────────────────────────────────────────────
+    async def stream(self, job: Job, last_event_id: int = 0) -> AsyncIterator[tuple]:
+        """Yields (seq, event) after `last_event_id` — replaying what is still buffered — until the job ends."""
+        cursor = last_event_id
+        job.consumers += 1
+        try:
+            while True:
+                job.last_seen = time.time()
+                pending = [(seq, event) for seq, event in job.events if seq > cursor]
+                for seq, event in pending:
+                    cursor = seq
+                    yield seq, event
+                if pending:
+                    continue
+                if job.done:
+                    return
+                changed = job._changed
+                try:
+                    timeout = JOB_EVENT_TIMEOUT if job.state == "running" else None
+                    await asyncio.wait_for(changed.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"No events from job {job.id} for {JOB_EVENT_TIMEOUT:.0f}s")
+        finally:
+            job.consumers -= 1
+            job.last_seen = time.time()
+
+    def stats(self) -> dict:
+        return {"running": self.running, "queued": len(self.queue), "jobs": len(self.jobs),
+                "max_concurrent": self.max_concurrent, "max_queued": self.max_queued, **self._stats}
+
+    # ── internals ─────────────────────────────────────────────────
+    async def _cleanup(self):
+        while True:
+            await asyncio.sleep(CLEANUP_INTERVAL)
+            now = time.time()
+            for job in list(self.queue):
+                if not job.consumers and now - job.last_seen > self.ttl:
+                    self._cancel(job, "Job expired: nobody streamed it while it was queued")
+            for job_id, job in list(self.jobs.items()):
+                if job.done and not job.consumers and now - max(job.finished_at, job.last_seen) > self.ttl:
+                    del self.jobs[job_id]
+                    self._stats["expired"] += 1
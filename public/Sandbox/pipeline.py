@@ -0,0 +1,195 @@
+"""
+Review Pipeline — deterministic alternative to the LangChain agent loop
+-----------------------------------------------------------------------
+The agent spends one LLM round trip per tool call just to decide what to do
+next. The pipeline runs the same tools in a fixed order and only calls the
+model where judgement is needed:
+
+  1. clone_repo                          (tool)
+  2. execute_and_lint_all                (tool, one batch call)
+  3. read_file_code + per-file review    (tool + LLM, parallel across files)
+  4. summary + recommendations           (LLM, one call)
+  5. write_report                        (tool)
+
+Usage:
+    report = run_pipeline({t.name: t for t in tools}, llm, repo_url, "repo", log=print)
+"""
+
+import os
+import json
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+# ─────────────────────────────────────────────────────────────────
+# Config
+# ─────────────────────────────────────────────────────────────────
+REVIEW_MODE        = os.getenv("REVIEW_MODE", "agent")   # "agent" or "pipeline"
+REVIEW_MODES       = ("agent", "pipeline")
+PIPELINE_WORKERS   = int(os.getenv("PIPELINE_WORKERS", "4"))
+PIPELINE_MAX_FILES = int(os.getenv("PIPELINE_MAX_FILES", "40"))   # files sent to the model per review
+MAX_CODE_CHARS     = 12000   # per file sent to the model
+
+FILE_REVIEW_PROMPT = """You are an expert code reviewer. Review ONE file.
+Analyse it for bugs, security issues, missing error handling, code quality
+(naming/structure/complexity) and best-practice violations, using the execution
+and linter results below.
+
+Reply with ONLY this Markdown section, nothing before or after:
+
+### `{path}`  [PASS / WARN / FAIL]
+**Language:** {language}
+**Execution:** <SUCCESS or FAILED + error>
+**Linter:** <key findings or "Clean">
+**Issues:**
+- <issue 1>
+- <issue 2>
+**Verdict:** <one-sentence verdict>
+
+If the file is clean, say so. If it has critical bugs, flag it FAIL.
+
+--- EXECUTION ---
+{execution}
+
+--- LINTER ---
+{lint}
+
+--- CODE ({path}) ---
+{code}
+"""
+
+SYNTHESIS_PROMPT = """You are an expert code reviewer. Below are the per-file reviews of {repo_url}.
+
+Reply with ONLY a JSON object:
+{{"health": "Clean" | "Needs Work" | "Critical Issues",
+  "summary": "<2-4 sentence overall assessment>",
+  "recommendations": ["<recommendation 1>", "<recommendation 2>", "<recommendation 3>"]}}
+
+--- FILE REVIEWS ---
+{reviews}
+"""
+
+
+# ─────────────────────────────────────────────────────────────────
+# Helpers
+# ─────────────────────────────────────────────────────────────────
+def _text(message) -> str:
+    """Plain text of a chat model response (content may be a list of parts)."""
+    content = message.content
+    if isinstance(content, list):
+        content = "".join(p.get("text", "") if isinstance(p, dict) else str(p) for p in content)
+    return content.strip()
+
+
+def _tokens(message) -> int:
+    usage = getattr(message, "usage_metadata", None) or {}
+    return usage.get("total_tokens", 0)
+
+
+def _parse_synthesis(text: str) -> dict:
+    start, end = text.find("{"), text.rfind("}")
+    try:
+        data = json.loads(text[start:end + 1])
+        return {
+            "health":          data.get("health", "Needs Work"),
+            "summary":         data.get("summary", ""),
+            "recommendations": list(data.get("recommendations") or []),
+        }
+    except (ValueError, AttributeError):
+        return {"health": "Needs Work", "summary": text, "recommendations": []}
+
+
+def _verdict_line(section: str) -> str:
+    return section.splitlines()[0] if section else ""
+
+
+# ─────────────────────────────────────────────────────────────────
+# Pipeline
+# ─────────────────────────────────────────────────────────────────
+def run_pipeline(tools: dict, llm, repo_url: str, directory: str,
+                 log: Callable[[str], None] = print, workers: int = PIPELINE_WORKERS,
+                 max_files: int = PIPELINE_MAX_FILES) -> str:
+    """
+    Runs the review with a fixed tool order. `tools` maps tool name → LangChain tool
+    (clone_repo, execute_and_lint_all, read_file_code, write_report). At most `max_files`
+    files are reviewed. Returns the report.
+    """
+    started = time.time()
+    tokens  = 0
+
+    # 1. Clone
+    cloned = tools["clone_repo"].invoke({"github_url": repo_url})
+    if cloned.startswith("CLONE FAILED"):
+        raise RuntimeError(cloned)
+
+    # 2. Execute + lint everything in one sandbox call
+    batch = tools["execute_and_lint_all"].invoke({"directory": directory})
+    if batch.startswith("BATCH FAILED"):
+        raise RuntimeError(batch)
+    files = json.loads(batch)
+    skipped = files[max_files:]
+    files = files[:max_files]
+    log(f"🧠 Reviewing {len(files)} file(s) with up to {workers} in parallel..."
+        + (f" ({len(skipped)} more skipped, limit {max_files})" if skipped else ""))
+
+    # 3. Read + review each file in parallel; a failed file gets an error entry, not a failed job
+    def review(entry: dict):
+        try:
+            code = tools["read_file_code"].invoke({"file_path": entry["path"]})
+            prompt = FILE_REVIEW_PROMPT.format(
+                path=entry["path"],
+                language=entry["language"],
+                execution=entry["execution"],
+                lint=entry["lint"],
+                code=code[:MAX_CODE_CHARS],
+            )
+            response = llm.invoke(prompt)
+        except Exception as e:
+            log(f"  ✗ {entry['path']}: review failed ({str(e)[:200]})")
+            return f"### `{entry['path']}`  [ERROR]\n**Review failed:** {str(e)[:500]}", 0, False
+        section = _text(response)
+        log(f"  ✓ {_verdict_line(section) or entry['path']}")
+        return section, _tokens(response), True
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        reviewed = list(pool.map(review, files))
+    sections = [section for section, _, _ in reviewed]
+    tokens += sum(t for _, t, _ in reviewed)
+    failed = sum(1 for _, _, ok in reviewed if not ok)
+
+    # 4. One synthesis call over the finished reviews
+    log("🧠 Writing summary and recommendations...")
+    response = llm.invoke(SYNTHESIS_PROMPT.format(repo_url=repo_url, reviews="\n\n".join(sections)))
+    tokens += _tokens(response)
+    synthesis = _parse_synthesis(_text(response))
+
+    recommendations = "\n".join(f"{i}. {r}" for i, r in enumerate(synthesis["recommendations"], 1))
+    file_reviews = "\n\n---\n\n".join(sections)
+    report = f"""# Code Review Report
+**Repo:** {repo_url}
+**Date:** {datetime.now().strftime('%Y-%m-%d')}
+**Files reviewed:** {len(files) - failed}{f" ({failed} failed)" if failed else ""}{f" — {len(skipped)} not reviewed (limit {max_files})" if skipped else ""}
+
+---
+
+## Summary
+**{synthesis["health"]}** — {synthesis["summary"]}
+
+---
+
+## File Reviews
+
+{file_reviews}
+
+---
+
+## Overall Recommendations
+{recommendations or "No further recommendations."}
+"""
+
+    # 5. Write
+    tools["write_report"].invoke({"content": report})
+    log(f"⏱  Pipeline finished in {time.time() - started:.1f}s using {tokens:,} LLM tokens "
+        f"({len(files) + 1} model call(s), {failed} failed)")
+    return report
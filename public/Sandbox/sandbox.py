@@ -2,7 +2,7 @@
 Code Review Agent — LangChain v1 + Daytona + Claude
 -----------------------------------------------------
 Given a GitHub repo URL the agent will:
-  1. Clone the repo into a Daytona sandbox
+  1. Clone the repo into a sandbox (Daytona, or local with SANDBOX_BACKEND=local)
   2. Walk every source file and read its code
   3. Execute each file and capture output / errors
   4. Run linters (pylint + flake8 for Python, eslint for JS/TS)
@@ -10,7 +10,8 @@ Given a GitHub repo URL the agent will:
   6. Write a full Markdown report to ./code_review_report.md
 
 Usage:
-    python agent.py
+    python agent.py               # agent mode (REVIEW_MODE, default "agent")
+    python agent.py --pipeline    # run the tools in a fixed order (see pipeline.py)
 
 Requirements:
     pip install daytona langchain langchain-anthropic python-dotenv
@@ -23,11 +24,14 @@ import re
 from datetime import datetime
 from dotenv import load_dotenv
 
-from daytona import Daytona, DaytonaConfig, CreateSandboxBaseParams
 from langchain.tools import tool
 from langchain.agents import create_agent
 from langchain_google_genai import ChatGoogleGenerativeAI
 
+from batch_runner import ensure_linters, run_batch, format_lint
+from pipeline import REVIEW_MODE, run_pipeline
+from sandbox_backend import SANDBOX_BACKEND, create_backend
+
 load_dotenv()
 
 # ─────────────────────────────────────────────────────────────────
@@ -58,25 +62,25 @@ SKIP_DIRS = {
 # ─────────────────────────────────────────────────────────────────
 # Sandbox singleton
 # ─────────────────────────────────────────────────────────────────
-_daytona: Daytona | None = None
+_backend = None
 _sandbox = None
 
 
 def get_sandbox():
-    global _daytona, _sandbox
+    global _backend, _sandbox
     if _sandbox is None:
-        print("🏗  Creating Daytona sandbox ...")
-        _daytona = Daytona(DaytonaConfig(api_key=DAYTONA_API_KEY))
-        _sandbox = _daytona.create(CreateSandboxBaseParams(language="python"))
+        print(f"🏗  Creating {SANDBOX_BACKEND} sandbox ...")
+        _backend = create_backend(SANDBOX_BACKEND)
+        _sandbox = _backend.create()
         print(f"✅ Sandbox ready  (id={_sandbox.id})\n")
     return _sandbox
 
 
 def delete_sandbox():
-    global _daytona, _sandbox
-    if _sandbox and _daytona:
+    global _sandbox
+    if _sandbox and _backend:
         print("\n🧹 Deleting sandbox ...")
-        _daytona.delete(_sandbox)
+        _backend.destroy(_sandbox)
         _sandbox = None
         print("✅ Done.")
 
@@ -88,25 +92,23 @@ def delete_sandbox():
 @tool
 def clone_repo(github_url: str) -> str:
     """
-    Clone a GitHub repository into the Daytona sandbox at /repo.
+    Clone a GitHub repository into the sandbox at repo/.
     Returns the list of top-level files/folders cloned.
     Input: the full GitHub URL, e.g. https://github.com/owner/repo
     """
     sandbox = get_sandbox()
     print(f"  📥 Cloning {github_url} ...")
-    result = sandbox.process.exec(
-        f"git clone --depth 1 {github_url} /repo 2>&1",
-        timeout=120,
-    )
-    if result.exit_code != 0:
-        return f"CLONE FAILED:\n{result.result}"
-    ls = sandbox.process.exec("ls /repo")
+    try:
+        sandbox.git.clone(github_url, "repo")
+    except Exception as e:
+        return f"CLONE FAILED:\n{e}"
+    ls = sandbox.process.exec("ls repo")
     print(f"  ✅ Clone successful")
     return f"Cloned successfully. Top-level contents:\n{ls.result}"
 
 
 @tool
-def list_source_files(directory: str = "/repo") -> str:
+def list_source_files(directory: str = "repo") -> str:
     """
     Recursively list all source code files inside the sandbox directory.
     Returns a JSON array of objects: [{path, language}].
@@ -142,7 +144,7 @@ print(json.dumps(files))
 def read_file_code(file_path: str) -> str:
     """
     Read and return the source code of a single file from the sandbox.
-    Input: absolute path inside the sandbox, e.g. /repo/src/main.py
+    Input: path inside the sandbox, e.g. repo/src/main.py
     Returns the file content as a string.
     """
     sandbox = get_sandbox()
@@ -159,7 +161,7 @@ def execute_file(file_path: str, language: str) -> str:
     """
     Execute a single source file inside the sandbox and return its output.
     Supports: python, javascript (node), typescript (ts-node), bash, ruby, go.
-    Input: absolute file path and language string.
+    Input: file path and language string.
     Returns stdout + stderr and the exit code.
     """
     sandbox = get_sandbox()
@@ -193,7 +195,9 @@ def run_linter(file_path: str, language: str) -> str:
     sandbox = get_sandbox()
     print(f"  🔍 Linting   {file_path}")
     if language == "python":
-        sandbox.process.exec("pip install -q pylint flake8", timeout=60)
+        lint_error = ensure_linters(sandbox)
+        if lint_error:
+            return lint_error
         pylint = sandbox.process.exec(f"pylint --score=yes {file_path} 2>&1", timeout=30)
         flake8 = sandbox.process.exec(f"flake8 {file_path} 2>&1", timeout=30)
         return (
@@ -207,6 +211,39 @@ def run_linter(file_path: str, language: str) -> str:
         return f"No linter configured for: {language}"
 
 
+@tool
+def execute_and_lint_all(directory: str = "repo") -> str:
+    """
+    Execute AND lint every source file under the directory in a single sandbox call.
+    Files run in parallel inside the sandbox; linters are installed once per sandbox.
+    Returns a JSON array of objects: [{path, language, execution, lint}].
+    Prefer this over calling execute_file / run_linter per file.
+    """
+    sandbox = get_sandbox()
+    print(f"  ⚙️  Executing + linting all files in {directory} ...")
+    lint_error = ensure_linters(sandbox)
+    if lint_error:
+        print(f"  ⚠️  {lint_error.splitlines()[0]}")
+    try:
+        batch = run_batch(sandbox, directory, SUPPORTED_EXTENSIONS, SKIP_DIRS, lint_error=lint_error)
+    except Exception as e:
+        return f"BATCH FAILED:\n{e}"
+
+    files = []
+    for f in batch["files"]:
+        execution = f["execution"]
+        status = execution["status"] if execution else "NOT EXECUTED"
+        print(f"     → {f['path']}  [{status}]")
+        files.append({
+            "path":      f["path"],
+            "language":  f["language"],
+            "execution": f"[{status}]\n{execution['output'] or '(no output)'}" if execution else "Execution not supported",
+            "lint":      format_lint(f["lint"]),
+        })
+    print(f"  ✅ Batch finished in {batch['duration']:.1f}s\n")
+    return json.dumps(files)
+
+
 @tool
 def write_report(content: str, output_path: str = "/tmp/code_review_report.md") -> str:
     """
@@ -296,7 +333,7 @@ def print_report(path: str = "code_review_report.md") -> None:
 # ─────────────────────────────────────────────────────────────────
 # Agent
 # ─────────────────────────────────────────────────────────────────
-TOOLS = [clone_repo, list_source_files, read_file_code, execute_file, run_linter, write_report]
+TOOLS = [clone_repo, list_source_files, execute_and_lint_all, read_file_code, execute_file, run_linter, write_report]
 
 SYSTEM_PROMPT = """You are an expert code review agent with access to an isolated Daytona sandbox.
 
@@ -304,13 +341,14 @@ Given a GitHub repository URL, your job is to:
 
 1. Clone the repo with clone_repo.
 2. Discover all source files with list_source_files (returns a JSON array).
-3. For EACH file:
+3. Execute and lint ALL files in one call with execute_and_lint_all — note which files
+   crash and collect linter warnings and errors. Only use execute_file / run_linter
+   to re-check an individual file.
+4. For EACH file:
    a. Read the code with read_file_code.
-   b. Execute it with execute_file — note if it runs successfully or crashes.
-   c. Lint it with run_linter — collect warnings and errors.
-   d. Analyse the code for: bugs, security issues, missing error handling,
+   b. Analyse the code for: bugs, security issues, missing error handling,
       code quality (naming/structure/complexity), and best-practice violations.
-4. Write a Markdown report with write_report using this exact structure:
+5. Write a Markdown report with write_report using this exact structure:
 
 # Code Review Report
 **Repo:** <url>
@@ -346,15 +384,18 @@ Be thorough but concise. If a file is clean, say so. If it has critical bugs, fl
 """
 
 
-def build_agent():
-    llm = ChatGoogleGenerativeAI(
+def build_llm():
+    return ChatGoogleGenerativeAI(
         model=MODEL,
         anthropic_api_key=ANTHROPIC_API_KEY,
         temperature=0,
         max_tokens=8192,
     )
+
+
+def build_agent():
     return create_agent(
-        model=llm,
+        model=build_llm(),
         tools=TOOLS,
         system_prompt=SYSTEM_PROMPT,
     )
@@ -369,6 +410,7 @@ STEP_LABELS = {
     "read_file_code":     "📖 Reading file",
     "execute_file":       "⚙️  Executing file",
     "run_linter":         "🔍 Running linter",
+    "execute_and_lint_all": "⚙️  Executing + linting all files",
     "write_report":       "📝 Writing report",
 }
 
@@ -382,8 +424,8 @@ def on_tool_start(tool_name: str, tool_input: dict) -> None:
 # ─────────────────────────────────────────────────────────────────
 # Entry point
 # ─────────────────────────────────────────────────────────────────
-def run_agent(repo_url: str) -> None:
-    if not DAYTONA_API_KEY:
+def run_agent(repo_url: str, mode: str = REVIEW_MODE) -> None:
+    if SANDBOX_BACKEND == "daytona" and not DAYTONA_API_KEY:
         sys.exit("❌  DAYTONA_API_KEY not set. Add it to your .env file.")
     if not ANTHROPIC_API_KEY:
         sys.exit("❌  GOOGLE_API_KEY not set. Add it to your .env file.")
@@ -392,21 +434,25 @@ def run_agent(repo_url: str) -> None:
     print(f"  🔍 Code Review Agent")
     print(f"  Repo  : {repo_url}")
     print(f"  Model : {MODEL}")
+    print(f"  Mode  : {mode}")
     print(f"{'═' * 48}\n")
 
-    agent = build_agent()
+    try:
+        if mode == "pipeline":
+            run_pipeline({t.name: t for t in TOOLS}, build_llm(), repo_url, "repo")
+        else:
+            agent = build_agent()
 
-    task = (
-        f"Review the code in this GitHub repository: {repo_url}\n"
-        f"Today's date: {datetime.now().strftime('%Y-%m-%d')}\n"
-        "Follow the full review process: clone → list files → "
-        "read + execute + lint each file → write the Markdown report."
-    )
+            task = (
+                f"Review the code in this GitHub repository: {repo_url}\n"
+                f"Today's date: {datetime.now().strftime('%Y-%m-%d')}\n"
+                "Follow the full review process: clone → list files → "
+                "execute + lint all files in one batch → read each file → write the Markdown report."
+            )
 
-    try:
-        result = agent.invoke({
-            "messages": [{"role": "user", "content": task}]
-        })
+            agent.invoke({
+                "messages": [{"role": "user", "content": task}]
+            })
 
         # ── Print the clean report ────────────────────────────────
         print_report("code_review_report.md")
@@ -431,4 +477,5 @@ if __name__ == "__main__":
         print("❌  URL must start with https://  Exiting.")
         sys.exit(1)
 
-    run_agent(repo_url)
\ No newline at end of file
+    mode = "pipeline" if "--pipeline" in sys.argv else "agent" if "--agent" in sys.argv else REVIEW_MODE
+    run_agent(repo_url, mode=mode)
\ No newline at end of file
@@ -0,0 +1,208 @@
+"""
+Sandbox Backends — pluggable sandboxes behind the Daytona tool interface
+------------------------------------------------------------------------
+Every backend hands out sandbox objects shaped like a Daytona sandbox, so the
+agent tools work unchanged on any of them:
+
+    sandbox.id
+    sandbox.git.clone(url, path)
+    sandbox.process.exec(command, timeout)   → .exit_code, .result
+    sandbox.process.code_run(code, timeout)  → .exit_code, .result
+    sandbox.fs.download_file(path)           → bytes
+    sandbox.fs.upload_file(content, path)
+
+Backends (SANDBOX_BACKEND):
+  • daytona — remote Daytona sandboxes (needs DAYTONA_API_KEY)
+  • local   — per-sandbox scratch dir on this host; commands run in their own
+              session under rlimits (CPU, memory, file size, open files) set with prlimit
+              and, where `unshare` works, in fresh user/PID/network namespaces.
+              Starts in milliseconds and needs no network service. There is no
+              filesystem isolation, so it is for trusted code only. The sandbox
+              itself is the main backend's (backend/infrastructure/sandbox_backends.py).
+
+Sandbox paths are relative to the sandbox working dir; absolute paths given to
+the fs API are mapped under the local scratch dir as well.
+
+Pooled sandboxes are reused, so snapshot() records the provisioned state once
+the linters are installed and reset() brings a returned sandbox back to it:
+processes the job left running are killed and its files removed. Daytona
+checks that the toolchain and shell/pip config still match the snapshot; the
+local backend restores $HOME from a copy. reset() returns False when that
+fails, and the pool then discards the sandbox and creates a new one.
+"""
+
+import os
+import sys
+import shutil
+import signal
+import logging
+
+# One local sandbox implementation for both apps: import it from the main backend
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "backend"))
+from infrastructure.sandbox_backends import LocalBackend as _SharedLocalBackend  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+# ─────────────────────────────────────────────────────────────────
+# Config
+# ─────────────────────────────────────────────────────────────────
+SANDBOX_BACKEND       = os.getenv("SANDBOX_BACKEND", "daytona")
+# LOCAL_SANDBOX_* limits are read by the shared local sandbox; its $HOME (HOME_DIR) is restored
+# from the provisioning snapshot on reset and holds the linter marker
+RESET_TIMEOUT         = 60
+
+# Daytona: pids running at provisioning time and a fingerprint of what later jobs rely on
+# (installed packages, tool binaries, shell and package-manager config)
+BASELINE_PIDS = "$HOME/.review-baseline-pids"
+FINGERPRINT   = "$HOME/.review-fingerprint"
+FINGERPRINT_COMMAND = (
+    '{ pip freeze 2>/dev/null; '
+    'for tool in python pip pylint flake8 node npm npx; do '
+    'path=$(command -v "$tool") && sha256sum "$(readlink -f "$path")"; done; '
+    'cd "$HOME" && sha256sum .bashrc .profile .bash_profile .npmrc .pydistutils.cfg '
+    '.config/pip/pip.conf .pip/pip.conf 2>/dev/null; '
+    'ls -A .local/bin 2>/dev/null; crontab -l 2>/dev/null; } | sha256sum'
+)
+SNAPSHOT_SCRIPT = (
+    f'ls /proc | grep -E "^[0-9]+$" > "{BASELINE_PIDS}" && '
+    f'({FINGERPRINT_COMMAND}) > "{FINGERPRINT}"'
+)
+# Kills every process started after provisioning except this shell and its ancestors,
+# removes the job's files and fails if the fingerprint changed
+RESET_SCRIPT = (
+    f'test -f "{BASELINE_PIDS}" || exit 1; '
+    f'keep=" $(tr "\\n" " " < "{BASELINE_PIDS}") "; '
+    'pid=$$; while [ "$pid" -gt 1 ] 2>/dev/null; do keep="$keep$pid "; '
+    'pid=$(cut -d" " -f4 /proc/$pid/stat 2>/dev/null || echo 0); done; '
+    'for dir in /proc/[0-9]*; do pid=${dir#/proc/}; case "$keep" in *" $pid "*) ;; '
+    '*) kill -9 "$pid" 2>/dev/null;; esac; done; '
+    'rm -rf repo {work_dir} /tmp/code_review_report.md; '
+    f'test "$({FINGERPRINT_COMMAND})" = "$(cat "{FINGERPRINT}")"'
+)
+
+
+class SandboxBackend:
+    """Creates, resets, health-checks and destroys sandboxes for one provider."""
+
+    name = "base"
+
+    def create(self):
+        raise NotImplementedError
+
+    def snapshot(self, sandbox):
+        """Records the provisioned state that reset() restores. Called once linters are installed."""
+        raise NotImplementedError
+
+    def reset(self, sandbox) -> bool:
+        """Brings a returned sandbox back to its snapshot; False means it must be discarded."""
+        raise NotImplementedError
+
+    def healthy(self, sandbox) -> bool:
+        raise NotImplementedError
+
+    def destroy(self, sandbox):
+        raise NotImplementedError
+
+
+# ─────────────────────────────────────────────────────────────────
+# Daytona
+# ─────────────────────────────────────────────────────────────────
+class DaytonaBackend(SandboxBackend):
+    """Remote Daytona sandboxes."""
+
+    name = "daytona"
+
+    def __init__(self, api_key: str = ""):
+        from daytona import Daytona, DaytonaConfig
+        self.client = Daytona(DaytonaConfig(api_key=api_key or os.getenv("DAYTONA_API_KEY", "")))
+
+    def create(self):
+        from daytona import CreateSandboxBaseParams
+        return self.client.create(CreateSandboxBaseParams(language="python"))
+
+    def snapshot(self, sandbox):
+        result = sandbox.process.exec(SNAPSHOT_SCRIPT, timeout=RESET_TIMEOUT)
+        if result.exit_code != 0:
+            raise RuntimeError(f"Sandbox snapshot failed: {result.result.strip()[-500:]}")
+
+    def reset(self, sandbox) -> bool:
+        from batch_runner import WORK_DIR
+        command = RESET_SCRIPT.replace("{work_dir}", WORK_DIR)
+        return sandbox.process.exec(command, timeout=RESET_TIMEOUT).exit_code == 0 and self.healthy(sandbox)
+
+    def healthy(self, sandbox) -> bool:
+        return sandbox.process.exec("echo ok", timeout=10).exit_code == 0
+
+    def destroy(self, sandbox):
+        self.client.delete(sandbox)
+
+
+# ─────────────────────────────────────────────────────────────────
+# Local (rlimits + namespaces + scratch dir)
+# ─────────────────────────────────────────────────────────────────
+class LocalBackend(_SharedLocalBackend):
+    """Local sandboxes — no Daytona service needed, testable offline. Trusted code only."""
+
+    scratch_prefix = "review-sandbox-"
+
+    @staticmethod
+    def _snapshot_path(sandbox) -> str:
+        return sandbox.root + ".provisioned"   # outside the scratch dir, so the fs API cannot reach it
+
+    def snapshot(self, sandbox):
+        shutil.copytree(sandbox.home, self._snapshot_path(sandbox), symlinks=True)
+
+    def _kill_processes(self, sandbox) -> bool:
+        """
+        Kills processes left by the sandbox's commands: anything still running with its $HOME or
+        inside its scratch dir. Returns False if one of them could not be killed.
+        """
+        home = f"HOME={sandbox.home}".encode()
+        killed = True
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit() or int(entry) == os.getpid():
+                continue
+            try:
+                cwd = os.readlink(f"/proc/{entry}/cwd")
+                with open(f"/proc/{entry}/environ", "rb") as f:
+                    environ = f.read().split(b"\0")
+            except OSError:
+                continue   # gone, or not ours
+            if home in environ or cwd == sandbox.root or cwd.startswith(sandbox.root + os.sep):
+                try:
+                    os.kill(int(entry), signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                except OSError:
+                    killed = False
+        return killed
+
+    def reset(self, sandbox) -> bool:
+        snapshot = self._snapshot_path(sandbox)
+        if not os.path.isdir(snapshot) or not self._kill_processes(sandbox):
+            return False
+        for entry in os.listdir(sandbox.root):
+            path = os.path.join(sandbox.root, entry)
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        shutil.copytree(snapshot, sandbox.home, symlinks=True)
+        return True
+
+    def healthy(self, sandbox) -> bool:
+        return os.path.isdir(sandbox.root)
+
+    def destroy(self, sandbox):
+        self._kill_processes(sandbox)
+        super().destroy(sandbox)
+        shutil.rmtree(self._snapshot_path(sandbox), ignore_errors=True)
+
+
+def create_backend(name: str = SANDBOX_BACKEND) -> SandboxBackend:
+    """Backend by name: "daytona" or "local"."""
+    if name == "local":
+        return LocalBackend()
+    if name == "daytona":
+        return DaytonaBackend()
+    raise ValueError(f"Unknown sandbox backend: {name}")
@@ -0,0 +1,228 @@
+"""
+Sandbox Pool — warm, pre-provisioned sandboxes for the Code Review Agent
+------------------------------------------------------------------------
+Creating a Daytona sandbox dominates time-to-first-result, so the pool keeps
+a configurable number of sandboxes warm (linters already installed). Jobs
+lease one, and it is reset and returned to the pool when the job ends.
+
+  • Idle TTL      — sandboxes idle longer than SANDBOX_IDLE_TTL are replaced
+                    (Daytona auto-stops idle sandboxes, so keep this below that)
+  • Health checks — idle sandboxes are probed every SANDBOX_HEALTH_INTERVAL;
+                    broken ones are destroyed and replaced
+  • Backends      — any SandboxBackend from sandbox_backend.py, picked by
+                    SANDBOX_BACKEND (daytona or local)
+
+Usage:
+    pool = create_pool()
+    pool.start()
+    with pool.lease() as sandbox:
+        sandbox.process.exec("ls")
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from batch_runner import ensure_linters
+from sandbox_backend import SANDBOX_BACKEND, create_backend
+
+logger = logging.getLogger(__name__)
+
+# ─────────────────────────────────────────────────────────────────
+# Config
+# ─────────────────────────────────────────────────────────────────
+SANDBOX_POOL_SIZE       = int(os.getenv("SANDBOX_POOL_SIZE", "2"))
+SANDBOX_POOL_MAX        = int(os.getenv("SANDBOX_POOL_MAX", str(SANDBOX_POOL_SIZE * 2)))
+SANDBOX_IDLE_TTL        = float(os.getenv("SANDBOX_IDLE_TTL", "600"))
+SANDBOX_HEALTH_INTERVAL = float(os.getenv("SANDBOX_HEALTH_INTERVAL", "60"))
+SANDBOX_LEASE_TIMEOUT   = float(os.getenv("SANDBOX_LEASE_TIMEOUT", "300"))
+
+
+# ─────────────────────────────────────────────────────────────────
+# Pool
+# ─────────────────────────────────────────────────────────────────
+class SandboxPool:
+    def __init__(self, backend, size: int = SANDBOX_POOL_SIZE, max_size: int = SANDBOX_POOL_MAX,
+                 idle_ttl: float = SANDBOX_IDLE_TTL, health_interval: float = SANDBOX_HEALTH_INTERVAL):
+        self.backend         = backend
+        self.size            = size
+        self.max_size        = max(size, max_size)
+        self.idle_ttl        = idle_ttl
+        self.health_interval = health_interval
+
+        self._idle: deque = deque()   # (sandbox, idle_since)
+        self._leased: set = set()
+        self._creating = 0
+        self._cond     = threading.Condition()
+        self._stop     = threading.Event()
+        self._thread   = None
+        self._stats    = {"created": 0, "destroyed": 0, "leases": 0, "warm_hits": 0, "cold_starts": 0,
+                          "reset_failures": 0, "health_failures": 0}
+
+    # ── lifecycle ─────────────────────────────────────────────────
+    def start(self):
+        """Starts the background thread that warms, health-checks and expires sandboxes."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._maintain, name="sandbox-pool", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        self._stop.set()
+        with self._cond:
+            idle = [sb for sb, _ in self._idle]
+            self._idle.clear()
+        for sandbox in idle:
+            self._destroy(sandbox)
+
+    # ── leasing ───────────────────────────────────────────────────
+    def acquire(self, timeout: float = SANDBOX_LEASE_TIMEOUT):
+        """Returns a ready sandbox: a warm one if available, otherwise a freshly created one."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    sandbox, _ = self._idle.popleft()
+                    self._leased.add(sandbox)
+                    self._stats["leases"] += 1
+                    self._stats["warm_hits"] += 1
+                    self._cond.notify_all()   # wake the maintainer to refill
+                    return sandbox
+                if self._total() < self.max_size:
+                    self._creating += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("No sandbox available in the pool")
+                self._cond.wait(remaining)
+
+        try:
+            sandbox = self._create()
+        finally:
+            with self._cond:
+                self._creating -= 1
+        with self._cond:
+            self._stats["created"] += 1
+            self._stats["leases"] += 1
+            self._stats["cold_starts"] += 1
+            self._leased.add(sandbox)
+        return sandbox
+
+    def release(self, sandbox):
+        """Resets a leased sandbox and returns it to the pool (or destroys it if the reset fails)."""
+        with self._cond:
+            self._leased.discard(sandbox)
+        try:
+            ok = self.backend.reset(sandbox)
+        except Exception as e:
+            logger.warning(f"Sandbox reset failed ({getattr(sandbox, 'id', '?')}): {e}")
+            ok = False
+
+        with self._cond:
+            keep = ok and not self._stop.is_set() and len(self._idle) < self.max_size
+            if keep:
+                self._idle.append((sandbox, time.monotonic()))
+                self._cond.notify_all()
+            elif not ok:
+                self._stats["reset_failures"] += 1
+        if not keep:
+            self._destroy(sandbox)
+
+    @contextmanager
+    def lease(self, timeout: float = SANDBOX_LEASE_TIMEOUT):
+        sandbox = self.acquire(timeout)
+        try:
+            yield sandbox
+        finally:
+            self.release(sandbox)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"backend": self.backend.name, "size": self.size, "max_size": self.max_size,
+                    "idle": len(self._idle), "leased": len(self._leased), "creating": self._creating,
+                    **self._stats}
+
+    # ── internals ─────────────────────────────────────────────────
+    def _create(self):
+        """New sandbox from the backend, provisioned with linters and snapshotted for resets."""
+        sandbox = self.backend.create()
+        try:
+            lint_error = ensure_linters(sandbox)
+            if lint_error:
+                logger.warning(f"Sandbox {getattr(sandbox, 'id', '?')}: {lint_error}")
+            self.backend.snapshot(sandbox)
+        except Exception:
+            self._destroy(sandbox)
+            raise
+        return sandbox
+
+    def _total(self) -> int:
+        return len(self._idle) + len(self._leased) + self._creating
+
+    def _destroy(self, sandbox):
+        try:
+            self.backend.destroy(sandbox)
+        except Exception as e:
+            logger.warning(f"Sandbox destroy failed ({getattr(sandbox, 'id', '?')}): {e}")
+        with self._cond:
+            self._stats["destroyed"] += 1
+            self._cond.notify_all()
+
+    def _maintain(self):
+        last_health = 0.0
+        while not self._stop.is_set():
+            now = time.monotonic()
+
+            # 1. Expire sandboxes idle past the TTL
+            with self._cond:
+                expired = [item for item in self._idle if now - item[1] > self.idle_ttl]
+                for item in expired:
+                    self._idle.remove(item)
+            for sandbox, _ in expired:
+                self._destroy(sandbox)
+
+            # 2. Health-check idle sandboxes
+            if now - last_health >= self.health_interval:
+                last_health = now
+                with self._cond:
+                    candidates = list(self._idle)
+                for item in candidates:
+                    try:
+                        ok = self.backend.healthy(item[0])
+                    except Exception:
+                        ok = False
+                    if not ok:
+                        with self._cond:
+                            if item not in self._idle:
+                                continue   # leased meanwhile
+                            self._idle.remove(item)
+                            self._stats["health_failures"] += 1
+                        self._destroy(item[0])
+
+            # 3. Top the warm pool back up
+            with self._cond:
+                missing = self.size - len(self._idle) - self._creating
+                missing = min(missing, self.max_size - self._total())
+                self._creating += max(0, missing)
+            for _ in range(max(0, missing)):
+                try:
+                    sandbox = self._create()
+                    with self._cond:
+                        self._stats["created"] += 1
+                        self._idle.append((sandbox, time.monotonic()))
+                        self._cond.notify_all()
+                except Exception as e:
+                    logger.warning(f"Failed to warm sandbox: {e}")
+                finally:
+                    with self._cond:
+                        self._creating -= 1
+
+            with self._cond:
+                self._cond.wait(timeout=min(5.0, self.health_interval))
+
+
+def create_pool(backend: str = SANDBOX_BACKEND) -> SandboxPool:
+    """Builds the pool for the configured backend ("daytona" or "local")."""
+    return SandboxPool(create_backend(backend))
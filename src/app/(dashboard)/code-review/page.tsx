@@ -85,9 +85,15 @@ export default function CodeReviewPage() {
                     const payload = JSON.parse(e.data)
 
                     if (eventType === "report") {
+                        // The event only names the stored report; fetch the full markdown once
                         setSteps((prev) => [...prev, { type: "report", message: "Report generated" }])
-                        setReport(payload.data)
-                        setShowReport(true)
+                        fetch(`${API_BASE}${payload.url}`)
+                            .then((r) => (r.ok ? r.text() : Promise.reject(r.status)))
+                            .then((markdown) => {
+                                setReport(markdown)
+                                setShowReport(true)
+                            })
+                            .catch(() => { })
                     } else if (eventType === "done") {
                         setSteps((prev) => [...prev, { type: "done", message: payload.message || "Review complete" }])
                         setIsReviewing(false)
@@ -114,6 +120,14 @@ export default function CodeReviewPage() {
                 })
             })
 
+            // Each file's report section arrives as soon as its analysis completes;
+            // the final "report" event points at the full report, which replaces them.
+            eventSource.addEventListener("report_section", (e) => {
+                const payload = JSON.parse((e as MessageEvent).data)
+                setReport((prev) => prev + payload.section)
+                setShowReport(true)
+            })
+
             eventSource.onerror = () => {
                 setSteps((prev) => [...prev, { type: "error", message: "Connection lost" }])
                 setIsReviewing(false)
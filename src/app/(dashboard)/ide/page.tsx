@@ -6,13 +6,16 @@ import { motion, AnimatePresence } from "motion/react"
 import {
     Play, Download, Loader2, CheckCircle2, XCircle, FileCode,
     Zap, Search, Terminal as TerminalIcon, FileText, ChevronRight, ChevronDown,
-    FilePlus, Trash2, Menu, X, Code2, Bug, Activity, Maximize2, Minimize2
+    FilePlus, Trash2, Menu, X, Code2, Bug, Activity, Maximize2, Minimize2, Github
 } from "lucide-react"
 import ReactMarkdown from "react-markdown"
 import { Button } from "@/components/ui/button"
 import { Input } from "@/components/ui/input"
 import { useTheme } from "next-themes"
 import { getBackendBase } from "@/lib/api-config"
+import { cloneRepoWithProgress, fetchRepoFile, repoExportUrl, repoRawFileUrl } from "@/lib/repo-api"
+import ConnectionModal from "@/components/ide/ConnectionModal"
+import { toast } from "sonner"
 
 const MonacoEditor = dynamic(() => import("@monaco-editor/react"), {
     ssr: false,
@@ -29,6 +32,11 @@ interface FileNode {
     name: string
     content: string
     type: "file"
+    // Repo files are listed from the manifest and loaded when first opened
+    loaded?: boolean
+    binary?: boolean
+    truncated?: boolean
+    size?: number
 }
 
 interface StepEvent {
@@ -59,6 +67,11 @@ export default function IDEPage() {
     const [activeFile, setActiveFile] = useState("src/app.py")
     const [openFiles, setOpenFiles] = useState<string[]>(["src/app.py"])
 
+    // Connected repository (backend session holding the checkout)
+    const [repoSessionId, setRepoSessionId] = useState<string | null>(null)
+    const [showConnect, setShowConnect] = useState(false)
+    const [loadingFile, setLoadingFile] = useState<string | null>(null)
+
     // Code execution
     const [output, setOutput] = useState("")
     const [isRunning, setIsRunning] = useState(false)
@@ -83,6 +96,62 @@ export default function IDEPage() {
         }))
     }, [])
 
+    const connectRepo = useCallback(async (url: string, branch: string, token: string) => {
+        const toastId = toast.loading("Cloning repository…")
+        try {
+            const { session_id, manifest, truncated } = await cloneRepoWithProgress(url, branch, token, ({ phase, percent }) => {
+                toast.loading(`Cloning repository… ${percent}% (${phase})`, { id: toastId })
+            })
+            const repoFiles: Record<string, FileNode> = {}
+            for (const entry of manifest) {
+                repoFiles[entry.path] = {
+                    name: entry.path, content: "", type: "file",
+                    loaded: false, binary: entry.binary, size: entry.size,
+                }
+            }
+            setRepoSessionId(session_id)
+            setFiles(repoFiles)
+            setOpenFiles([])
+            setActiveFile("")
+            toast.success(`Connected: ${manifest.length} files${truncated ? " (listing truncated)" : ""}`, { id: toastId })
+        } catch (err) {
+            toast.error(err instanceof Error ? err.message : "Failed to connect repository", { id: toastId })
+            throw err
+        }
+    }, [])
+
+    const openFile = useCallback(async (path: string) => {
+        setActiveFile(path)
+        setOpenFiles(prev => prev.includes(path) ? prev : [...prev, path])
+
+        const file = files[path]
+        if (!file || file.loaded !== false || !repoSessionId) return
+        if (file.binary) {
+            setFiles(prev => ({ ...prev, [path]: { ...prev[path], loaded: true, content: `// Binary file (${file.size ?? 0} bytes) - not shown\n` } }))
+            return
+        }
+
+        setLoadingFile(path)
+        try {
+            const data = await fetchRepoFile(repoSessionId, path)
+            const binary = data.encoding === "base64"
+            setFiles(prev => ({
+                ...prev,
+                [path]: {
+                    ...prev[path],
+                    loaded: true,
+                    binary,
+                    truncated: !data.eof,
+                    content: binary ? `// Binary file (${data.size} bytes) - not shown\n` : data.content,
+                },
+            }))
+        } catch (err) {
+            toast.error(err instanceof Error ? err.message : `Failed to load ${path}`)
+        } finally {
+            setLoadingFile(current => current === path ? null : current)
+        }
+    }, [files, repoSessionId])
+
     const createFile = useCallback(() => {
         const newFileName = prompt("Enter file name (e.g., src/newfile.js):")
         if (newFileName && !files[newFileName]) {
@@ -258,6 +327,18 @@ export default function IDEPage() {
                 </div>
 
                 <div className="flex items-center gap-2">
+                    <Button onClick={() => setShowConnect(true)} variant="ghost" size="sm" className="h-8">
+                        <Github className="h-4 w-4 mr-1" />
+                        {repoSessionId ? "Switch Repo" : "Connect Repo"}
+                    </Button>
+                    {repoSessionId && (
+                        <Button asChild variant="ghost" size="sm" className="h-8">
+                            <a href={repoExportUrl(repoSessionId)}>
+                                <Download className="h-4 w-4 mr-1" />
+                                Export
+                            </a>
+                        </Button>
+                    )}
                     <Button
                         onClick={runCode}
                         disabled={isRunning}
@@ -293,14 +374,11 @@ export default function IDEPage() {
                                     key={path}
                                     className={`group flex items-center justify-between px-2 py-1.5 rounded cursor-pointer transition ${activeFile === path ? "bg-primary/20 text-primary" : "hover:bg-white/5 text-muted-foreground hover:text-foreground"
                                         }`}
-                                    onClick={() => {
-                                        setActiveFile(path)
-                                        if (!openFiles.includes(path)) setOpenFiles(prev => [...prev, path])
-                                    }}
+                                    onClick={() => openFile(path)}
                                 >
                                     <div className="flex items-center gap-2">
-                                        <FileCode className="h-3.5 w-3.5" />
-                                        <span className="text-xs font-medium">{path.split("/").pop()}</span>
+                                        {loadingFile === path ? <Loader2 className="h-3.5 w-3.5 animate-spin" /> : <FileCode className="h-3.5 w-3.5" />}
+                                        <span className="text-xs font-medium" title={path}>{path.split("/").pop()}</span>
                                     </div>
                                     <button
                                         onClick={(e) => {
@@ -345,22 +423,35 @@ export default function IDEPage() {
                             </div>
                         ))}
                     </div>
-                    {/* Monaco Editor */}
+                    {/* Monaco Editor (binary files are shown from the raw endpoint instead) */}
                     <div className="flex-1 overflow-hidden">
-                        <MonacoEditor
-                            height="100%"
-                            language="javascript"
-                            theme={resolvedTheme === "dark" ? "vs-dark" : "light"}
-                            value={files[activeFile]?.content || ""}
-                            onChange={(value) => updateFileContent(activeFile, value || "")}
-                            options={{
-                                minimap: { enabled: true },
-                                fontSize: 14,
-                                lineNumbers: "on",
-                                scrollBeyondLastLine: false,
-                                automaticLayout: true,
-                            }}
-                        />
+                        {files[activeFile]?.binary && repoSessionId ? (
+                            <div className="h-full flex flex-col items-center justify-center gap-4 p-4 text-sm text-gray-400">
+                                {/\.(png|jpe?g|gif|webp|svg|ico|bmp|avif)$/i.test(activeFile) && (
+                                    // eslint-disable-next-line @next/next/no-img-element
+                                    <img src={repoRawFileUrl(repoSessionId, activeFile)} alt={activeFile} className="max-h-[80%] max-w-full object-contain" />
+                                )}
+                                <a href={repoRawFileUrl(repoSessionId, activeFile, true)} className="underline hover:text-white">
+                                    Download {activeFile} ({files[activeFile]?.size ?? 0} bytes)
+                                </a>
+                            </div>
+                        ) : (
+                            <MonacoEditor
+                                height="100%"
+                                language="javascript"
+                                theme={resolvedTheme === "dark" ? "vs-dark" : "light"}
+                                value={files[activeFile]?.content || ""}
+                                onChange={(value) => updateFileContent(activeFile, value || "")}
+                                options={{
+                                    readOnly: loadingFile === activeFile || !!files[activeFile]?.binary || !!files[activeFile]?.truncated,
+                                    minimap: { enabled: true },
+                                    fontSize: 14,
+                                    lineNumbers: "on",
+                                    scrollBeyondLastLine: false,
+                                    automaticLayout: true,
+                                }}
+                            />
+                        )}
                     </div>
                 </div>
 
@@ -414,6 +505,8 @@ export default function IDEPage() {
                 )}
             </div>
 
+            <ConnectionModal isOpen={showConnect} onClose={() => setShowConnect(false)} onConnect={connectRepo} />
+
             {
                 !showTerminal && (
                     <button
@@ -0,0 +1,51 @@
+CREATE TABLE IF NOT EXISTS "code_reviews" (
+	"id" uuid PRIMARY KEY DEFAULT gen_random_uuid() NOT NULL,
+	"user_id" uuid,
+	"job_id" text NOT NULL,
+	"repo_url" text NOT NULL,
+	"commit_sha" text,
+	"overall_score" real DEFAULT 0 NOT NULL,
+	"file_count" integer DEFAULT 0 NOT NULL,
+	"analyzed_count" integer DEFAULT 0 NOT NULL,
+	"total_lines" integer DEFAULT 0 NOT NULL,
+	"pass_count" integer DEFAULT 0 NOT NULL,
+	"warn_count" integer DEFAULT 0 NOT NULL,
+	"fail_count" integer DEFAULT 0 NOT NULL,
+	"summary" jsonb DEFAULT '{}'::jsonb,
+	"tests" jsonb DEFAULT '[]'::jsonb,
+	"report" text,
+	"created_at" timestamp DEFAULT now() NOT NULL,
+	CONSTRAINT "code_reviews_job_id_unique" UNIQUE("job_id")
+);
+--> statement-breakpoint
+CREATE TABLE IF NOT EXISTS "code_review_files" (
+	"id" uuid PRIMARY KEY DEFAULT gen_random_uuid() NOT NULL,
+	"review_id" uuid NOT NULL,
+	"path" text NOT NULL,
+	"language" text,
+	"lines" integer DEFAULT 0 NOT NULL,
+	"score" real DEFAULT 0 NOT NULL,
+	"verdict" text,
+	"execution" jsonb DEFAULT '{}'::jsonb,
+	"linting" jsonb DEFAULT '{}'::jsonb,
+	"ai_analysis" jsonb DEFAULT '{}'::jsonb,
+	"tests" jsonb DEFAULT '[]'::jsonb
+);
+--> statement-breakpoint
+DO $$ BEGIN
+ ALTER TABLE "code_reviews" ADD CONSTRAINT "code_reviews_user_id_user_id_fk" FOREIGN KEY ("user_id") REFERENCES "public"."user"("id") ON DELETE set null ON UPDATE no action;
+EXCEPTION
+ WHEN duplicate_object THEN null;
+END $$;
+--> statement-breakpoint
+DO $$ BEGIN
+ ALTER TABLE "code_review_files" ADD CONSTRAINT "code_review_files_review_id_code_reviews_id_fk" FOREIGN KEY ("review_id") REFERENCES "public"."code_reviews"("id") ON DELETE cascade ON UPDATE no action;
+EXCEPTION
+ WHEN duplicate_object THEN null;
+END $$;
+--> statement-breakpoint
+CREATE INDEX IF NOT EXISTS "idx_code_reviews_repo_url" ON "code_reviews" USING btree ("repo_url");--> statement-breakpoint
+CREATE INDEX IF NOT EXISTS "idx_code_reviews_repo_commit" ON "code_reviews" USING btree ("repo_url","commit_sha");--> statement-breakpoint
+CREATE INDEX IF NOT EXISTS "idx_code_reviews_user_created" ON "code_reviews" USING btree ("user_id","created_at");--> statement-breakpoint
+CREATE INDEX IF NOT EXISTS "idx_code_reviews_created" ON "code_reviews" USING btree ("created_at");--> statement-breakpoint
+CREATE INDEX IF NOT EXISTS "idx_code_review_files_review_id" ON "code_review_files" USING btree ("review_id");
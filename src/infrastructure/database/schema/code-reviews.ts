@@ -0,0 +1,70 @@
+import {
+    timestamp,
+    pgTable,
+    text,
+    jsonb,
+    integer,
+    real,
+    uuid,
+    index,
+} from "drizzle-orm/pg-core";
+import { sql } from "drizzle-orm";
+import { users } from "./users";
+
+// Written by the FastAPI backend (backend/application/review_store.py) when a repo review finishes
+export const codeReviews = pgTable("code_reviews", {
+    id: uuid("id")
+        .primaryKey()
+        .default(sql`gen_random_uuid()`),
+    userId: uuid("user_id")
+        .references(() => users.id, { onDelete: "set null" }),
+    jobId: text("job_id").notNull().unique(),
+
+    repoUrl: text("repo_url").notNull(),
+    commitSha: text("commit_sha"),
+
+    overallScore: real("overall_score").default(0).notNull(),
+    fileCount: integer("file_count").default(0).notNull(),
+    analyzedCount: integer("analyzed_count").default(0).notNull(),
+    totalLines: integer("total_lines").default(0).notNull(),
+    passCount: integer("pass_count").default(0).notNull(),
+    warnCount: integer("warn_count").default(0).notNull(),
+    failCount: integer("fail_count").default(0).notNull(),
+
+    summary: jsonb("summary").default(sql`'{}'::jsonb`),
+    tests: jsonb("tests").default(sql`'[]'::jsonb`),
+    report: text("report"),
+
+    createdAt: timestamp("created_at", { mode: "date" }).defaultNow().notNull(),
+}, (table) => {
+    return {
+        repoUrlIdx: index("idx_code_reviews_repo_url").on(table.repoUrl),
+        commitIdx: index("idx_code_reviews_repo_commit").on(table.repoUrl, table.commitSha),
+        userCreatedIdx: index("idx_code_reviews_user_created").on(table.userId, table.createdAt),
+        createdIdx: index("idx_code_reviews_created").on(table.createdAt),
+    };
+});
+
+export const codeReviewFiles = pgTable("code_review_files", {
+    id: uuid("id")
+        .primaryKey()
+        .default(sql`gen_random_uuid()`),
+    reviewId: uuid("review_id")
+        .notNull()
+        .references(() => codeReviews.id, { onDelete: "cascade" }),
+
+    path: text("path").notNull(),
+    language: text("language"),
+    lines: integer("lines").default(0).notNull(),
+    score: real("score").default(0).notNull(),
+    verdict: text("verdict"), // "PASS", "WARN", "FAIL"
+
+    execution: jsonb("execution").default(sql`'{}'::jsonb`),
+    linting: jsonb("linting").default(sql`'{}'::jsonb`),
+    aiAnalysis: jsonb("ai_analysis").default(sql`'{}'::jsonb`),
+    tests: jsonb("tests").default(sql`'[]'::jsonb`),
+}, (table) => {
+    return {
+        reviewIdIdx: index("idx_code_review_files_review_id").on(table.reviewId),
+    };
+});
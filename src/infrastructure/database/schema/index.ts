@@ -11,3 +11,4 @@ export * from "./contact";
 export * from "./activity-log";
 export * from "./skill-scores";
 export * from "./interview-sessions";
+export * from "./code-reviews";
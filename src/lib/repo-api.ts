@@ -0,0 +1,169 @@
+import { getBackendBase } from "./api-config"
+
+export interface ManifestEntry {
+    path: string
+    size: number
+    hash: string
+    binary: boolean
+}
+
+export interface RepoManifest {
+    session_id: string
+    manifest: ManifestEntry[]
+    file_count: number
+    total_bytes: number
+    truncated: boolean
+}
+
+export interface RepoFileContent {
+    path: string
+    size: number
+    offset: number
+    length: number
+    eof: boolean
+    binary: boolean
+    encoding: "utf-8" | "base64"
+    content: string
+}
+
+async function errorText(res: Response, fallback: string): Promise<string> {
+    try {
+        const data = await res.json()
+        return data.detail || fallback
+    } catch {
+        return fallback
+    }
+}
+
+/** Clones a repository into a backend session and returns its file manifest (no contents). */
+export async function extractRepoManifest(githubUrl: string, branch: string, accessToken?: string): Promise<RepoManifest> {
+    const res = await fetch(`${getBackendBase()}/api/repo/extract?mode=manifest`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ github_url: githubUrl, branch, access_token: accessToken || null }),
+    })
+    if (!res.ok) {
+        throw new Error(await errorText(res, `Failed to extract repository: ${res.statusText}`))
+    }
+    return res.json()
+}
+
+/** Fetches one file (or a byte range of it) from a repo session. */
+export async function fetchRepoFile(sessionId: string, path: string, offset = 0, length?: number): Promise<RepoFileContent> {
+    const params = new URLSearchParams({ session_id: sessionId, path, offset: String(offset) })
+    if (length !== undefined) params.set("length", String(length))
+    const res = await fetch(`${getBackendBase()}/api/repo/file?${params}`)
+    if (!res.ok) {
+        throw new Error(await errorText(res, `Failed to load ${path}: ${res.statusText}`))
+    }
+    return res.json()
+}
+
+/** URL of a session file served as-is (binary and large files included, supports Range requests). */
+export function repoRawFileUrl(sessionId: string, path: string, download = false): string {
+    const params = new URLSearchParams({ session_id: sessionId, path })
+    if (download) params.set("download", "true")
+    return `${getBackendBase()}/api/repo/raw?${params}`
+}
+
+/** URL that downloads a session's files as an archive (streamed by the backend). */
+export function repoExportUrl(sessionId: string, format: "zip" | "tar.gz" = "zip"): string {
+    const params = new URLSearchParams({ session_id: sessionId, format })
+    return `${getBackendBase()}/api/repo/export?${params}`
+}
+
+export type RepoStreamRecord =
+    | { type: "session"; session_id: string }
+    | { type: "file"; path: string; content: string }
+    | { type: "skipped"; path: string; reason: "too_large" | "binary" | "unreadable" }
+    | { type: "done"; session_id: string; file_count: number; skipped: number }
+
+/** Clones a repository and yields its files one NDJSON record at a time, as the backend reads them. */
+export async function* streamRepoFiles(githubUrl: string, branch: string, accessToken?: string): AsyncGenerator<RepoStreamRecord> {
+    const res = await fetch(`${getBackendBase()}/api/repo/extract?mode=ndjson`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ github_url: githubUrl, branch, access_token: accessToken || null }),
+    })
+    if (!res.ok || !res.body) {
+        throw new Error(await errorText(res, `Failed to extract repository: ${res.statusText}`))
+    }
+
+    const reader = res.body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ""
+    while (true) {
+        const { done, value } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+        const lines = buffer.split("\n")
+        buffer = lines.pop() ?? ""
+        for (const line of lines) {
+            if (line.trim()) yield JSON.parse(line)
+        }
+    }
+    if (buffer.trim()) yield JSON.parse(buffer)
+}
+
+export interface RepoCloneProgress {
+    phase: string
+    phase_percent: number
+    percent: number
+}
+
+/** Cancels a running clone started by cloneRepoWithProgress. */
+export async function cancelRepoClone(cloneId: string): Promise<void> {
+    await fetch(`${getBackendBase()}/api/repo/clone/${cloneId}`, { method: "DELETE" })
+}
+
+/**
+ * Clones a repository into a backend session, reporting git's progress as it goes, and
+ * resolves with the file manifest. Aborting the signal cancels the clone on the backend.
+ */
+export async function cloneRepoWithProgress(
+    githubUrl: string,
+    branch: string,
+    accessToken: string | undefined,
+    onProgress: (progress: RepoCloneProgress) => void,
+    signal?: AbortSignal,
+): Promise<RepoManifest> {
+    const res = await fetch(`${getBackendBase()}/api/repo/clone`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ github_url: githubUrl, branch, access_token: accessToken || null }),
+        signal,
+    })
+    if (!res.ok) {
+        throw new Error(await errorText(res, `Failed to start clone: ${res.statusText}`))
+    }
+    const { clone_id, stream_url } = await res.json()
+
+    return new Promise<RepoManifest>((resolve, reject) => {
+        const eventSource = new EventSource(`${getBackendBase()}${stream_url}`)
+        const finish = () => {
+            eventSource.close()
+            signal?.removeEventListener("abort", onAbort)
+        }
+        const onAbort = () => {
+            finish()
+            cancelRepoClone(clone_id).catch(() => {})
+            reject(new Error("Clone cancelled"))
+        }
+        signal?.addEventListener("abort", onAbort)
+
+        eventSource.addEventListener("progress", (e) => onProgress(JSON.parse((e as MessageEvent).data)))
+        eventSource.addEventListener("done", (e) => {
+            finish()
+            resolve(JSON.parse((e as MessageEvent).data))
+        })
+        eventSource.addEventListener("error", (e) => {
+            finish()
+            const data = (e as MessageEvent).data
+            reject(new Error(data ? JSON.parse(data).detail : "Connection lost while cloning"))
+        })
+        eventSource.addEventListener("cancelled", () => {
+            finish()
+            reject(new Error("Clone cancelled"))
+        })
+    })
+}